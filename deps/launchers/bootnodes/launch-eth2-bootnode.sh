@@ -19,10 +19,8 @@ for var in "${env_vars[@]}" ; do
 done
 
 # wait for the bootnode checkpoint file before starting.
-while [ ! -f "$CONSENSUS_BOOTNODE_CHECKPOINT_FILE" ]; do
-  echo "eth2-bootnode waiting for bootnode checkpoint file."
-    sleep 1
-done
+echo "eth2-bootnode waiting for bootnode checkpoint file."
+python3 /source/src/checkpoint.py wait "$CONSENSUS_BOOTNODE_CHECKPOINT_FILE" || exit 1
 
 # the clients expect a static bootnode file to come online. so we launch the
 # bootnode and then fetch the file and write it ourselves.
@@ -35,7 +33,9 @@ write_enr_file () {
     sleep 1
   done
   echo "eth2-bootnode: writing enr to file ($CONSENSUS_BOOTNODE_ENR_FILE)"
-  curl "$enr_fetch_address" > $CONSENSUS_BOOTNODE_ENR_FILE
+  # write then rename, the clients read the file as soon as it exists.
+  curl "$enr_fetch_address" > "$CONSENSUS_BOOTNODE_ENR_FILE.tmp"
+  mv "$CONSENSUS_BOOTNODE_ENR_FILE.tmp" "$CONSENSUS_BOOTNODE_ENR_FILE"
 }
 
 write_enr_file &
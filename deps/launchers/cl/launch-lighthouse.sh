@@ -33,22 +33,16 @@ for var in "${env_vars[@]}" ; do
 done
 
 # we can wait for the bootnode enr to drop before we get the signal to start up.
-while [ ! -f "$CONSENSUS_BOOTNODE_FILE" ]; do
-  echo "consensus client waiting for bootnode enr file: $CONSENSUS_BOOTNODE_FILE"
-  sleep 1
-done
+echo "consensus client waiting for bootnode enr file: $CONSENSUS_BOOTNODE_FILE"
+python3 /source/src/checkpoint.py wait "$CONSENSUS_BOOTNODE_FILE" || exit 1
 
-while [ ! -f "$CONSENSUS_CHECKPOINT_FILE" ]; do
-  echo "Waiting for consensus checkpoint file: $CONSENSUS_CHECKPOINT_FILE"
-    sleep 1
-done
+echo "Waiting for consensus checkpoint file: $CONSENSUS_CHECKPOINT_FILE"
+python3 /source/src/checkpoint.py wait "$CONSENSUS_CHECKPOINT_FILE" || exit 1
 
 bootnode_enr=`cat $CONSENSUS_BOOTNODE_FILE`
 
-while [ ! -f "$WORMTONGUE_CHECKPOINT_FILE" ]; do
-  echo "Waiting for wormtongue checkpoint file: $WORMTONGUE_CHECKPOINT_FILE"
-    sleep 1
-done
+echo "Waiting for wormtongue checkpoint file: $WORMTONGUE_CHECKPOINT_FILE"
+python3 /source/src/checkpoint.py wait "$WORMTONGUE_CHECKPOINT_FILE" || exit 1
 
 echo "Launching lighthouse."
 
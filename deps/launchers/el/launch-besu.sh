@@ -31,10 +31,8 @@ for var in "${env_vars[@]}" ; do
 done
 
 
-while [ ! -f "$EXECUTION_CHECKPOINT_FILE" ]; do
-  echo "Waiting for execution checkpoint file: $EXECUTION_CHECKPOINT_FILE"
-    sleep 1
-done
+echo "Waiting for execution checkpoint file: $EXECUTION_CHECKPOINT_FILE"
+python3 /source/src/checkpoint.py wait "$EXECUTION_CHECKPOINT_FILE" || exit 1
 
 besu \
   --logging="$EXECUTION_LOG_LEVEL" \
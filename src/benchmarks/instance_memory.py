@@ -0,0 +1,153 @@
+"""
+    Measures the memory and construction time of the client instances of a
+    large testnet, built from a copy of an etb-config whose client
+    collections are scaled up to --num-instances. Exits with 1 when the
+    memory per instance or the construction time exceeds the limits, so it
+    can be used to catch regressions:
+
+        cd src && python3 -m benchmarks.instance_memory [--num-instances 5000]
+
+    Memory is the tracemalloc delta of building the instances (paths that are
+    derived on first use are not included). Construction time is the best of
+    --repeat runs without tracemalloc.
+"""
+import argparse
+import gc
+import pathlib
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from ruamel import yaml
+
+from etb.config.etb_config import ETBConfig
+
+DEFAULT_CONFIG = pathlib.Path(__file__).parents[2] / "configs" / "mainnet-testnet.yaml"
+
+
+def write_scaled_config(src: pathlib.Path, dest: pathlib.Path, num_instances: int):
+    """Write a copy of an etb-config with num_instances client instances
+    spread over its client collections.
+
+    @param src: the etb-config to scale.
+    @param dest: where to write the scaled etb-config.
+    @param num_instances: the total number of client instances.
+    @return:
+    """
+    with open(src, "r", encoding="utf-8") as f:
+        config = yaml.safe_load(f)
+    collections = list(config["client-instances"].values())
+    for ndx, collection in enumerate(collections):
+        # the first collections get the remainder.
+        collection["num-nodes"] = num_instances // len(collections) + (
+            ndx < num_instances % len(collections)
+        )
+    with open(dest, "w", encoding="utf-8") as f:
+        yaml.safe_dump(config, f)
+
+
+def build_instances(etb_config: ETBConfig) -> list:
+    """Build the client instances of a config."""
+    # the instances are built on first use, drop the ones built before.
+    etb_config._client_instances = None
+    return [
+        instance
+        for instances in etb_config.client_instances.values()
+        for instance in instances
+    ]
+
+
+def measure(config_path: pathlib.Path, repeat: int) -> tuple[int, float, float]:
+    """Measure the client instances of an etb-config.
+
+    @return: (number of instances, bytes per instance, construction seconds)
+    """
+    etb_config = ETBConfig(config_path)
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        build_instances(etb_config)
+        best = min(best, time.perf_counter() - start)
+
+    etb_config._client_instances = None
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    instances = build_instances(etb_config)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return len(instances), size / len(instances), best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure the memory and construction time of client instances."
+    )
+    parser.add_argument(
+        "--config",
+        dest="config",
+        type=pathlib.Path,
+        default=DEFAULT_CONFIG,
+        help="The etb-config to scale up.",
+    )
+    parser.add_argument(
+        "--num-instances",
+        dest="num_instances",
+        type=int,
+        default=5000,
+        help="The number of client instances to build.",
+    )
+    parser.add_argument(
+        "--repeat",
+        dest="repeat",
+        type=int,
+        default=5,
+        help="The number of timed constructions.",
+    )
+    parser.add_argument(
+        "--max-bytes-per-instance",
+        dest="max_bytes_per_instance",
+        type=float,
+        default=256,
+        help="Fail if an instance uses more memory.",
+    )
+    parser.add_argument(
+        "--max-construction-ms",
+        dest="max_construction_ms",
+        type=float,
+        default=150,
+        help="Fail if building the instances takes longer.",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        scaled_config = pathlib.Path(tmp) / "etb-config.yaml"
+        write_scaled_config(args.config, scaled_config, args.num_instances)
+        num_instances, bytes_per_instance, seconds = measure(
+            scaled_config, args.repeat
+        )
+
+    print(
+        f"{num_instances} instances: {bytes_per_instance:.0f} B/instance "
+        f"({num_instances * bytes_per_instance / 2**20:.2f} MiB), "
+        f"construction {seconds * 1000:.1f}ms"
+    )
+    failed = False
+    if bytes_per_instance > args.max_bytes_per_instance:
+        print(
+            f"memory regression: {bytes_per_instance:.0f} > "
+            f"{args.max_bytes_per_instance:.0f} B/instance",
+            file=sys.stderr,
+        )
+        failed = True
+    if seconds * 1000 > args.max_construction_ms:
+        print(
+            f"construction time regression: {seconds * 1000:.1f} > "
+            f"{args.max_construction_ms:.0f}ms",
+            file=sys.stderr,
+        )
+        failed = True
+    sys.exit(1 if failed else 0)
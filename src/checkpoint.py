@@ -0,0 +1,52 @@
+"""
+    Wait for or signal the checkpoint files that coordinate the bootstrap
+    phases. Used by the launchers in deps/launchers, e.g.:
+
+        python3 /source/src/checkpoint.py wait "$EXECUTION_CHECKPOINT_FILE"
+
+    wait exits with 1 if the timeout expires before all the files exist.
+"""
+import argparse
+import sys
+
+from etb.common.checkpoint import signal_checkpoint, wait_for_checkpoints
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Wait for or signal bootstrap checkpoint files."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    wait_parser = subparsers.add_parser(
+        "wait", help="Wait for checkpoint files to exist."
+    )
+    wait_parser.add_argument("checkpoints", nargs="+", help="The checkpoint files.")
+    wait_parser.add_argument(
+        "--timeout",
+        dest="timeout",
+        type=float,
+        default=None,
+        help="Max seconds to wait, waits forever by default.",
+    )
+    wait_parser.add_argument(
+        "--poll-interval",
+        dest="poll_interval",
+        type=float,
+        default=1.0,
+        help="Seconds between re-checks when no file events arrive.",
+    )
+
+    signal_parser = subparsers.add_parser("signal", help="Write a checkpoint file.")
+    signal_parser.add_argument("checkpoint", help="The checkpoint file.")
+    signal_parser.add_argument(
+        "--content", dest="content", default="", help="Content of the file."
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "wait":
+        if not wait_for_checkpoints(args.checkpoints, args.timeout, args.poll_interval):
+            print(f"Timed out waiting for {args.checkpoints}", file=sys.stderr)
+            sys.exit(1)
+    else:
+        signal_checkpoint(args.checkpoint, args.content)
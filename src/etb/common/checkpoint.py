@@ -0,0 +1,151 @@
+"""Checkpoint files used to coordinate the bootstrap phases between
+containers.
+
+Waiters block on inotify events of the checkpoint's directory so that a
+phase starts within milliseconds of the checkpoint being written. inotify is
+used through ctypes; where it isn't available (or the directory doesn't
+exist yet) the waiters fall back to polling. Events from other hosts, e.g.
+through some docker file sharing setups, may not be delivered, so even with
+inotify the file is re-checked every poll_interval.
+"""
+import ctypes
+import ctypes.util
+import logging
+import os
+import pathlib
+import select
+import time
+from typing import Optional, Union
+
+# inotify(7)
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+
+def _load_libc() -> Optional[ctypes.CDLL]:
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        libc.inotify_init1  # not available on all platforms.
+        libc.inotify_add_watch
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+_libc = _load_libc()
+
+
+class _DirectoryWatch:
+    """An inotify watch on a directory, used as a context manager."""
+
+    def __init__(self, directory: pathlib.Path):
+        self.fd: int = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        wd = _libc.inotify_add_watch(
+            self.fd, os.fsencode(str(directory)), ctypes.c_uint32(_WATCH_MASK)
+        )
+        if wd < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch {directory} failed")
+
+    def wait(self, timeout: float):
+        """Wait for an event in the directory or the timeout."""
+        readable, _, _ = select.select([self.fd], [], [], max(timeout, 0))
+        if readable:
+            try:
+                # the events are only a wake-up, the caller re-checks the files.
+                while os.read(self.fd, 4096):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def close(self):
+        os.close(self.fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def wait_for_checkpoint(
+    checkpoint: Union[str, pathlib.Path],
+    timeout: Optional[float] = None,
+    poll_interval: float = 1.0,
+) -> bool:
+    """Wait for a checkpoint file to exist.
+
+    @param checkpoint: the checkpoint file.
+    @param timeout: max time to wait in seconds, None to wait forever.
+    @param poll_interval: how often to re-check the file without an event.
+    @return: True if the checkpoint exists, False on timeout.
+    """
+    checkpoint = pathlib.Path(checkpoint)
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    def remaining() -> float:
+        if deadline is None:
+            return poll_interval
+        return min(poll_interval, deadline - time.monotonic())
+
+    while not checkpoint.exists():
+        if deadline is not None and time.monotonic() >= deadline:
+            return False
+        if _libc is None or not checkpoint.parent.is_dir():
+            time.sleep(max(remaining(), 0))
+            continue
+        try:
+            with _DirectoryWatch(checkpoint.parent) as watch:
+                # the file may have been created before the watch was added.
+                while not checkpoint.exists():
+                    if deadline is not None and time.monotonic() >= deadline:
+                        return False
+                    watch.wait(remaining())
+            return True
+        except OSError as e:
+            logging.debug(f"inotify unavailable for {checkpoint}, polling: {e}")
+            time.sleep(max(remaining(), 0))
+    return True
+
+
+def wait_for_checkpoints(
+    checkpoints: list[Union[str, pathlib.Path]],
+    timeout: Optional[float] = None,
+    poll_interval: float = 1.0,
+) -> bool:
+    """Wait for several checkpoint files to exist.
+
+    @param checkpoints: the checkpoint files.
+    @param timeout: max total time to wait in seconds, None to wait forever.
+    @param poll_interval: how often to re-check a file without an event.
+    @return: True if all the checkpoints exist, False on timeout.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    for checkpoint in checkpoints:
+        remaining = None if deadline is None else deadline - time.monotonic()
+        if not wait_for_checkpoint(checkpoint, remaining, poll_interval):
+            return False
+    return True
+
+
+def signal_checkpoint(checkpoint: Union[str, pathlib.Path], content: str = ""):
+    """Write a checkpoint file atomically, waiters never see a partially
+    written file.
+
+    @param checkpoint: the checkpoint file.
+    @param content: the content of the file.
+    @return:
+    """
+    checkpoint = pathlib.Path(checkpoint)
+    tmp = checkpoint.with_name(f".{checkpoint.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(content)
+    tmp.replace(checkpoint)
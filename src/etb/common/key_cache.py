@@ -0,0 +1,201 @@
+"""Cache of the accounts derived from the account mnemonic.
+
+Deriving an account from a mnemonic runs 2048 rounds of PBKDF2, so deriving
+every premine for each genesis file (and again in the tx spammer) dominates
+the bootstrap time of testnets with many premines. Derived keys are kept in
+memory and optionally in a json file in the testnet root so that other
+processes (e.g. the tx spammer) can reuse them. Entries are keyed by the
+sha256 of the mnemonic, account path and passphrase. The json file holds
+private keys, so it is only readable by its owner.
+
+Large sets of missing accounts are derived in parallel on a process pool.
+The pool spawns its workers since the callers may already run threads.
+"""
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import pathlib
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple, Optional
+
+from web3.auto import w3
+
+from ..config.etb_config import FilesConfig
+
+w3.eth.account.enable_unaudited_hdwallet_features()
+
+
+class DerivedKey(NamedTuple):
+    """An account derived from a mnemonic."""
+
+    address: str  # checksummed address.
+    private_key: str  # 0x prefixed hex.
+
+
+def _derive_keys(
+    mnemonic: str, account_paths: list[str], passphrase: str
+) -> list["DerivedKey"]:
+    """Derive a chunk of accounts, runs in the process pool."""
+    return [
+        DerivedKeyCache.derive_key(mnemonic, path, passphrase)
+        for path in account_paths
+    ]
+
+
+class DerivedKeyCache:
+    """Derives accounts from mnemonics, caching the results.
+
+    - cache_file: optional json file to persist the derived keys in, it is
+        only written if its directory exists.
+    """
+
+    # derive in a process pool when at least this many accounts are missing.
+    parallel_threshold: int = 64
+
+    def __init__(self, cache_file: Optional[pathlib.Path] = None):
+        self.cache_file: Optional[pathlib.Path] = cache_file
+        self._keys: dict[str, DerivedKey] = {}
+        self._loaded: bool = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _cache_key(mnemonic: str, account_path: str, passphrase: str) -> str:
+        return hashlib.sha256(
+            f"{mnemonic}|{account_path}|{passphrase}".encode("utf-8")
+        ).hexdigest()
+
+    def _load(self):
+        self._loaded = True
+        if self.cache_file is None or not self.cache_file.exists():
+            return
+        try:
+            with self.cache_file.open("r") as f:
+                for key, (address, private_key) in json.load(f).items():
+                    self._keys.setdefault(key, DerivedKey(address, private_key))
+        except Exception as e:
+            logging.warning(f"Ignoring invalid key cache {self.cache_file}: {e}")
+
+    def save(self):
+        """Write the derived keys to the cache file."""
+        if self.cache_file is None or not self.cache_file.parent.exists():
+            return
+        with self._lock:
+            keys = {k: list(v) for k, v in self._keys.items()}
+        # other processes may be reading the cache, replace it atomically.
+        tmp = self.cache_file.with_suffix(f".{os.getpid()}.tmp")
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(keys, f)
+        tmp.replace(self.cache_file)
+
+    @staticmethod
+    def derive_key(mnemonic: str, account_path: str, passphrase: str) -> DerivedKey:
+        """Derive an account without using the cache."""
+        acct = w3.eth.account.from_mnemonic(
+            mnemonic, account_path=account_path, passphrase=passphrase
+        )
+        return DerivedKey(address=acct.address, private_key=acct.key.hex())
+
+    def _derive_missing(
+        self,
+        mnemonic: str,
+        missing: dict[str, str],
+        passphrase: str,
+        max_workers: Optional[int],
+    ) -> dict[str, DerivedKey]:
+        """Derive the missing accounts, {cache key: account path}."""
+        workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
+        if workers <= 1 or len(missing) < self.parallel_threshold:
+            return {
+                key: self.derive_key(mnemonic, path, passphrase)
+                for key, path in missing.items()
+            }
+
+        cache_keys = list(missing.keys())
+        paths = list(missing.values())
+        # a few chunks per worker to balance the load without paying the ipc
+        # cost per account.
+        chunk_size = max(1, -(-len(paths) // (workers * 4)))
+        chunks = [
+            paths[ndx : ndx + chunk_size] for ndx in range(0, len(paths), chunk_size)
+        ]
+        derived: list[DerivedKey] = []
+        # forking a process that runs threads can deadlock on inherited locks.
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            for keys in executor.map(
+                _derive_keys,
+                [mnemonic] * len(chunks),
+                chunks,
+                [passphrase] * len(chunks),
+            ):
+                derived += keys
+        return dict(zip(cache_keys, derived))
+
+    def get_keys(
+        self,
+        mnemonic: str,
+        account_paths: list[str],
+        passphrase: str,
+        max_workers: Optional[int] = None,
+    ) -> list[DerivedKey]:
+        """Get the accounts for a list of account paths, deriving only the
+        ones that aren't cached yet.
+
+        @param mnemonic: the account mnemonic.
+        @param account_paths: the account paths e.g. "m/44'/60'/0'/0/0"
+        @param passphrase: the passphrase of the mnemonic.
+        @param max_workers: processes to derive missing accounts with,
+        defaults to the number of cpus.
+        @return: the accounts in the order of the account paths.
+        """
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            cache_keys = [
+                self._cache_key(mnemonic, path, passphrase) for path in account_paths
+            ]
+            missing = {
+                key: path
+                for key, path in zip(cache_keys, account_paths)
+                if key not in self._keys
+            }
+        if len(missing) > 0:
+            logging.debug(f"Deriving {len(missing)} accounts from the mnemonic.")
+            derived = self._derive_missing(mnemonic, missing, passphrase, max_workers)
+            with self._lock:
+                self._keys.update(derived)
+            self.save()
+        return [self._keys[key] for key in cache_keys]
+
+    def get_key(self, mnemonic: str, account_path: str, passphrase: str) -> DerivedKey:
+        """Get the account for a single account path.
+
+        @param mnemonic: the account mnemonic.
+        @param account_path: the account path e.g. "m/44'/60'/0'/0/0"
+        @param passphrase: the passphrase of the mnemonic.
+        @return: the derived account.
+        """
+        return self.get_keys(mnemonic, [account_path], passphrase)[0]
+
+
+# the cache shared by the genesis writers and the tx spammer.
+_derived_key_cache: Optional[DerivedKeyCache] = None
+_derived_key_cache_lock = threading.Lock()
+
+
+def get_derived_key_cache() -> DerivedKeyCache:
+    """Get the cache shared by the genesis writers and the tx spammer,
+    created on first use.
+
+    @return: the DerivedKeyCache.
+    """
+    global _derived_key_cache
+    with _derived_key_cache_lock:
+        if _derived_key_cache is None:
+            _derived_key_cache = DerivedKeyCache(FilesConfig().derived_key_cache_file)
+        return _derived_key_cache
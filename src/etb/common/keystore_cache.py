@@ -0,0 +1,151 @@
+"""Cache of the validator keystores generated by eth2-val-tools.
+
+Generating keystores is dominated by the KDFs of the keystores, and every
+init-testnet regenerates the same keystores from the same mnemonic. The
+output of each eth2-val-tools run is stored in the etb-cache-dir (which
+survives make clean) keyed by the sha256 of the mnemonic, index range,
+keystore format and password:
+
+    <cache_dir>/keystores/<key>/   the eth2-val-tools output for the range
+
+The keystore format is "prysm" for prysm wallets and "keystores" for the
+per validator keystores used by the other clients (their secrets are
+generated by eth2-val-tools, so they have no password).
+
+The entries hold the plaintext keystore secrets, so they are only readable
+by their owner. The cached files are read-only: the keystores are hardlinked
+into the node dirs, and a client (not running as root) writing to one in
+place fails instead of corrupting the cache. The secrets and prysm wallets
+are always copied.
+"""
+import hashlib
+import logging
+import os
+import pathlib
+import shutil
+from typing import Optional
+
+
+def _link_or_copy(src: str, dst: str):
+    try:
+        os.link(src, dst)
+    except OSError:
+        # the cache and the testnet root may be on different filesystems.
+        shutil.copy2(src, dst)
+
+
+def _copy_writable(src: str, dst: str):
+    shutil.copyfile(src, dst)
+    os.chmod(dst, 0o600)
+
+
+def _copy_read_only(src: str, dst: str):
+    shutil.copyfile(src, dst)
+    os.chmod(dst, 0o400)
+
+
+def _restore_file(src: str, dst: str):
+    # the plaintext passwords in secrets, teku-secrets, etc.
+    if pathlib.Path(src).parent.name.endswith("secrets"):
+        _copy_writable(src, dst)
+    else:
+        _link_or_copy(src, dst)
+
+
+class KeystoreCache:
+    """Stores and restores eth2-val-tools keystore ranges.
+
+    - cache_dir: the directory to cache the keystores in, None to disable
+        the cache.
+    """
+
+    def __init__(self, cache_dir: Optional[pathlib.Path]):
+        self.cache_dir: Optional[pathlib.Path] = None
+        if cache_dir is not None:
+            self.cache_dir = pathlib.Path(cache_dir) / "keystores"
+            try:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+            except OSError as e:
+                logging.warning(f"Not caching keystores in {cache_dir}: {e}")
+                self.cache_dir = None
+
+    def _entry_dir(
+        self,
+        mnemonic: str,
+        min_ndx: int,
+        max_ndx: int,
+        keystore_format: str,
+        password: str,
+    ) -> pathlib.Path:
+        key = hashlib.sha256(
+            f"{mnemonic}|{min_ndx}|{max_ndx}|{keystore_format}|{password}".encode(
+                "utf-8"
+            )
+        ).hexdigest()
+        return self.cache_dir / key
+
+    def restore(
+        self,
+        out_path: pathlib.Path,
+        mnemonic: str,
+        min_ndx: int,
+        max_ndx: int,
+        keystore_format: str,
+        password: str = "",
+    ) -> bool:
+        """Restore a cached keystore range to out_path.
+
+        The per validator keystores are hardlinked (read-only) when
+        possible, their secrets and prysm wallets are always copied since
+        prysm writes to its wallet.
+        @param out_path: where eth2-val-tools would have written the keystores.
+        @param mnemonic: the validator mnemonic.
+        @param min_ndx: the first validator index.
+        @param max_ndx: the last validator index (exclusive).
+        @param keystore_format: "prysm" or "keystores".
+        @param password: the prysm wallet password.
+        @return: True if the range was cached.
+        """
+        if self.cache_dir is None:
+            return False
+        entry = self._entry_dir(mnemonic, min_ndx, max_ndx, keystore_format, password)
+        if not entry.is_dir():
+            return False
+        copy_function = _copy_writable if keystore_format == "prysm" else _restore_file
+        shutil.copytree(entry, out_path, copy_function=copy_function)
+        return True
+
+    def store(
+        self,
+        out_path: pathlib.Path,
+        mnemonic: str,
+        min_ndx: int,
+        max_ndx: int,
+        keystore_format: str,
+        password: str = "",
+    ):
+        """Add the keystores eth2-val-tools wrote to out_path to the cache.
+
+        @param out_path: the eth2-val-tools output dir.
+        @param mnemonic: the validator mnemonic.
+        @param min_ndx: the first validator index.
+        @param max_ndx: the last validator index (exclusive).
+        @param keystore_format: "prysm" or "keystores".
+        @param password: the prysm wallet password.
+        @return:
+        """
+        if self.cache_dir is None:
+            return
+        entry = self._entry_dir(mnemonic, min_ndx, max_ndx, keystore_format, password)
+        if entry.exists():
+            return
+        # copy into a temporary dir first so a partial entry is never used.
+        tmp = entry.with_name(f"{entry.name}.{os.getpid()}.tmp")
+        try:
+            # copy, a hardlink would share the files with the node dir.
+            shutil.copytree(out_path, tmp, copy_function=_copy_read_only)
+            os.chmod(tmp, 0o700)
+            tmp.rename(entry)
+        except OSError as e:
+            logging.warning(f"Failed to cache keystores {min_ndx}-{max_ndx}: {e}")
+            shutil.rmtree(tmp, ignore_errors=True)
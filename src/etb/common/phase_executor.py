@@ -0,0 +1,144 @@
+"""Runs a DAG of phases, e.g. the bootstrap steps, concurrently.
+
+Each phase is a function that runs once all the phases it depends on have
+finished. Independent phases run at the same time on a thread pool; the
+phases are mostly waiting on subprocesses, files or the network. The start
+and end of every phase are recorded for a wall-clock report of where the
+time went.
+"""
+import json
+import logging
+import pathlib
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, NamedTuple, Optional
+
+
+class PhaseTiming(NamedTuple):
+    """When a phase ran, relative to the start of the run (seconds)."""
+
+    name: str
+    start: float
+    end: float
+    depends_on: tuple[str, ...]
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+class PhaseExecutor:
+    """Runs phases in dependency order, independent phases concurrently.
+
+    - max_workers: the max number of phases to run at the same time.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers: Optional[int] = max_workers
+        self._phases: dict[str, tuple[Callable[[], Any], tuple[str, ...]]] = {}
+        self._results: dict[str, Any] = {}
+        self._timings: dict[str, PhaseTiming] = {}
+        self._run_start: Optional[float] = None
+        self._run_end: Optional[float] = None
+
+    def add_phase(self, name: str, func: Callable[[], Any], depends_on=()):
+        """Add a phase to run.
+
+        @param name: the unique name of the phase.
+        @param func: the function to run, its return value is available
+        through get_result.
+        @param depends_on: the names of the phases that must finish first.
+        @return:
+        """
+        if name in self._phases:
+            raise Exception(f"Duplicate phase: {name}")
+        for dependency in depends_on:
+            if dependency not in self._phases:
+                raise Exception(f"Phase {name} depends on unknown phase {dependency}")
+        self._phases[name] = (func, tuple(depends_on))
+
+    def get_result(self, name: str) -> Any:
+        """Get the return value of a finished phase."""
+        return self._results[name]
+
+    def _run_phase(self, name: str):
+        func, depends_on = self._phases[name]
+        start = time.monotonic()
+        logging.debug(f"phase {name} started")
+        try:
+            self._results[name] = func()
+        finally:
+            end = time.monotonic()
+            self._timings[name] = PhaseTiming(
+                name=name,
+                start=start - self._run_start,
+                end=end - self._run_start,
+                depends_on=depends_on,
+            )
+            logging.debug(f"phase {name} finished in {end - start:.3f}s")
+
+    def run(self):
+        """Run all the phases. If a phase raises no new phases are started,
+        the running ones are waited for and the exception is re-raised.
+
+        @return:
+        """
+        self._run_start = time.monotonic()
+        pending = dict(self._phases)
+        running: dict[Future, str] = {}
+        done: set[str] = set()
+        error: Optional[BaseException] = None
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while len(pending) > 0 or len(running) > 0:
+                if error is None:
+                    for name, (_, depends_on) in list(pending.items()):
+                        if all(dependency in done for dependency in depends_on):
+                            running[executor.submit(self._run_phase, name)] = name
+                            del pending[name]
+                if len(running) == 0:
+                    break
+                finished, _ = wait(running.keys(), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    if future.exception() is not None:
+                        logging.error(f"phase {name} failed: {future.exception()}")
+                        error = error or future.exception()
+                    else:
+                        done.add(name)
+        self._run_end = time.monotonic()
+        if error is not None:
+            raise error
+
+    def get_report(self) -> list[PhaseTiming]:
+        """Get the timings of the phases that ran, ordered by start time."""
+        return sorted(self._timings.values(), key=lambda t: t.start)
+
+    def log_report(self, title: str = "phase timings"):
+        """Log the timings of the phases as a single record."""
+        total = (self._run_end or time.monotonic()) - (self._run_start or 0)
+        out = f"{title} (total: {total:.3f}s):\n"
+        for timing in self.get_report():
+            out += (
+                f"\t{timing.name}: +{timing.start:.3f}s -> +{timing.end:.3f}s "
+                f"({timing.duration:.3f}s)\n"
+            )
+        logging.info(out)
+
+    def write_report(self, path: pathlib.Path):
+        """Write the timings of the phases as json."""
+        total = (self._run_end or time.monotonic()) - (self._run_start or 0)
+        report = {
+            "total": total,
+            "phases": [
+                {
+                    "name": timing.name,
+                    "start": timing.start,
+                    "end": timing.end,
+                    "duration": timing.duration,
+                    "depends-on": list(timing.depends_on),
+                }
+                for timing in self.get_report()
+            ],
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
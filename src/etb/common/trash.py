@@ -0,0 +1,129 @@
+"""Fast removal of large directory trees, e.g. the testnet root after a run.
+
+Client databases can hold millions of files, so removing them file by file
+makes cleaning slow. Instead the tree is renamed into a trash dir inside the
+same directory (a rename is atomic and O(1)), after which the trash can be
+deleted in the background by a pool of workers that each unlink the files
+of a directory, one level of the tree at a time.
+
+    <root>/.etb-trash-<time_ns>/   the entries moved out of <root>
+"""
+import logging
+import os
+import pathlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional
+
+TRASH_PREFIX = ".etb-trash-"
+
+
+class DeleteStats(NamedTuple):
+    """What was freed by a delete."""
+
+    files: int
+    dirs: int
+    bytes: int
+    seconds: float
+
+    def __str__(self):
+        return (
+            f"{self.files} files, {self.dirs} dirs, "
+            f"{self.bytes / (1 << 20):.1f} MiB in {self.seconds:.2f}s"
+        )
+
+
+def move_to_trash(root: pathlib.Path) -> Optional[pathlib.Path]:
+    """Move all the entries of root into a new trash dir in root.
+
+    @param root: the directory to empty.
+    @return: the trash dir, None if root was already empty.
+    """
+    entries = [
+        entry
+        for entry in os.scandir(root)
+        if not entry.name.startswith(TRASH_PREFIX)
+    ]
+    if len(entries) == 0:
+        return None
+    trash = root / f"{TRASH_PREFIX}{time.time_ns()}"
+    trash.mkdir()
+    for entry in entries:
+        os.rename(entry.path, trash / entry.name)
+    return trash
+
+
+def _delete_dir_files(path: str) -> tuple[list[str], int, int]:
+    """Unlink the files of a directory.
+
+    @return: (subdirectories, files unlinked, bytes freed)
+    """
+    subdirs, files, freed = [], 0, 0
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+                continue
+            try:
+                freed += entry.stat(follow_symlinks=False).st_blocks * 512
+                os.unlink(entry.path)
+                files += 1
+            except FileNotFoundError:
+                pass
+    return subdirs, files, freed
+
+
+def delete_tree(path: pathlib.Path, max_workers: Optional[int] = None) -> DeleteStats:
+    """Delete a directory tree using a pool of workers.
+
+    @param path: the tree to delete.
+    @param max_workers: the number of workers, defaults to 4 per cpu since
+    the workers mostly wait on the filesystem.
+    @return: what was freed.
+    """
+    start = time.monotonic()
+    if max_workers is None:
+        max_workers = 4 * (os.cpu_count() or 1)
+    files, freed = 0, 0
+    levels: list[list[str]] = []
+    level = [str(path)]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while len(level) > 0:
+            levels.append(level)
+            next_level = []
+            for subdirs, num_files, num_bytes in executor.map(
+                _delete_dir_files, level
+            ):
+                next_level += subdirs
+                files += num_files
+                freed += num_bytes
+            level = next_level
+        # the directories are empty now, remove them deepest first.
+        for level in reversed(levels):
+            list(executor.map(os.rmdir, level))
+    return DeleteStats(
+        files=files,
+        dirs=sum(len(level) for level in levels),
+        bytes=freed,
+        seconds=time.monotonic() - start,
+    )
+
+
+def purge_trash(root: pathlib.Path, max_workers: Optional[int] = None) -> DeleteStats:
+    """Delete all the trash dirs in root.
+
+    @param root: the directory the trash dirs were created in.
+    @param max_workers: the number of workers per trash dir.
+    @return: what was freed in total.
+    """
+    start = time.monotonic()
+    files, dirs, freed = 0, 0, 0
+    for trash in sorted(root.glob(f"{TRASH_PREFIX}*")):
+        stats = delete_tree(trash, max_workers)
+        logging.debug(f"deleted {trash}: {stats}")
+        files += stats.files
+        dirs += stats.dirs
+        freed += stats.bytes
+    return DeleteStats(
+        files=files, dirs=dirs, bytes=freed, seconds=time.monotonic() - start
+    )
@@ -1,8 +1,7 @@
 """Various utility functions that are used throughout common applications."""
 import logging
 
-from web3.auto import w3
-
+from .key_cache import get_derived_key_cache
 from ..config.etb_config import FilesConfig
 
 logging_levels: dict = {
@@ -68,9 +67,6 @@ class PremineKey:
         self.mnemonic: str = mnemonic
         self.account: str = account
         self.passphrase: str = passphrase
-        w3.eth.account.enable_unaudited_hdwallet_features()
-        acct = w3.eth.account.from_mnemonic(
-            mnemonic, account_path=self.account, passphrase=passphrase
-        )
-        self.public_key: str = acct.address
-        self.private_key = acct.key.hex()
+        key = get_derived_key_cache().get_key(mnemonic, self.account, passphrase)
+        self.public_key: str = key.address
+        self.private_key: str = key.private_key
@@ -0,0 +1,229 @@
+"""Writes the docker-compose file(s) of an ETBConfig.
+
+Large testnets have thousands of services. Building the compose file as one
+dict and dumping it at once holds every service (each with its own copy of
+the global env vars) in memory while the pure python emitter works through
+it. The writer builds and dumps the services in chunks instead, on a pool of
+processes for large testnets, and writes them out in order. The output is the
+same as dumping ETBConfig.get_docker_compose_repr().
+
+The services can also be split into several self-contained compose files
+(shards), either one per instance collection or a fixed number of services
+per file, so that no single huge file has to be parsed and the shards can be
+brought up in parallel. The shards are written next to the compose file so
+that the relative volumes and the default project name stay the same:
+
+    <compose dir>/<compose stem>.shard-<collection or number>.yaml
+"""
+import logging
+import multiprocessing
+import pathlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, Optional, Union
+
+from ruamel import yaml
+
+from .etb_config import ETBConfig, Instance
+
+
+class NoAliasDumper(yaml.SafeDumper):
+    """
+    A dumper that will never emit aliases.
+    """
+
+    def ignore_aliases(self, data):
+        return True
+
+
+def _dump(data: dict) -> str:
+    # remove identities and aliases from the yaml file to ease readability
+    # for end users.
+    return yaml.dump(data, Dumper=NoAliasDumper)
+
+
+# the config of the worker processes, set once per process.
+_worker_etb_config: Optional[ETBConfig] = None
+
+
+def _init_worker(etb_config: ETBConfig):
+    global _worker_etb_config
+    _worker_etb_config = etb_config
+
+
+def _dump_services(names: list[str], etb_config: Optional[ETBConfig] = None) -> str:
+    """Dump the service entries of instances as they appear in the services
+    section of a compose file.
+
+    @param names: the sorted instance names.
+    @param etb_config: the config of the instances, defaults to the config
+    of the worker process.
+    @return: the yaml of the services.
+    """
+    if etb_config is None:
+        etb_config = _worker_etb_config
+    global_env_vars = etb_config.get_docker_compose_global_env_vars()
+    out = []
+    for name in names:
+        service = etb_config.get_docker_compose_service(
+            etb_config.get_instance_by_name(name), global_env_vars
+        )
+        # dump the service inside the services mapping so that it is indented
+        # and wrapped the same as in a dump of the whole file.
+        out.append(_dump({"services": {name: service}})[len("services:\n") :])
+    return "".join(out)
+
+
+def _write_compose_file(
+    etb_config: ETBConfig,
+    path: pathlib.Path,
+    chunks: Iterable[str],
+    num_services: int,
+):
+    """Write a compose file from the dumped chunks of its services."""
+    networks = etb_config.get_docker_compose_networks()
+    with open(path, "w", encoding="utf-8") as compose_file:
+        # the dumper sorts the keys, so networks comes before services.
+        compose_file.write(_dump({"networks": networks}))
+        if num_services == 0:
+            compose_file.write("services: {}\n")
+            return
+        compose_file.write("services:\n")
+        for chunk in chunks:
+            compose_file.write(chunk)
+
+
+def _write_shard(
+    path: pathlib.Path, names: list[str], etb_config: Optional[ETBConfig] = None
+):
+    if etb_config is None:
+        etb_config = _worker_etb_config
+    _write_compose_file(
+        etb_config, path, [_dump_services(names, etb_config)], len(names)
+    )
+
+
+class DockerComposeWriter:
+    """Writes the docker-compose file of an ETBConfig service by service.
+
+    - etb_config: the config to write the compose file(s) for.
+    - max_workers: the number of processes used to dump the services.
+    """
+
+    # services dumped per task, smaller testnets are dumped in-process.
+    chunk_size: int = 128
+
+    def __init__(self, etb_config: ETBConfig, max_workers: Optional[int] = None):
+        self.etb_config: ETBConfig = etb_config
+        self.max_workers: Optional[int] = max_workers
+
+    def _get_instances(self) -> tuple[Instance, ...]:
+        return (
+            self.etb_config.get_generic_instances()
+            + self.etb_config.get_client_instances()
+        )
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # spawn the workers, forking while the bootstrapper's threads (e.g.
+        # the trash purge) hold locks can deadlock them.
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.etb_config,),
+        )
+
+    def _chunk(self, names: list[str]) -> list[list[str]]:
+        return [
+            names[ndx : ndx + self.chunk_size]
+            for ndx in range(0, len(names), self.chunk_size)
+        ]
+
+    def write(self, path: pathlib.Path):
+        """Write all the services to a single compose file.
+
+        @param path: the compose file.
+        @return:
+        """
+        names = sorted(instance.name for instance in self._get_instances())
+        chunks = self._chunk(names)
+        if len(chunks) <= 1:
+            _write_compose_file(
+                self.etb_config,
+                path,
+                (_dump_services(chunk, self.etb_config) for chunk in chunks),
+                len(names),
+            )
+            return
+        with self._get_executor() as executor:
+            # map returns the chunks in order as they are done.
+            _write_compose_file(
+                self.etb_config, path, executor.map(_dump_services, chunks), len(names)
+            )
+
+    def get_shards(self, shard_by: Union[str, int]) -> dict[str, list[str]]:
+        """Split the services into shards.
+
+        @param shard_by: "collection" for a shard per instance collection, or
+        the max number of services per shard.
+        @return: the sorted instance names of each shard by shard name.
+        """
+        if shard_by == "collection":
+            collections = (
+                self.etb_config.generic_collections
+                + self.etb_config.client_collections
+            )
+            return {
+                collection.name: sorted(
+                    instance.name
+                    for instance in self.etb_config.get_instances_by_collection(
+                        collection.name
+                    )
+                )
+                for collection in collections
+                if collection.num_nodes > 0
+            }
+        if isinstance(shard_by, int) and shard_by > 0:
+            names = sorted(instance.name for instance in self._get_instances())
+            return {
+                f"{ndx:03d}": names[start : start + shard_by]
+                for ndx, start in enumerate(range(0, len(names), shard_by))
+            }
+        raise Exception(f"Invalid shard_by: {shard_by}, use collection or a number.")
+
+    @staticmethod
+    def get_shard_path(compose_file: pathlib.Path, shard_name: str) -> pathlib.Path:
+        """The path of a shard of a compose file."""
+        return compose_file.with_name(
+            f"{compose_file.stem}.shard-{shard_name}{compose_file.suffix}"
+        )
+
+    @staticmethod
+    def get_shard_files(compose_file: pathlib.Path) -> Iterator[pathlib.Path]:
+        """The shards of a compose file that exist on disk."""
+        return compose_file.parent.glob(
+            f"{compose_file.stem}.shard-*{compose_file.suffix}"
+        )
+
+    def write_shards(
+        self, compose_file: pathlib.Path, shard_by: Union[str, int]
+    ) -> list[pathlib.Path]:
+        """Write the services to several self-contained compose files. Shards
+        of a previous run are removed.
+
+        @param compose_file: the compose file the shards are named after.
+        @param shard_by: see get_shards
+        @return: the shard files.
+        """
+        shards = self.get_shards(shard_by)
+        for stale_shard in self.get_shard_files(compose_file):
+            stale_shard.unlink()
+        paths = [self.get_shard_path(compose_file, name) for name in shards]
+        if len(self._get_instances()) <= self.chunk_size:
+            for path, names in zip(paths, shards.values()):
+                _write_shard(path, names, self.etb_config)
+        else:
+            with self._get_executor() as executor:
+                # list() re-raises the errors of the workers.
+                list(executor.map(_write_shard, paths, shards.values()))
+        logging.debug(f"wrote {len(paths)} docker-compose shards")
+        return paths
@@ -1,10 +1,14 @@
+import hashlib
 import logging
 import pathlib
-import time
-from typing import List, Union
+import pickle
+import sys
+from enum import Enum
+from typing import List, Optional, Union
 
 from ruamel import yaml
 
+from ..common.checkpoint import wait_for_checkpoint
 from ..common.consensus import ConsensusFork, TerminalBlockHash
 from ..common.consensus import (
     PresetEnum,
@@ -93,6 +97,10 @@ class FilesConfig(Config):
             "consensus-bootnode-checkpoint-file": "/data/consensus-bootnode-checkpoint.txt",
             "deposit-contract-deployment-block-hash-file": "/data/deposit-contract-deployment-block-hash.txt",
             "deposit-contract-deployment-block-number-file": "/data/deposit-contract-deployment-block-number.txt",
+            "derived-key-cache-file": "/data/derived-key-cache.json",
+            "etb-cache-dir": "/source/.etb-cache/",  # survives make clean
+            "bootstrap-report-file": "/data/bootstrap-report.json",
+            "etb-config-snapshot-file": "/data/etb-config.pickle",
         }
 
         # el genesis files
@@ -139,6 +147,20 @@ class FilesConfig(Config):
         self.deposit_contract_deployment_block_number_file: pathlib.Path = pathlib.Path(
             fields["deposit-contract" "-deployment-block" "-number-file"]
         )
+        # cache of the accounts derived from the account mnemonic
+        self.derived_key_cache_file: pathlib.Path = pathlib.Path(
+            fields["derived-key-cache-file"]
+        )
+        # cache of generated artifacts that is kept across testnets
+        self.etb_cache_dir: pathlib.Path = pathlib.Path(fields["etb-cache-dir"])
+        # timings of the bootstrap phases
+        self.bootstrap_report_file: pathlib.Path = pathlib.Path(
+            fields["bootstrap-report-file"]
+        )
+        # the resolved etb-config written by the bootstrapper
+        self.etb_config_snapshot_file: pathlib.Path = pathlib.Path(
+            fields["etb-config-snapshot-file"]
+        )
 
         # add optional overrides
         for key, value in optional_overrides.items():
@@ -173,7 +195,33 @@ class TestnetConfig(Config):
         ]  # hash as str.
 
 
+class PeeringTopology(str, Enum):
+    """The topologies the bootstrapper can use to pair the execution
+    clients."""
+
+    FULL_MESH = "full-mesh"
+    RING = "ring"
+    RANDOM_K_REGULAR = "random-k-regular"
+    STAR = "star"
+
+
 class ExecutionLayerTestnetConfig(Config):
+    """Represents the execution layer testnet config found in ETBConfig ->
+    testnet-config -> execution-layer.
+
+    The optional fields are:
+        - peering-topology: how the bootstrapper pairs the execution clients
+            (full-mesh, ring, random-k-regular, star), default full-mesh
+        - peering-degree: the number of peers per client for random-k-regular
+        - premine-ranges: ranges of consecutive accounts to premine, added to
+            the premines (premines may be omitted if this is set). e.g.
+            premine-ranges:
+              - base-path: "m/44'/60'/0'/0"
+                start: 4
+                count: 1000
+                balance: 1000  # in ETH
+    """
+
     def __init__(self, config: dict):
         super().__init__("execution-testnet-config")
 
@@ -183,8 +231,9 @@ class ExecutionLayerTestnetConfig(Config):
             "network-id",
             "account-mnemonic",
             "keystore-passphrase",
-            "premines",
         ]
+        if "premine-ranges" not in config:
+            required_fields.append("premines")
 
         for k in required_fields:
             if k not in config:
@@ -198,9 +247,36 @@ class ExecutionLayerTestnetConfig(Config):
         self.account_mnemonic: str = config["account-mnemonic"]
         self.keystore_passphrase: str = config["keystore-passphrase"]
         self.premines: dict[str, int] = {}
-        for acct, balance in config["premines"].items():
+        for acct, balance in config.get("premines", {}).items():
             self.premines[acct] = balance
 
+        if "premine-ranges" in config:
+            for premine_range in config["premine-ranges"]:
+                for k in ["base-path", "count", "balance"]:
+                    if k not in premine_range:
+                        raise Exception(
+                            f"Missing required field {k} for premine-range: {premine_range}"
+                        )
+                base_path = str(premine_range["base-path"]).rstrip("/")
+                start = int(premine_range.get("start", 0))
+                for ndx in range(start, start + int(premine_range["count"])):
+                    self.premines[f"{base_path}/{ndx}"] = premine_range["balance"]
+
+        self.peering_topology: PeeringTopology = PeeringTopology.FULL_MESH
+        self.peering_degree: int = 4
+
+        if "peering-topology" in config:
+            try:
+                self.peering_topology = PeeringTopology(config["peering-topology"])
+            except ValueError:
+                raise Exception(
+                    f"Unknown peering-topology {config['peering-topology']}, "
+                    f"must be one of {[t.value for t in PeeringTopology]}"
+                )
+
+        if "peering-degree" in config:
+            self.peering_degree = int(config["peering-degree"])
+
 
 class ConsensusLayerTestnetConfig(Config):
     """Represents the consensus layer testnet config found in ETBConfig ->
@@ -559,20 +635,34 @@ class Instance:
 
     This object is used to represent one instance from the generic
     instance collections specified in ETBConfig -> generic-instances
+
+    Testnets can have thousands of instances, so instances are immutable
+    and only store what can't be derived from their collection config.
     """
 
+    __slots__ = ("collection_name", "ndx", "name", "collection_config", "ip_address")
+
     def __init__(
         self,
         collection_name: str,
         ndx: int,
         collection_config: InstanceCollectionConfig,
     ):
-        self.collection_name: str = collection_name
-        self.ndx: int = ndx
-        self.name = f"{collection_name}-{ndx}"
-        self.collection_config: InstanceCollectionConfig = collection_config
+        _set = object.__setattr__
+        _set(self, "collection_name", sys.intern(collection_name))
+        _set(self, "ndx", ndx)
+        _set(self, "name", sys.intern(f"{collection_name}-{ndx}"))
+        _set(self, "collection_config", collection_config)
+        _set(self, "ip_address", sys.intern(self.get_ip_address()))
 
-        self.ip_address: str = self.get_ip_address()
+    def __setattr__(self, key, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, key):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __reduce__(self):
+        return type(self), (self.collection_name, self.ndx, self.collection_config)
 
     def __repr__(self):
         return f"{self.name} ({self.ip_address})"
@@ -655,8 +745,15 @@ class ClientInstance(Instance):
 
     This object is used to represent one instance from the client instance collections specified
     in ETBConfig -> client-instances
+
+    The configs, dirs and files of the instance are derived from its
+    collection config when they are used.
     """
 
+    __slots__ = ("_node_dir",)
+
+    collection_config: ClientInstanceCollectionConfig
+
     def __init__(
         self,
         root_name: str,
@@ -664,45 +761,63 @@ class ClientInstance(Instance):
         collection_config: ClientInstanceCollectionConfig,
     ):
         Instance.__init__(self, root_name, ndx, collection_config)
-        # useful for typing.
-        self.collection_config: ClientInstanceCollectionConfig = collection_config
-        self.consensus_config: ConsensusInstanceConfig = (
-            self.collection_config.consensus_config
-        )
-        self.execution_config: ExecutionInstanceConfig = (
-            self.collection_config.execution_config
-        )
-
-        # when clients are started in docker_compose we do a docker-command to
-        # start both EL and CL.
-        self.docker_command = [
-            f"{self.execution_config.launcher} & {self.consensus_config.launcher}"
-        ]
-
-        # the etb-client will also pass in some additional attrs for this
-        # object to use.
-        self.collection_dir: pathlib.Path = (
-            FilesConfig().local_testnet_dir / self.collection_name
-        )
-        self.node_dir: pathlib.Path = (
-            FilesConfig().local_testnet_dir / self.collection_name / f"node_{ndx}"
-        )
-        self.el_dir: pathlib.Path = self.node_dir / self.execution_config.client
-        self.jwt_secret_file: pathlib.Path = self.node_dir / "jwt_secret"
-
-        # prysm specific
-        self.wallet_password_path: Union[None, pathlib.Path] = None
-        self.validator_password: Union[None, str] = None
+        object.__setattr__(self, "_node_dir", None)
 
         if self.consensus_config.client == "prysm":
-            self.wallet_password_path = self.node_dir / "wallet-password.txt"
             if "validator-password" not in self.collection_config.additional_env:
                 raise Exception(
                     f"prysm config {self.collection_name} validator-password not set in additional-env."
                 )
-            self.validator_password = self.collection_config.additional_env[
-                "validator-password"
-            ]
+
+    @property
+    def consensus_config(self) -> ConsensusInstanceConfig:
+        return self.collection_config.consensus_config
+
+    @property
+    def execution_config(self) -> ExecutionInstanceConfig:
+        return self.collection_config.execution_config
+
+    @property
+    def docker_command(self) -> list[str]:
+        # when clients are started in docker_compose we do a docker-command to
+        # start both EL and CL.
+        return [f"{self.execution_config.launcher} & {self.consensus_config.launcher}"]
+
+    @property
+    def collection_dir(self) -> pathlib.Path:
+        return self.collection_config.collection_dir
+
+    @property
+    def node_dir(self) -> pathlib.Path:
+        # the other dirs and files are in the node dir, so keep it once used.
+        if self._node_dir is None:
+            object.__setattr__(
+                self,
+                "_node_dir",
+                self.collection_config.collection_dir / f"node_{self.ndx}",
+            )
+        return self._node_dir
+
+    @property
+    def el_dir(self) -> pathlib.Path:
+        return self.node_dir / self.execution_config.client
+
+    @property
+    def jwt_secret_file(self) -> pathlib.Path:
+        return self.node_dir / "jwt_secret"
+
+    # prysm specific
+    @property
+    def wallet_password_path(self) -> Union[None, pathlib.Path]:
+        if self.consensus_config.client != "prysm":
+            return None
+        return self.node_dir / "wallet-password.txt"
+
+    @property
+    def validator_password(self) -> Union[None, str]:
+        if self.consensus_config.client != "prysm":
+            return None
+        return self.collection_config.additional_env["validator-password"]
 
     def get_docker_compose_repr(
         self, docker_config: DockerConfig, global_env_vars: dict
@@ -717,13 +832,15 @@ class ClientInstance(Instance):
         """
         entry = super().get_docker_compose_repr(docker_config, global_env_vars)
         # client instances need some additional env vars.
+        node_dir = self.node_dir
+        collection_dir = self.collection_dir
         client_specific_env_vars = {
-            "JWT_SECRET_FILE": str(self.jwt_secret_file),
-            "CONSENSUS_NODE_DIR": str(self.node_dir),
-            "COLLECTION_DIR": str(self.collection_dir),
-            "CONSENSUS_CONFIG_FILE": str(self.collection_dir / "config.yaml"),
-            "CONSENSUS_GENESIS_FILE": str(self.collection_dir / "genesis.ssz"),
-            "EXECUTION_NODE_DIR": str(self.el_dir),
+            "JWT_SECRET_FILE": str(node_dir / "jwt_secret"),
+            "CONSENSUS_NODE_DIR": str(node_dir),
+            "COLLECTION_DIR": str(collection_dir),
+            "CONSENSUS_CONFIG_FILE": str(collection_dir / "config.yaml"),
+            "CONSENSUS_GENESIS_FILE": str(collection_dir / "genesis.ssz"),
+            "EXECUTION_NODE_DIR": str(node_dir / self.execution_config.client),
             "CONSENSUS_GRAFFITI": f"{self.name}",
         }
 
@@ -755,6 +872,61 @@ class ClientInstance(Instance):
         return f"http://{self.ip_address}:{self.consensus_config.beacon_api_port}"
 
 
+class InstanceIndex:
+    """Lookup tables of the instances in an ETBConfig.
+
+    The lists of instances are tuples so they can be shared between
+    callers. Client types and http apis are lower case.
+    """
+
+    def __init__(
+        self,
+        generic_instances: dict[str, list[Instance]],
+        client_instances: dict[str, list[ClientInstance]],
+    ):
+        self.generic_instances: tuple[Instance, ...] = tuple(
+            instance
+            for instances in generic_instances.values()
+            for instance in instances
+        )
+        self.client_instances: tuple[ClientInstance, ...] = tuple(
+            instance
+            for instances in client_instances.values()
+            for instance in instances
+        )
+        self.by_name: dict[str, Instance] = {}
+        self.by_ip: dict[str, Instance] = {}
+        self.by_collection: dict[str, tuple[Instance, ...]] = {}
+        for name, instances in {**generic_instances, **client_instances}.items():
+            self.by_collection[name] = tuple(instances)
+            for instance in instances:
+                self.by_name[instance.name] = instance
+                self.by_ip[instance.ip_address] = instance
+
+        by_execution_client: dict[str, list[ClientInstance]] = {}
+        by_consensus_client: dict[str, list[ClientInstance]] = {}
+        by_http_api: dict[str, list[ClientInstance]] = {}
+        for instance in self.client_instances:
+            by_execution_client.setdefault(
+                instance.execution_config.client.lower(), []
+            ).append(instance)
+            by_consensus_client.setdefault(
+                instance.consensus_config.client.lower(), []
+            ).append(instance)
+            for api in {api.lower() for api in instance.execution_config.http_apis}:
+                by_http_api.setdefault(api, []).append(instance)
+
+        self.by_execution_client: dict[str, tuple[ClientInstance, ...]] = {
+            k: tuple(v) for k, v in by_execution_client.items()
+        }
+        self.by_consensus_client: dict[str, tuple[ClientInstance, ...]] = {
+            k: tuple(v) for k, v in by_consensus_client.items()
+        }
+        self.by_http_api: dict[str, tuple[ClientInstance, ...]] = {
+            k: tuple(v) for k, v in by_http_api.items()
+        }
+
+
 class ETBConfig(Config):
     """Represents the ETBConfig file. This is the main config file for the
     testnet.
@@ -804,11 +976,19 @@ class ETBConfig(Config):
                 name=conf, config=self._config["consensus-configs"][conf]
             )
 
-        # instances should all have the same name, if they don't raise an
-        # exception.
+        # instances should all have unique names, if they don't raise an
+        # exception. The instances themselves are only created when they are
+        # first used (see generic_instances and client_instances).
         _generic_instance_names: dict[str, None] = {}
 
-        self.generic_instances: dict[str, list[Instance]] = {}
+        def _check_instance_names(collection: InstanceCollectionConfig):
+            for ndx in range(collection.num_nodes):
+                instance_name = f"{collection.name}-{ndx}"
+                if instance_name in _generic_instance_names:
+                    raise Exception(f"Found duplicate instance name: {instance_name}")
+                _generic_instance_names[instance_name] = None
+
+        self._generic_instances: Optional[dict[str, list[Instance]]] = None
         self.generic_collections: list[InstanceCollectionConfig] = []
         for name in self._config["generic-instances"]:
             collection_config: InstanceCollectionConfig
@@ -816,17 +996,10 @@ class ETBConfig(Config):
                 name=name, config=self._config["generic-instances"][name]
             )
             self.generic_collections.append(collection_config)
-            self.generic_instances[name] = []
-            for ndx in range(collection_config.num_nodes):
-                instance: Instance = Instance(
-                    collection_name=name, ndx=ndx, collection_config=collection_config
-                )
-                if instance.name in _generic_instance_names:
-                    raise Exception(f"Found duplicate instance name: {instance}")
-                _generic_instance_names[instance.name] = None
-                self.generic_instances[name].append(instance)
+            _check_instance_names(collection_config)
 
-        self.client_instances: dict[str, list[ClientInstance]] = {}
+        self._client_instances: Optional[dict[str, list[ClientInstance]]] = None
+        self._instance_index: Optional[InstanceIndex] = None
         self.client_collections: list[ClientInstanceCollectionConfig] = []
         for name in self._config["client-instances"]:
             el_config: ExecutionInstanceConfig
@@ -846,17 +1019,14 @@ class ETBConfig(Config):
                 execution_config=el_config,
             )
             self.client_collections.append(collection_config)
-
-            self.client_instances[name] = []
-            for ndx in range(collection_config.num_nodes):
-                self.num_client_nodes += 1  # update the client node count.
-                instance: ClientInstance = ClientInstance(
-                    root_name=name, ndx=ndx, collection_config=collection_config
-                )
-                if instance.name in _generic_instance_names:
-                    raise Exception(f"Found duplicate instance name: {instance}")
-                _generic_instance_names[instance.name] = None
-                self.client_instances[name].append(instance)
+            _check_instance_names(collection_config)
+            # prysm instances need a validator-password.
+            if collection_config.num_nodes > 0 and cl_config.client == "prysm":
+                if "validator-password" not in collection_config.additional_env:
+                    raise Exception(
+                        f"prysm config {name} validator-password not set in additional-env."
+                    )
+            self.num_client_nodes += collection_config.num_nodes
 
         # dynamic entries set during bootstrap.
         if "dynamic-entries" not in self._config:
@@ -868,27 +1038,122 @@ class ETBConfig(Config):
         if "genesis-time" in self._config["dynamic-entries"]:
             self.genesis_time = int(self._config["dynamic-entries"]["genesis-time"])
 
-    def get_generic_instances(self) -> List[Instance]:
+    def __getstate__(self):
+        # the instances are cheap to re-create from the collections, don't
+        # store them in snapshots.
+        state = self.__dict__.copy()
+        state["_generic_instances"] = None
+        state["_client_instances"] = None
+        state["_instance_index"] = None
+        return state
+
+    @property
+    def generic_instances(self) -> dict[str, list[Instance]]:
+        """The generic instances by collection name, created on first use."""
+        if self._generic_instances is None:
+            self._generic_instances = {
+                collection.name: [
+                    Instance(
+                        collection_name=collection.name,
+                        ndx=ndx,
+                        collection_config=collection,
+                    )
+                    for ndx in range(collection.num_nodes)
+                ]
+                for collection in self.generic_collections
+            }
+        return self._generic_instances
+
+    @property
+    def client_instances(self) -> dict[str, list[ClientInstance]]:
+        """The client instances by collection name, created on first use."""
+        if self._client_instances is None:
+            self._client_instances = {
+                collection.name: [
+                    ClientInstance(
+                        root_name=collection.name,
+                        ndx=ndx,
+                        collection_config=collection,
+                    )
+                    for ndx in range(collection.num_nodes)
+                ]
+                for collection in self.client_collections
+            }
+        return self._client_instances
+
+    def get_instance_index(self) -> InstanceIndex:
+        """Returns the lookup tables of the instances, built on first use.
+        @return: the InstanceIndex.
+        """
+        if self._instance_index is None:
+            self._instance_index = InstanceIndex(
+                self.generic_instances, self.client_instances
+            )
+        return self._instance_index
+
+    def get_generic_instances(self) -> tuple[Instance, ...]:
         """Returns a list of all generic instances.
         @return: a list of all generic instances.
         """
-        generic_instances: list[Instance] = []
-        for instance in self.generic_instances.values():
-            generic_instances.extend(instance)
-        return generic_instances
+        return self.get_instance_index().generic_instances
 
-    def get_client_instances(self) -> List[ClientInstance]:
+    def get_client_instances(self) -> tuple[ClientInstance, ...]:
         """
         Returns a list of all client instances.
         @return: a list of all client instances.
         """
-        client_instances: list[ClientInstance] = []
-        for instance in self.client_instances.values():
-            client_instances.extend(instance)
-        return client_instances
+        return self.get_instance_index().client_instances
 
-    def get_docker_compose_repr(self) -> dict:
-        """Returns a dictionary representation of the docker-compose.yml file.
+    def get_instance_by_name(self, name: str) -> Optional[Instance]:
+        """Returns the generic or client instance with a name.
+        @param name: the instance name, e.g. prysm-geth-0
+        @return: the instance, None if there is none.
+        """
+        return self.get_instance_index().by_name.get(name)
+
+    def get_instance_by_ip(self, ip_address: str) -> Optional[Instance]:
+        """Returns the generic or client instance with an ip address.
+        @param ip_address: the ip address of the instance.
+        @return: the instance, None if there is none.
+        """
+        return self.get_instance_index().by_ip.get(ip_address)
+
+    def get_instances_by_collection(self, collection: str) -> tuple[Instance, ...]:
+        """Returns the instances of a generic or client instance collection.
+        @param collection: the collection name, e.g. prysm-geth
+        @return: the instances, empty if there is no such collection.
+        """
+        return self.get_instance_index().by_collection.get(collection, ())
+
+    def get_client_instances_by_execution_client(
+        self, client: str
+    ) -> tuple[ClientInstance, ...]:
+        """Returns the client instances that use an execution client.
+        @param client: the execution client, e.g. geth
+        @return: the client instances.
+        """
+        return self.get_instance_index().by_execution_client.get(client.lower(), ())
+
+    def get_client_instances_by_consensus_client(
+        self, client: str
+    ) -> tuple[ClientInstance, ...]:
+        """Returns the client instances that use a consensus client.
+        @param client: the consensus client, e.g. prysm
+        @return: the client instances.
+        """
+        return self.get_instance_index().by_consensus_client.get(client.lower(), ())
+
+    def get_client_instances_by_http_api(self, api: str) -> tuple[ClientInstance, ...]:
+        """Returns the client instances whose execution client has an http api
+        enabled.
+        @param api: the api, e.g. admin, eth or engine
+        @return: the client instances.
+        """
+        return self.get_instance_index().by_http_api.get(api.lower(), ())
+
+    def get_docker_compose_global_env_vars(self) -> dict:
+        """Returns the env vars that are set for every service in the
+        docker-compose file.
 
         @return:
         """
@@ -914,40 +1179,68 @@ class ETBConfig(Config):
         for key, value in override_files.items():
             global_env_vars[key.upper().replace("-", "_")] = str(value)
 
+        return global_env_vars
+
+    def get_docker_compose_service(
+        self, instance: Instance, global_env_vars: dict
+    ) -> dict:
+        """Returns the docker-compose service entry of an instance.
+
+        @param instance: a generic or client instance.
+        @param global_env_vars: see get_docker_compose_global_env_vars
+        @return:
+        """
+        entry = instance.get_docker_compose_repr(
+            docker_config=self.docker, global_env_vars=global_env_vars
+        )
+        if not isinstance(instance, ClientInstance):
+            return entry
+
         execution_genesis_map: dict[str, str] = {
             "geth": str(self.files.geth_genesis_file),
             "besu": str(self.files.besu_genesis_file),
             "nethermind": str(self.files.nether_mind_genesis_file),
         }
-
-        services: dict = {}
-        for instance in self.get_generic_instances():
-            services[instance.name] = instance.get_docker_compose_repr(
-                docker_config=self.docker, global_env_vars=global_env_vars
+        # now add the runtime specific env vars.
+        if instance.execution_config.client not in execution_genesis_map:
+            raise Exception(
+                f"Unknown execution client: {instance.execution_config.client}"
             )
+        entry["environment"]["EXECUTION_GENESIS_FILE"] = execution_genesis_map[
+            instance.execution_config.client
+        ]
+        return entry
 
-        for instance in self.get_client_instances():
-            ci_docker_repr = instance.get_docker_compose_repr(
-                docker_config=self.docker, global_env_vars=global_env_vars
+    def get_docker_compose_networks(self) -> dict:
+        """Returns the networks section of the docker-compose file.
+
+        @return:
+        """
+        return {
+            self.docker.network_name: {
+                "driver": "bridge",
+                "ipam": {"config": [{"subnet": self.docker.ip_subnet}]},
+            }
+        }
+
+    def get_docker_compose_repr(self) -> dict:
+        """Returns a dictionary representation of the docker-compose.yml file.
+
+        For large testnets use DockerComposeWriter, which writes the
+        services one at a time.
+        @return:
+        """
+        global_env_vars = self.get_docker_compose_global_env_vars()
+
+        services: dict = {}
+        for instance in self.get_generic_instances() + self.get_client_instances():
+            services[instance.name] = self.get_docker_compose_service(
+                instance, global_env_vars
             )
-            # now add the runtime specific env vars.
-            if instance.execution_config.client not in execution_genesis_map:
-                raise Exception(
-                    f"Unknown execution client: {instance.execution_config.client}"
-                )
-            ci_docker_repr["environment"][
-                "EXECUTION_GENESIS_FILE"
-            ] = execution_genesis_map[instance.execution_config.client]
-            services[instance.name] = ci_docker_repr
 
         return {
             "services": services,
-            "networks": {
-                self.docker.network_name: {
-                    "driver": "bridge",
-                    "ipam": {"config": [{"subnet": self.docker.ip_subnet}]},
-                }
-            },
+            "networks": self.get_docker_compose_networks(),
         }
 
     # useful operations.
@@ -1033,6 +1326,60 @@ class ETBConfig(Config):
         with open(dest, "w", encoding="utf-8") as etb_config_file:
             yaml.safe_dump(self._config, etb_config_file)
 
+    def write_snapshot(self, dest: pathlib.Path, config_file: pathlib.Path):
+        """Writes a pickled snapshot of the resolved config so that containers
+        don't have to parse and resolve the etb-config again. The snapshot is
+        only used while config_file is unchanged.
+
+        This should only be done by the bootstrapper, after write_config.
+        @param dest: the snapshot file.
+        @param config_file: the etb-config file the snapshot was made for.
+        @return:
+        """
+        header = (ETB_CONFIG_SNAPSHOT_VERSION, _hash_file(config_file))
+        tmp = dest.with_name(f".{dest.name}.tmp")
+        with open(tmp, "wb") as snapshot_file:
+            pickle.dump(header, snapshot_file, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(self, snapshot_file, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp.replace(dest)
+
+
+# bump when the ETBConfig attributes change.
+ETB_CONFIG_SNAPSHOT_VERSION = 2
+
+
+def _hash_file(path: pathlib.Path) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_etb_config_snapshot(
+    snapshot: pathlib.Path, config_file: pathlib.Path
+) -> Optional[ETBConfig]:
+    """Loads an ETBConfig from a snapshot written by ETBConfig.write_snapshot.
+
+    @param snapshot: the snapshot file.
+    @param config_file: the etb-config file the snapshot should be of.
+    @return: the ETBConfig, None if there is no up-to-date snapshot.
+    """
+    if not snapshot.exists():
+        return None
+    try:
+        with open(snapshot, "rb") as snapshot_file:
+            version, config_hash = pickle.load(snapshot_file)
+            if version != ETB_CONFIG_SNAPSHOT_VERSION:
+                logging.debug(f"Ignoring snapshot {snapshot}: version {version}")
+                return None
+            if config_hash != _hash_file(config_file):
+                logging.debug(f"Ignoring snapshot {snapshot}: {config_file} changed")
+                return None
+            etb_config: ETBConfig = pickle.load(snapshot_file)
+    except Exception as e:
+        logging.warning(f"Failed to load etb-config snapshot {snapshot}: {e}")
+        return None
+    etb_config.config_path = config_file
+    return etb_config
+
 
 def get_etb_config() -> ETBConfig:
     """Returns the path to the etb-config.yaml file for running containers on
@@ -1044,7 +1391,9 @@ def get_etb_config() -> ETBConfig:
     path = FilesConfig().etb_config_file
     checkpoint = FilesConfig().etb_config_checkpoint_file
     logging.info("Getting ETBConfig for testnet.")
-    while not checkpoint.exists():
-        time.sleep(1)
-        logging.debug(f"Waiting for checkpoint: {checkpoint}")
+    logging.debug(f"Waiting for checkpoint: {checkpoint}")
+    wait_for_checkpoint(checkpoint)
+    etb_config = load_etb_config_snapshot(FilesConfig().etb_config_snapshot_file, path)
+    if etb_config is not None:
+        return etb_config
     return ETBConfig(path)
@@ -1,6 +1,10 @@
 """Contains all the necessary information and functionality to write the
 consensus config.yaml and genesis.ssz."""
+import hashlib
+import json
 import logging
+import re
+from typing import Optional
 
 from ..common.consensus import (
     ForkVersionName,
@@ -11,6 +15,7 @@ from ..common.consensus import (
 )
 from ..config.etb_config import ETBConfig
 from ..interfaces.external.eth2_testnet_genesis import Eth2TestnetGenesis
+from .genesis_cache import GenesisStateCache
 
 
 class ConsensusGenesisWriter:
@@ -142,25 +147,11 @@ MAX_BLOBS_PER_BLOCK: 4
 """
         return config_file
 
-    def create_consensus_genesis_ssz(self) -> bytes:
-        """Create the consensus genesis state and return the SSZ encoded bytes.
-
-        @return: genesis_ssz as bytes
-        """
-        validator_mnemonic = (
-            self.etb_config.testnet_config.consensus_layer.validator_mnemonic
-        )
-        num_validators = (
-            self.etb_config.testnet_config.consensus_layer.min_genesis_active_validator_count
-        )
+    def _get_preset_args(self) -> list[str]:
+        """Get the preset args for eth2-testnet-genesis."""
         genesis_fork: ConsensusFork = (
             self.etb_config.testnet_config.consensus_layer.get_genesis_fork()
         )
-
-        eth2_testnet_genesis = Eth2TestnetGenesis(
-            validator_mnemonic=validator_mnemonic, num_validators=num_validators
-        )
-
         # set all of the preset args
         preset_args = []
         preset = self.etb_config.testnet_config.consensus_layer.preset_base
@@ -189,11 +180,33 @@ MAX_BLOBS_PER_BLOCK: 4
             preset_args.append("--preset-capella")
             preset_args.append(preset_base_str)
 
+        return preset_args
+
+    def create_consensus_genesis_ssz(self) -> bytes:
+        """Create the consensus genesis state and return the SSZ encoded bytes.
+        The state is also written to the consensus-genesis-file.
+
+        @return: genesis_ssz as bytes
+        """
+        validator_mnemonic = (
+            self.etb_config.testnet_config.consensus_layer.validator_mnemonic
+        )
+        num_validators = (
+            self.etb_config.testnet_config.consensus_layer.min_genesis_active_validator_count
+        )
+        genesis_fork: ConsensusFork = (
+            self.etb_config.testnet_config.consensus_layer.get_genesis_fork()
+        )
+
+        eth2_testnet_genesis = Eth2TestnetGenesis(
+            validator_mnemonic=validator_mnemonic, num_validators=num_validators
+        )
+
         out = eth2_testnet_genesis.get_genesis_ssz(
             genesis_fork_name=genesis_fork.name.name.lower(),
             config_in=self.etb_config.files.consensus_config_file,
             genesis_ssz_out=self.etb_config.files.consensus_genesis_file,
-            preset_args=preset_args,
+            preset_args=self._get_preset_args(),
         )
         # there was an issue
         if isinstance(out, Exception):
@@ -201,5 +214,66 @@ MAX_BLOBS_PER_BLOCK: 4
 
         return out
 
+    def get_genesis_cache_key(self) -> str:
+        """Hash of the genesis state inputs, excluding the genesis time.
+
+        The inputs are the config.yaml, the EL genesis (with the fork times
+        relative to the genesis time) and the validator set. Only the
+        MIN_GENESIS_TIME is left out, with GENESIS_DELAY: 0 the genesis time
+        of the state is the EL genesis timestamp, which is what
+        GenesisStateCache patches on a hit. A different GENESIS_DELAY changes
+        the key, and the cache rebuilds states whose genesis_time doesn't
+        match the EL genesis timestamp.
+        @return: the key as hex.
+        """
+        config_yaml = re.sub(
+            r"^MIN_GENESIS_TIME:.*$",
+            "",
+            self.create_consensus_config_yaml(),
+            flags=re.MULTILINE,
+        )
+        with open(self.etb_config.files.geth_genesis_file, "r", encoding="utf-8") as f:
+            el_genesis = json.load(f)
+        genesis_time = int(el_genesis.pop("timestamp"))
+        for fork_time in ["shanghaiTime", "cancunTime"]:
+            if fork_time in el_genesis["config"]:
+                el_genesis["config"][fork_time] -= genesis_time
+
+        consensus_layer = self.etb_config.testnet_config.consensus_layer
+        h = hashlib.sha256()
+        h.update(config_yaml.encode("utf-8"))
+        h.update(json.dumps(el_genesis, sort_keys=True).encode("utf-8"))
+        h.update(consensus_layer.validator_mnemonic.encode("utf-8"))
+        h.update(str(consensus_layer.min_genesis_active_validator_count).encode())
+        h.update(consensus_layer.get_genesis_fork().name.name.encode("utf-8"))
+        h.update(" ".join(self._get_preset_args()).encode("utf-8"))
+        return h.hexdigest()
+
+    def write_consensus_genesis_ssz(
+        self, eth1_block_hash: str, genesis_cache: Optional[GenesisStateCache] = None
+    ) -> bytes:
+        """Write the consensus genesis state to the consensus-genesis-file,
+        using the cached state for the same inputs if there is one.
+
+        @param eth1_block_hash: the hash of the EL genesis block.
+        @param genesis_cache: the cache to use, None to always build the state.
+        @return: genesis_ssz as bytes
+        """
+        if genesis_cache is None:
+            return self.create_consensus_genesis_ssz()
+
+        key = self.get_genesis_cache_key()
+        genesis_time = self.etb_config.genesis_time
+        genesis_ssz = genesis_cache.get(key, genesis_time, eth1_block_hash)
+        if genesis_ssz is not None:
+            logging.info("Using the cached consensus genesis state.")
+            with open(self.etb_config.files.consensus_genesis_file, "wb") as f:
+                f.write(genesis_ssz)
+            return genesis_ssz
+
+        genesis_ssz = self.create_consensus_genesis_ssz()
+        genesis_cache.put(key, genesis_ssz, genesis_time, eth1_block_hash)
+        return genesis_ssz
+
     def create_consensus_config_yaml(self):
         return self._get_old_version_yaml()
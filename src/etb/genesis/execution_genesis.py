@@ -1,15 +1,18 @@
 """
 This module contains the logic for creating the execution layer genesis files.
-"""
-from typing import Any
 
-from web3.auto import w3
+The alloc is built once and shared by the geth, besu and nethermind genesis
+files. write_genesis_files streams the alloc into each file entry by entry,
+so large allocs are never serialized into one big string.
+"""
+import json
+import pathlib
+from typing import Any, Optional, TextIO
 
 from ..common.consensus import Epoch, ConsensusFork
+from ..common.key_cache import DerivedKey, get_derived_key_cache
 from ..config.etb_config import ETBConfig, ForkVersionName
 
-w3.eth.account.enable_unaudited_hdwallet_features()
-
 
 class ExecutionGenesisWriter:
     """
@@ -19,6 +22,8 @@ class ExecutionGenesisWriter:
     def __init__(self, etb_config: ETBConfig):
         self.etb_config: ETBConfig = etb_config
         self.genesis: dict[str, Any] = {}
+        # built once by get_allocs and shared by all the genesis files.
+        self._allocs: Optional[dict[str, Any]] = None
 
         print(f"got genesis time: {self.etb_config.genesis_time}")
 
@@ -63,7 +68,26 @@ class ExecutionGenesisWriter:
                 // self.etb_config.testnet_config.execution_layer.seconds_per_eth1_block
             )
 
+    def get_premine_keys(self) -> dict[str, DerivedKey]:
+        """Get the derived accounts of the premines.
+
+        @return: {account path: derived key}
+        """
+        mnemonic = self.etb_config.testnet_config.execution_layer.account_mnemonic
+        password = self.etb_config.testnet_config.execution_layer.keystore_passphrase
+        premines = list(self.etb_config.testnet_config.execution_layer.premines)
+        keys = get_derived_key_cache().get_keys(mnemonic, premines, password)
+        return dict(zip(premines, keys))
+
     def get_allocs(self) -> dict:
+        """Get the genesis alloc, shared by all the genesis formats so it
+        must not be modified.
+
+        @return: {address: account}
+        """
+        if self._allocs is not None:
+            return self._allocs
+
         allocs = {}
         # premine allocations
         for x in range(256):
@@ -72,23 +96,27 @@ class ExecutionGenesisWriter:
             }
 
         # account allocations
-        mnemonic = self.etb_config.testnet_config.execution_layer.account_mnemonic
-        password = self.etb_config.testnet_config.execution_layer.keystore_passphrase
         premines = self.etb_config.testnet_config.execution_layer.premines
-
-        for acc in premines:
-            acct = w3.eth.account.from_mnemonic(
-                mnemonic, account_path=acc, passphrase=password
-            )
-            allocs[acct.address] = {"balance": str(premines[acc]) + "0" * 18}
+        for acc, key in self.get_premine_keys().items():
+            allocs[key.address] = {"balance": str(premines[acc]) + "0" * 18}
 
         # deposit contract
         allocs[
             self.etb_config.testnet_config.deposit_contract_address
         ] = deposit_contract_json
 
+        self._allocs = allocs
         return allocs
 
+    def get_besu_private_keys(self) -> dict[str, str]:
+        """Get the private keys besu embeds in the alloc.
+
+        @return: {address: private key without 0x}
+        """
+        return {
+            key.address: key.private_key[2:] for key in self.get_premine_keys().values()
+        }
+
     def create_geth_genesis(self) -> dict:
         """
         Creates a genesis file for geth.
@@ -139,9 +167,11 @@ class ExecutionGenesisWriter:
 
         return self.genesis
 
-    def create_besu_genesis(self) -> dict:
+    def create_besu_genesis(self, embed_private_keys: bool = True) -> dict:
         """
         Creates a genesis file for besu.
+        @param embed_private_keys: add the private keys of the premines to the
+        alloc, write_genesis_files adds them while writing instead.
         """
         # "baseFeePerGas": self.ec["base-fee-per-gas"],
         seconds_per_eth1_block = (
@@ -186,15 +216,13 @@ class ExecutionGenesisWriter:
             self.genesis["config"]["cancunTime"] = self.cancun_fork_time
 
         # besu doesn't use keystores like geth, however you can embed the
-        # accounts in the genesis.
-        mnemonic = self.etb_config.testnet_config.execution_layer.account_mnemonic
-        password = self.etb_config.testnet_config.execution_layer.keystore_passphrase
-        premines = self.etb_config.testnet_config.execution_layer.premines
-        for acc in premines:
-            acct = w3.eth.account.from_mnemonic(
-                mnemonic, account_path=acc, passphrase=password
-            )
-            self.genesis["alloc"][acct.address]["privateKey"] = acct.key.hex()[2:]
+        # accounts in the genesis. The shared alloc isn't modified, only the
+        # premine entries are copied.
+        if embed_private_keys:
+            alloc = dict(self.genesis["alloc"])
+            for address, private_key in self.get_besu_private_keys().items():
+                alloc[address] = {**alloc[address], "privateKey": private_key}
+            self.genesis["alloc"] = alloc
 
         return self.genesis
 
@@ -289,6 +317,66 @@ class ExecutionGenesisWriter:
 
         return self.genesis
 
+    def write_genesis_files(
+        self,
+        geth_genesis_file: pathlib.Path,
+        besu_genesis_file: pathlib.Path,
+        nethermind_genesis_file: pathlib.Path,
+    ):
+        """Write the geth, besu and nethermind genesis files.
+
+        @param geth_genesis_file: path of the geth genesis.
+        @param besu_genesis_file: path of the besu genesis.
+        @param nethermind_genesis_file: path of the nethermind genesis.
+        @return:
+        """
+        with open(geth_genesis_file, "w", encoding="utf-8") as f:
+            write_genesis_json(f, self.create_geth_genesis(), "alloc")
+        with open(besu_genesis_file, "w", encoding="utf-8") as f:
+            write_genesis_json(
+                f,
+                self.create_besu_genesis(embed_private_keys=False),
+                "alloc",
+                self.get_besu_private_keys(),
+            )
+        with open(nethermind_genesis_file, "w", encoding="utf-8") as f:
+            write_genesis_json(f, self.create_nethermind_genesis(), "accounts")
+
+
+def write_genesis_json(
+    out: TextIO,
+    genesis: dict[str, Any],
+    alloc_key: str,
+    private_keys: Optional[dict[str, str]] = None,
+):
+    """Write a genesis as json, streaming the alloc one account at a time.
+
+    The output is the same as json.dump(genesis).
+    @param out: the file to write to.
+    @param genesis: the genesis to write.
+    @param alloc_key: the key of the alloc in the genesis.
+    @param private_keys: optional {address: private key} to add to the
+    accounts as "privateKey" while writing (besu).
+    @return:
+    """
+    out.write("{")
+    for ndx, (key, value) in enumerate(genesis.items()):
+        if ndx > 0:
+            out.write(", ")
+        out.write(f"{json.dumps(key)}: ")
+        if key != alloc_key:
+            out.write(json.dumps(value))
+            continue
+        out.write("{")
+        for acct_ndx, (address, account) in enumerate(value.items()):
+            if private_keys is not None and address in private_keys:
+                account = {**account, "privateKey": private_keys[address]}
+            if acct_ndx > 0:
+                out.write(", ")
+            out.write(f"{json.dumps(address)}: {json.dumps(account)}")
+        out.write("}")
+    out.write("}")
+
 
 # pylint: disable=line-too-long
 deposit_contract_json = {
@@ -0,0 +1,201 @@
+"""Cache of consensus genesis states.
+
+Building the genesis state with eth2-testnet-genesis dominates the bootstrap
+time for large validator counts, but re-bootstrapping the same config only
+changes the genesis time and with it the hash of the EL genesis block. The
+genesis state is stored in the etb-cache-dir keyed by a hash of the inputs
+that don't depend on the genesis time:
+
+    <cache_dir>/consensus-genesis/<key>.ssz    the genesis state
+    <cache_dir>/consensus-genesis/<key>.json   its genesis time and eth1 block hash
+
+On a hit the cached state is patched instead of rebuilt. The fields that
+depend on the genesis time are decoded at their SSZ offsets:
+
+    genesis_time                                      the genesis time
+    eth1_data.block_hash                              the EL genesis block hash
+    randao_mixes                                      the EL genesis block hash
+    latest_execution_payload_header.timestamp         the genesis time
+    latest_execution_payload_header.block_hash        the EL genesis block hash
+
+This relies on the config.yaml setting GENESIS_DELAY to 0, so that the
+genesis time of the state is the timestamp of the EL genesis block. If the
+layout of the state isn't recognized or any of the fields doesn't hold the
+cached value the state is rebuilt.
+"""
+import json
+import logging
+import os
+import pathlib
+import struct
+from typing import NamedTuple, Optional
+
+# the lengths of the BeaconState vectors that depend on the preset:
+# SLOTS_PER_HISTORICAL_ROOT, EPOCHS_PER_HISTORICAL_VECTOR,
+# EPOCHS_PER_SLASHINGS_VECTOR, SYNC_COMMITTEE_SIZE
+PRESET_VECTOR_LENGTHS = {
+    "mainnet": (8192, 65536, 8192, 512),
+    "minimal": (64, 64, 64, 32),
+}
+
+# offsets in the ExecutionPayloadHeader, the same for bellatrix to deneb.
+PAYLOAD_HEADER_TIMESTAMP = 428
+PAYLOAD_HEADER_BLOCK_HASH = 472
+
+
+def _hash_bytes(block_hash: str) -> bytes:
+    return bytes.fromhex(block_hash[2:] if block_hash.startswith("0x") else block_hash)
+
+
+class GenesisStateFields(NamedTuple):
+    """The offsets of the fields of a genesis state that depend on the
+    genesis time."""
+
+    eth1_block_hash: int
+    randao_mixes: int
+    num_randao_mixes: int
+    # None before bellatrix.
+    payload_header: Optional[int]
+
+
+def get_genesis_state_fields(state: bytes) -> Optional[GenesisStateFields]:
+    """Decode the offsets of the patched fields of an SSZ BeaconState. The
+    preset and fork are found by matching the offset of the first variable
+    size field (historical_roots) against the size of the fixed part of
+    each known layout.
+
+    @param state: the ssz encoded BeaconState.
+    @return: the offsets, None if the layout isn't recognized.
+    """
+    for lengths in PRESET_VECTOR_LENGTHS.values():
+        slots_hist, epochs_hist, epochs_slash, sync_size = lengths
+        # genesis_time, genesis_validators_root, slot, fork and
+        # latest_block_header precede block_roots and state_roots.
+        historical_roots = 176 + 2 * 32 * slots_hist
+        # historical_roots offset, eth1_data, eth1_data_votes offset,
+        # eth1_deposit_index, validators and balances offsets.
+        randao_mixes = historical_roots + 4 + 72 + 4 + 8 + 4 + 4
+        slashings = randao_mixes + 32 * epochs_hist
+        # participation (attestations in phase0) offsets, justification
+        # bits and the 3 checkpoints.
+        phase0_end = slashings + 8 * epochs_slash + 4 + 4 + 1 + 3 * 40
+        # inactivity_scores offset and the 2 sync committees.
+        altair_end = phase0_end + 4 + 2 * (48 * sync_size + 48)
+        if len(state) < historical_roots + 4:
+            continue
+        (fixed_size,) = struct.unpack_from("<I", state, historical_roots)
+        if fixed_size in (phase0_end, altair_end):
+            payload_header = None
+        # bellatrix adds the payload header offset, capella the withdrawal
+        # indices and the historical_summaries offset.
+        elif fixed_size in (altair_end + 4, altair_end + 4 + 8 + 8 + 4):
+            (payload_header,) = struct.unpack_from("<I", state, altair_end)
+            if payload_header + PAYLOAD_HEADER_BLOCK_HASH + 32 > len(state):
+                return None
+        else:
+            continue
+        return GenesisStateFields(
+            eth1_block_hash=historical_roots + 4 + 32 + 8,
+            randao_mixes=randao_mixes,
+            num_randao_mixes=epochs_hist,
+            payload_header=payload_header,
+        )
+    return None
+
+
+class GenesisStateCache:
+    """Stores genesis states and patches them for a new genesis time.
+
+    - cache_dir: the directory to cache the states in, None to disable the
+        cache.
+    """
+
+    def __init__(self, cache_dir: Optional[pathlib.Path]):
+        self.cache_dir: Optional[pathlib.Path] = None
+        if cache_dir is not None:
+            self.cache_dir = pathlib.Path(cache_dir) / "consensus-genesis"
+            try:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+            except OSError as e:
+                logging.warning(f"Not caching genesis states in {cache_dir}: {e}")
+                self.cache_dir = None
+
+    def get(
+        self, key: str, genesis_time: int, eth1_block_hash: str
+    ) -> Optional[bytes]:
+        """Get a cached genesis state patched for a genesis time.
+
+        @param key: the cache key of the genesis inputs.
+        @param genesis_time: the new genesis time.
+        @param eth1_block_hash: the hash of the new EL genesis block.
+        @return: the genesis state, None if it isn't cached.
+        """
+        if self.cache_dir is None:
+            return None
+        state_path = self.cache_dir / f"{key}.ssz"
+        meta_path = self.cache_dir / f"{key}.json"
+        if not state_path.exists() or not meta_path.exists():
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(state_path, "rb") as f:
+            state = f.read()
+
+        fields = get_genesis_state_fields(state)
+        if fields is None:
+            logging.warning("Unknown cached genesis state layout, rebuilding it.")
+            return None
+        old_time = int(meta["genesis-time"]).to_bytes(8, "little")
+        new_time = int(genesis_time).to_bytes(8, "little")
+        old_hash = _hash_bytes(meta["eth1-block-hash"])
+        new_hash = _hash_bytes(eth1_block_hash)
+
+        # (offset, cached value, new value) of every patched field.
+        patches = [
+            (0, old_time, new_time),
+            (fields.eth1_block_hash, old_hash, new_hash),
+            # every mix is set to the EL genesis block hash.
+            (
+                fields.randao_mixes,
+                old_hash * fields.num_randao_mixes,
+                new_hash * fields.num_randao_mixes,
+            ),
+        ]
+        if fields.payload_header is not None:
+            patches += [
+                (fields.payload_header + PAYLOAD_HEADER_TIMESTAMP, old_time, new_time),
+                (fields.payload_header + PAYLOAD_HEADER_BLOCK_HASH, old_hash, new_hash),
+            ]
+        patched = bytearray(state)
+        for offset, old, new in patches:
+            if state[offset : offset + len(old)] != old:
+                logging.warning("Cached genesis state doesn't match, rebuilding it.")
+                return None
+            patched[offset : offset + len(new)] = new
+        return bytes(patched)
+
+    def put(self, key: str, state: bytes, genesis_time: int, eth1_block_hash: str):
+        """Cache a genesis state.
+
+        @param key: the cache key of the genesis inputs.
+        @param state: the ssz encoded genesis state.
+        @param genesis_time: the genesis time of the state.
+        @param eth1_block_hash: the hash of the EL genesis block of the state.
+        @return:
+        """
+        if self.cache_dir is None:
+            return
+        # write the state before the metadata, get() needs both.
+        for path, data in [
+            (self.cache_dir / f"{key}.ssz", state),
+            (
+                self.cache_dir / f"{key}.json",
+                json.dumps(
+                    {"genesis-time": genesis_time, "eth1-block-hash": eth1_block_hash}
+                ).encode("utf-8"),
+            ),
+        ]:
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            with open(tmp, "wb") as f:
+                f.write(data)
+            tmp.replace(path)
@@ -0,0 +1,248 @@
+"""An asyncio engine for sending requests to client instances.
+
+All coroutines are run on a single event loop owned by the engine. The loop
+lives in a background thread so that synchronous code (monitors, the
+bootstrapper) can fan out to hundreds of nodes without creating a thread per
+node. The number of in-flight requests is bounded globally.
+"""
+import asyncio
+import atexit
+import threading
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Coroutine, Optional, Union
+
+import aiohttp
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from .client_session import ConnectionStats, report_connection_stats
+
+
+class AsyncRequestEngine:
+    """Runs request coroutines on a shared event loop.
+
+    - max_concurrency: the max number of requests in flight across all nodes.
+    - pool_size: the max number of connections to open per node endpoint.
+    - keep_alive: if False every request closes its connection.
+    """
+
+    def __init__(
+        self, max_concurrency: int = 256, pool_size: int = 4, keep_alive: bool = True
+    ):
+        self.max_concurrency: int = max_concurrency
+        self.pool_size: int = pool_size
+        self.keep_alive: bool = keep_alive
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # these belong to the loop and are created on it.
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._stream_session: Optional[aiohttp.ClientSession] = None
+        # host:port -> connection reuse counters, updated on the loop.
+        self._connection_stats: dict[str, ConnectionStats] = {}
+        self._stats_lock = threading.Lock()
+
+    def configure(
+        self,
+        max_concurrency: Optional[int] = None,
+        pool_size: Optional[int] = None,
+        keep_alive: Optional[bool] = None,
+    ):
+        """Change the concurrency limits. The session is recreated on the
+        next request.
+
+        @param max_concurrency: max number of requests in flight.
+        @param pool_size: max number of connections per node endpoint.
+        @param keep_alive: whether to keep connections open between requests.
+        @return:
+        """
+        if max_concurrency is not None:
+            self.max_concurrency = max_concurrency
+        if pool_size is not None:
+            self.pool_size = pool_size
+        if keep_alive is not None:
+            self.keep_alive = keep_alive
+        if self._loop is not None:
+            self.run(self._close_session())
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """Get the engine's event loop, starting it if needed."""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name="async-request-engine",
+                    daemon=True,
+                )
+                self._thread.start()
+                # close the connections cleanly on interpreter exit.
+                atexit.register(self.close)
+            return self._loop
+
+    def submit(self, coro: Coroutine) -> Future:
+        """Schedule a coroutine on the engine's loop.
+
+        @param coro: the coroutine to run.
+        @return: a concurrent.futures.Future for the result.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._get_loop())
+
+    def run(self, coro: Coroutine) -> Any:
+        """Run a coroutine on the engine's loop and wait for the result.
+
+        @param coro: the coroutine to run.
+        @return: the result of the coroutine.
+        """
+        return self.submit(coro).result()
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_concurrency,
+                limit_per_host=self.pool_size,
+                force_close=not self.keep_alive,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector, trace_configs=[self._get_trace_config()]
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    def _get_trace_config(self) -> aiohttp.TraceConfig:
+        """Count the requests and the new connections per endpoint."""
+
+        async def on_request_start(session, ctx, params):
+            ctx.endpoint = f"{params.url.host}:{params.url.port}"
+            with self._stats_lock:
+                stats = self._connection_stats.setdefault(
+                    ctx.endpoint, ConnectionStats()
+                )
+                stats.num_requests += 1
+
+        async def on_connection_create_end(session, ctx, params):
+            with self._stats_lock:
+                self._connection_stats[ctx.endpoint].num_connections += 1
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        return trace_config
+
+    def get_connection_stats(self) -> dict[str, ConnectionStats]:
+        """Get the connection reuse counters of every endpoint that has been
+        sent a request.
+
+        @return: {host:port: ConnectionStats}
+        """
+        with self._stats_lock:
+            return {
+                endpoint: ConnectionStats(stats.num_requests, stats.num_connections)
+                for endpoint, stats in self._connection_stats.items()
+            }
+
+    def report(self) -> str:
+        """Report the connection reuse counters for all endpoints."""
+        return report_connection_stats(self.get_connection_stats())
+
+    async def _get_stream_session(self) -> aiohttp.ClientSession:
+        # streams are long-lived, they don't count towards the limits.
+        if self._stream_session is None or self._stream_session.closed:
+            connector = aiohttp.TCPConnector(limit=0)
+            self._stream_session = aiohttp.ClientSession(connector=connector)
+        return self._stream_session
+
+    async def _close_session(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        if self._stream_session is not None and not self._stream_session.closed:
+            await self._stream_session.close()
+        self._session = None
+        self._semaphore = None
+        self._stream_session = None
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        json: Union[dict, list, None] = None,
+        timeout: float = 5,
+    ) -> requests.Response:
+        """Perform an http request on the engine's loop.
+
+        The response is returned as a requests.Response so that it can be
+        consumed by the same getters used for the thread-based requests.
+        @param method: the http method (GET/POST)
+        @param url: the url to send the request to.
+        @param json: optional json payload.
+        @param timeout: total timeout for the request.
+        @return: the response, raises on connection errors.
+        """
+        session = await self._get_session()
+        async with self._semaphore:
+            async with session.request(
+                method,
+                url,
+                json=json,
+                timeout=aiohttp.ClientTimeout(total=timeout),
+            ) as resp:
+                body = await resp.read()
+                response = requests.Response()
+                response.status_code = resp.status
+                response.reason = resp.reason
+                response.url = url
+                response.headers = CaseInsensitiveDict(resp.headers)
+                response.encoding = get_encoding_from_headers(response.headers)
+                response._content = body
+                return response
+
+    async def stream(
+        self,
+        url: str,
+        headers: Optional[dict] = None,
+        connect_timeout: float = 5,
+        idle_timeout: Optional[float] = None,
+    ) -> AsyncIterator[bytes]:
+        """Open a long-lived GET request and yield the lines of the body as
+        they arrive.
+
+        @param url: the url to stream.
+        @param headers: optional headers for the request.
+        @param connect_timeout: timeout for connecting to the node.
+        @param idle_timeout: max time to wait for the next line, None to
+        wait forever.
+        @return: the lines of the body, raises on connection errors.
+        """
+        session = await self._get_stream_session()
+        async with session.get(
+            url,
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(
+                total=None, sock_connect=connect_timeout, sock_read=idle_timeout
+            ),
+        ) as resp:
+            resp.raise_for_status()
+            async for line in resp.content:
+                yield line
+
+    def close(self):
+        """Close the session and stop the loop."""
+        with self._lock:
+            loop = self._loop
+        if loop is None:
+            return
+        self.run(self._close_session())
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join()
+        loop.close()
+        atexit.unregister(self.close)
+        with self._lock:
+            self._loop = None
+            self._thread = None
+
+
+# the default engine shared by all ClientInstanceRequests.
+async_request_engine = AsyncRequestEngine()
@@ -0,0 +1,240 @@
+"""A live view of beacon nodes built from their event streams.
+
+Every node is subscribed to /eth/v1/events (server-sent events) from the
+async_request_engine's loop. Head, finalized_checkpoint and chain_reorg
+events update an in-memory NodeView per node, so monitors can read the heads
+and checkpoints of the whole testnet without sending any requests.
+
+Requests are only sent to take a snapshot when a node (re)connects, to fetch
+the justified checkpoints on epoch transitions and finalization, and to fetch
+the graffiti once per new block root.
+"""
+import asyncio
+import copy
+import json
+import logging
+import time
+from concurrent.futures import Future
+from typing import Optional, Union
+
+from ..config.etb_config import ClientInstance
+from .async_request_engine import async_request_engine
+from .client_request import BeaconAPIgetBlockHeader, BeaconAPIgetFinalityCheckpoints
+from .graffiti_cache import BlockGraffitiCache, block_graffiti_cache
+from .retry_policy import ExponentialBackoffRetryPolicy, RetryPolicy
+
+DEFAULT_TOPICS = ("head", "finalized_checkpoint", "chain_reorg")
+
+
+class NodeView:
+    """The latest state of a beacon node as seen from its event stream.
+
+    Slots, epochs and roots are kept as returned by the beacon API.
+    """
+
+    def __init__(self):
+        self.connected: bool = False
+        self.head_slot: Optional[str] = None
+        self.head_root: Optional[str] = None
+        self.head_state_root: Optional[str] = None
+        self.graffiti: Optional[str] = None
+        # (epoch, root)
+        self.finalized: Optional[tuple[str, str]] = None
+        self.current_justified: Optional[tuple[str, str]] = None
+        self.previous_justified: Optional[tuple[str, str]] = None
+        self.num_reorgs: int = 0
+        self.last_reorg_depth: int = 0
+        self.last_update: float = 0.0
+
+    def __str__(self):
+        return (
+            f"connected: {self.connected}, head: ({self.head_slot}, "
+            f"{self.head_root}, {self.graffiti}), finalized: {self.finalized}, "
+            f"reorgs: {self.num_reorgs}"
+        )
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class BeaconEventStream:
+    """Subscribes to the event streams of beacon nodes and keeps a NodeView
+    for each of them.
+
+    - topics: the event topics to subscribe to.
+    - timeout: timeout for connecting and for the snapshot requests.
+    - idle_timeout: reconnect if no event is received for this long.
+    - reconnect_policy: the delay between reconnection attempts.
+    - graffiti_cache: the cache to look up the graffiti of new heads in.
+    """
+
+    def __init__(
+        self,
+        topics: tuple[str, ...] = DEFAULT_TOPICS,
+        timeout: int = 5,
+        idle_timeout: float = 120,
+        reconnect_policy: Optional[RetryPolicy] = None,
+        graffiti_cache: BlockGraffitiCache = block_graffiti_cache,
+    ):
+        self.topics: tuple[str, ...] = topics
+        self.timeout: int = timeout
+        self.idle_timeout: float = idle_timeout
+        self.reconnect_policy: RetryPolicy = (
+            reconnect_policy
+            if reconnect_policy is not None
+            else ExponentialBackoffRetryPolicy(max_delay=30)
+        )
+        self.graffiti_cache: BlockGraffitiCache = graffiti_cache
+
+        self.views: dict[str, NodeView] = {}
+        self._futures: dict[str, Future] = {}
+
+    def start(self, clients: list[ClientInstance]):
+        """Subscribe to the event streams of the clients.
+
+        @param clients: the clients to subscribe to.
+        @return:
+        """
+        for client in clients:
+            if client.name in self._futures:
+                continue
+            self.views[client.name] = NodeView()
+            self._futures[client.name] = async_request_engine.submit(
+                self._subscribe(client)
+            )
+
+    def stop(self):
+        """Close all the event streams."""
+        for future in self._futures.values():
+            future.cancel()
+        self._futures = {}
+
+    def get_view(self, client: ClientInstance) -> Union[Exception, NodeView]:
+        """Get a copy of the latest view of a client.
+
+        @param client: the client to get the view for.
+        @return: the view, or an exception if the client's stream is down.
+        """
+        view = self.views.get(client.name)
+        if view is None:
+            return Exception(f"{client.name} is not subscribed to")
+        if not view.connected or view.head_slot is None:
+            return Exception(f"No live event stream for {client.name}")
+        return copy.copy(view)
+
+    async def async_get_view(
+        self, client: ClientInstance
+    ) -> Union[Exception, NodeView]:
+        """Asyncio version of get_view, reads the view from the loop that
+        updates it."""
+        return self.get_view(client)
+
+    async def _subscribe(self, client: ClientInstance):
+        """Follow the event stream of a client, reconnecting forever."""
+        view = self.views[client.name]
+        url = (
+            f"{client.get_consensus_beacon_api_path()}/eth/v1/events"
+            f"?topics={','.join(self.topics)}"
+        )
+        attempt = 0
+        while True:
+            try:
+                # events missed while disconnected are covered by a snapshot.
+                await self._refresh_head(client, view)
+                await self._refresh_checkpoints(client, view)
+                view.connected = True
+                attempt = 0
+
+                event: Optional[str] = None
+                data: list[str] = []
+                async for raw_line in async_request_engine.stream(
+                    url,
+                    headers={"Accept": "text/event-stream"},
+                    connect_timeout=self.timeout,
+                    idle_timeout=self.idle_timeout,
+                ):
+                    line = raw_line.decode("utf-8").rstrip("\r\n")
+                    if line == "":
+                        if event is not None and len(data) > 0:
+                            await self._handle_event(
+                                client, view, event, json.loads("\n".join(data))
+                            )
+                        event, data = None, []
+                    elif line.startswith(":"):
+                        continue  # comment/keep-alive
+                    else:
+                        field, _, value = line.partition(":")
+                        value = value[1:] if value.startswith(" ") else value
+                        if field == "event":
+                            event = value
+                        elif field == "data":
+                            data.append(value)
+                logging.debug(f"Event stream for {client.name} closed by the node.")
+
+            except asyncio.CancelledError:
+                view.connected = False
+                raise
+            except Exception as e:
+                logging.debug(f"Event stream for {client.name} failed: {e}")
+
+            view.connected = False
+            await asyncio.sleep(self.reconnect_policy.get_delay(attempt))
+            attempt += 1
+
+    async def _handle_event(
+        self, client: ClientInstance, view: NodeView, event: str, data: dict
+    ):
+        view.last_update = time.time()
+        if event == "head":
+            await self._set_head(
+                client, view, data["slot"], data["block"], data["state"]
+            )
+            if data.get("epoch_transition", False):
+                await self._refresh_checkpoints(client, view)
+        elif event == "finalized_checkpoint":
+            view.finalized = (data["epoch"], data["block"])
+            await self._refresh_checkpoints(client, view)
+        elif event == "chain_reorg":
+            view.num_reorgs += 1
+            view.last_reorg_depth = int(data["depth"])
+        else:
+            logging.debug(f"Unhandled event {event} from {client.name}: {data}")
+
+    async def _set_head(
+        self,
+        client: ClientInstance,
+        view: NodeView,
+        slot: str,
+        root: str,
+        state_root: str,
+    ):
+        view.head_slot = slot
+        view.head_root = root
+        view.head_state_root = state_root
+        graffiti = await self.graffiti_cache.async_get_graffiti(client, root)
+        if isinstance(graffiti, Exception):
+            logging.debug(f"Failed to get the graffiti of {root}: {graffiti}")
+            graffiti = None
+        view.graffiti = graffiti
+
+    async def _refresh_head(self, client: ClientInstance, view: NodeView):
+        """Take a snapshot of the client's head, raises on failure."""
+        query = BeaconAPIgetBlockHeader(max_retries=1, timeout=self.timeout)
+        response = await query.async_perform_request(client)
+        if not query.is_valid(response):
+            raise response
+        header = query.get_header(response)
+        await self._set_head(
+            client, view, header["slot"], query.get_root(response), header["state_root"]
+        )
+        view.last_update = time.time()
+
+    async def _refresh_checkpoints(self, client: ClientInstance, view: NodeView):
+        """Fetch the client's finality checkpoints, raises on failure."""
+        query = BeaconAPIgetFinalityCheckpoints(max_retries=1, timeout=self.timeout)
+        response = await query.async_perform_request(client)
+        if not query.is_valid(response):
+            raise response
+        view.finalized = query.get_finalized_checkpoint(response)
+        view.current_justified = query.get_current_justified_checkpoint(response)
+        view.previous_justified = query.get_previous_justified_checkpoint(response)
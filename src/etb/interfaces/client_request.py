@@ -1,17 +1,46 @@
 """Interfaces for sending and receiving requests and responses from CL and EL
 clients across the network."""
 
+import asyncio
 import logging
 import time
 from abc import abstractmethod
 from concurrent.futures import ThreadPoolExecutor, Future
 from enum import Enum
-from typing import Union, Tuple
+from typing import Any, Callable, Optional, Union, Tuple
 
+import aiohttp
 import requests
 from requests import HTTPError
 
 from ..config.etb_config import ClientInstance
+from .async_request_engine import async_request_engine
+from .client_session import client_sessions
+from .response_json import get_response_field, get_response_json
+from .retry_policy import (
+    CircuitBreaker,
+    CircuitBreakerRegistry,
+    CircuitOpenError,
+    RetryPolicy,
+    default_retry_policy,
+)
+
+# errors that mean the node could not be reached, these count towards
+# opening the node's circuit.
+CONNECTION_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    aiohttp.ClientError,
+    asyncio.TimeoutError,
+)
+
+
+# called with (instance, request, duration, exception) after every attempt of
+# every request, exception is None on success. Used to export latencies.
+RequestObserver = Callable[
+    [ClientInstance, "ClientInstanceRequest", float, Optional[Exception]], None
+]
+request_observers: list[RequestObserver] = []
 
 
 class RequestType(str, Enum):
@@ -35,17 +64,30 @@ class ClientInstanceRequest:
     """
 
     def __init__(
-        self, payload: Union[dict, str], max_retries: int = 3, timeout: int = 5
+        self,
+        payload: Union[dict, list, str],
+        max_retries: int = 3,
+        timeout: int = 5,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breakers: Optional[CircuitBreakerRegistry] = None,
     ):
         """A request to a client instance.
 
-        @param payload: the payload, a dictionary for JSONRPC, a string
-        for BeaconAPI. @param max_retries: max number of retries before
-        bailing. @param timeout: timeout to use per request.
+        @param payload: the payload, a dictionary for JSONRPC (a list of
+        them for a JSONRPC batch), a string for BeaconAPI. @param
+        max_retries: max number of retries before bailing. @param
+        timeout: timeout to use per request. @param retry_policy: the
+        delay between retries, defaults to exponential backoff. @param
+        circuit_breakers: optional per-instance circuit breakers, requests
+        to instances with an open circuit fail immediately.
         """
-        self.payload: Union[dict, str] = payload
+        self.payload: Union[dict, list, str] = payload
         self.max_retries: int = max_retries
         self.timeout: int = timeout
+        self.retry_policy: RetryPolicy = (
+            retry_policy if retry_policy is not None else default_retry_policy
+        )
+        self.circuit_breakers: Optional[CircuitBreakerRegistry] = circuit_breakers
 
     @abstractmethod
     def perform_request(
@@ -53,6 +95,13 @@ class ClientInstanceRequest:
     ) -> Union[Exception, requests.Response]:
         """Either returns the response or an exception."""
 
+    @abstractmethod
+    async def async_perform_request(
+        self, instance: ClientInstance
+    ) -> Union[Exception, requests.Response]:
+        """Asyncio version of perform_request, runs on the
+        async_request_engine's loop."""
+
     def is_valid(self, response: Union[requests.Response, Exception]) -> bool:
         """Check if the response is valid.
 
@@ -61,12 +110,52 @@ class ClientInstanceRequest:
         """
         return not isinstance(response, Exception)
 
+    def _get_circuit_breaker(
+        self, instance: ClientInstance
+    ) -> Optional[CircuitBreaker]:
+        if self.circuit_breakers is None:
+            return None
+        return self.circuit_breakers.get_breaker(instance.name)
+
+    def _record_attempt(
+        self,
+        instance: ClientInstance,
+        breaker: Optional[CircuitBreaker],
+        start: float,
+        exception: Optional[Exception] = None,
+    ):
+        """Record the outcome of an attempt on the instance's circuit and
+        notify the request_observers. Only connection errors count as
+        failures for the circuit, any response means the node is up."""
+        duration = time.monotonic() - start
+        for observer in request_observers:
+            observer(instance, self, duration, exception)
+        if breaker is None:
+            return
+        if isinstance(exception, CONNECTION_ERRORS):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
 
 class ExecutionJSONRPCRequest(ClientInstanceRequest):
     """A request to an execution client."""
 
-    def __init__(self, payload: dict, max_retries: int = 3, timeout: int = 5):
-        super().__init__(payload=payload, max_retries=max_retries, timeout=timeout)
+    def __init__(
+        self,
+        payload: Union[dict, list],
+        max_retries: int = 3,
+        timeout: int = 5,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breakers: Optional[CircuitBreakerRegistry] = None,
+    ):
+        super().__init__(
+            payload=payload,
+            max_retries=max_retries,
+            timeout=timeout,
+            retry_policy=retry_policy,
+            circuit_breakers=circuit_breakers,
+        )
 
     def perform_request(
         self, instance: ClientInstance
@@ -79,21 +168,29 @@ class ExecutionJSONRPCRequest(ClientInstanceRequest):
         to. @return: response on success, exception otherwise.
         """
         rpc_endpoint = instance.get_execution_jsonrpc_path()
-        for attempt in range(self.max_retries):
+        breaker = self._get_circuit_breaker(instance)
+        budget = self.retry_policy.start(self.max_retries)
+        attempt = 0
+        while True:
+            if breaker is not None and not breaker.allow_request():
+                return CircuitOpenError(
+                    f"Circuit open for {instance.name}, skipping {rpc_endpoint}"
+                )
+            start = time.monotonic()
             try:
-                response = requests.post(
+                session = client_sessions.get_session(instance)
+                response = session.post(
                     rpc_endpoint, json=self.payload, timeout=self.timeout
                 )
-                # raise an exception based on the response.
-                response.raise_for_status()
-                data = response.json()
-                if "error" in data:
-                    raise ErrorResponse(data["error"])
+                self._check_response(response)
+                self._record_attempt(instance, breaker, start)
                 # response is good, optionally process data here.
                 return response
 
             except (requests.exceptions.RequestException, HTTPError) as e:
-                if attempt < self.max_retries - 1:
+                self._record_attempt(instance, breaker, start, e)
+                delay = budget.next_delay(attempt)
+                if delay is not None:
                     logging.debug(
                         f"{e.strerror} occurred during the API request {rpc_endpoint}. Retrying..."
                     )
@@ -104,7 +201,51 @@ class ExecutionJSONRPCRequest(ClientInstanceRequest):
                     return e
 
             except Exception as e:
-                if attempt < self.max_retries - 1:
+                self._record_attempt(instance, breaker, start, e)
+                delay = budget.next_delay(attempt)
+                if delay is not None:
+                    logging.debug(
+                        f"{e} occurred during the API request {rpc_endpoint}. Retrying..."
+                    )
+                else:
+                    logging.error(
+                        f"Maximum number of retries reached for {rpc_endpoint}"
+                    )
+                    return e
+
+            time.sleep(delay)  # don't spam the clients.
+            attempt += 1
+
+    async def async_perform_request(
+        self, instance: ClientInstance
+    ) -> Union[Exception, requests.Response]:
+        """Asyncio version of perform_request.
+
+        @param instance: client instance to send the request to.
+        @return: response on success, exception otherwise.
+        """
+        rpc_endpoint = instance.get_execution_jsonrpc_path()
+        breaker = self._get_circuit_breaker(instance)
+        budget = self.retry_policy.start(self.max_retries)
+        attempt = 0
+        while True:
+            if breaker is not None and not breaker.allow_request():
+                return CircuitOpenError(
+                    f"Circuit open for {instance.name}, skipping {rpc_endpoint}"
+                )
+            start = time.monotonic()
+            try:
+                response = await async_request_engine.request(
+                    "POST", rpc_endpoint, json=self.payload, timeout=self.timeout
+                )
+                self._check_response(response)
+                self._record_attempt(instance, breaker, start)
+                return response
+
+            except Exception as e:
+                self._record_attempt(instance, breaker, start, e)
+                delay = budget.next_delay(attempt)
+                if delay is not None:
                     logging.debug(
                         f"{e} occurred during the API request {rpc_endpoint}. Retrying..."
                     )
@@ -114,13 +255,110 @@ class ExecutionJSONRPCRequest(ClientInstanceRequest):
                     )
                     return e
 
-            time.sleep(1)  # don't spam the clients.
-        return Exception("Unknown error occurred.")  # should not occur.
+            await asyncio.sleep(delay)  # don't spam the clients.
+            attempt += 1
+
+    def _check_response(self, response: requests.Response):
+        """Raise an exception if the response is an error. Some clients return
+        a 200 status code despite an error.
+
+        @param response: the response to check.
+        @return:
+        """
+        # raise an exception based on the response.
+        response.raise_for_status()
+        data = get_response_json(response)
+        if "error" in data:
+            raise ErrorResponse(data["error"])
+
+
+class ExecutionJSONRPCBatchRequest(ExecutionJSONRPCRequest):
+    """A JSON-RPC 2.0 batch request to an execution client.
+
+    Packs the payloads of many ExecutionJSONRPCRequests into a single POST.
+    Each call is given a unique id (its index in the batch) so that the
+    responses, which may come back in any order, can be split per call.
+    The request only fails as a whole on transport errors or if the client
+    rejects the batch, errors of the individual calls are returned by
+    get_results.
+    """
+
+    def __init__(
+        self,
+        rpc_requests: list[ExecutionJSONRPCRequest],
+        max_retries: int = 3,
+        timeout: int = 5,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breakers: Optional[CircuitBreakerRegistry] = None,
+    ):
+        self.rpc_requests: list[ExecutionJSONRPCRequest] = rpc_requests
+        payload: list[dict] = []
+        for ndx, rpc_request in enumerate(rpc_requests):
+            call = dict(rpc_request.payload)
+            call["id"] = ndx
+            payload.append(call)
+        super().__init__(
+            payload=payload,
+            max_retries=max_retries,
+            timeout=timeout,
+            retry_policy=retry_policy,
+            circuit_breakers=circuit_breakers,
+        )
+
+    def _check_response(self, response: requests.Response):
+        """Raise an exception if the batch as a whole was rejected.
+
+        @param response: the response to check.
+        @return:
+        """
+        response.raise_for_status()
+        data = get_response_json(response)
+        if isinstance(data, dict):
+            # a single error object is returned if the batch is invalid.
+            raise ErrorResponse(data.get("error", data))
+        if not isinstance(data, list):
+            raise ErrorResponse(f"Unexpected batch response: {data}")
+
+    def get_results(
+        self, response: Union[Exception, requests.Response]
+    ) -> Union[Exception, list[Union[Exception, Any]]]:
+        """Get the per call results from the response, if it is valid.
+        Returns exception otherwise.
+
+        @param response: the response from performing this query.
+        @return: a list with an entry for each call, in the order of
+        rpc_requests. Each entry is either the result of the call or an
+        ErrorResponse.
+        """
+        if not self.is_valid(response):
+            return response  # the exception
+
+        results: list[Union[Exception, Any]] = [
+            ErrorResponse(f"No response for call {ndx}")
+            for ndx in range(len(self.rpc_requests))
+        ]
+        for call_response in get_response_json(response):
+            ndx = call_response.get("id")
+            if not isinstance(ndx, int) or not 0 <= ndx < len(results):
+                logging.debug(f"Unexpected id in batch response: {call_response}")
+                continue
+            if "error" in call_response:
+                results[ndx] = ErrorResponse(call_response["error"])
+            else:
+                results[ndx] = call_response.get("result")
+        return results
 
 
 class BeaconAPIRequest(ClientInstanceRequest):
-    def __init__(self, payload: str, max_retries: int = 3, timeout: int = 5):
-        super().__init__(payload, max_retries, timeout)
+    def __init__(
+        self,
+        payload: str,
+        max_retries: int = 3,
+        timeout: int = 5,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breakers: Optional[CircuitBreakerRegistry] = None,
+    ):
+        super().__init__(payload, max_retries, timeout, retry_policy, circuit_breakers)
 
     def perform_request(
         self, instance: ClientInstance
@@ -133,11 +371,21 @@ class BeaconAPIRequest(ClientInstanceRequest):
         """
         beacon_api_endpoint = instance.get_consensus_beacon_api_path()
         request_str = f"{beacon_api_endpoint}{self.payload}"
-        for attempt in range(self.max_retries):
+        breaker = self._get_circuit_breaker(instance)
+        budget = self.retry_policy.start(self.max_retries)
+        attempt = 0
+        while True:
+            if breaker is not None and not breaker.allow_request():
+                return CircuitOpenError(
+                    f"Circuit open for {instance.name}, skipping {request_str}"
+                )
+            start = time.monotonic()
             try:
-                response = requests.get(request_str, timeout=self.timeout)
+                session = client_sessions.get_session(instance)
+                response = session.get(request_str, timeout=self.timeout)
                 # raise an exception based on the response.
                 response.raise_for_status()
+                self._record_attempt(instance, breaker, start)
 
                 return response
 
@@ -145,7 +393,9 @@ class BeaconAPIRequest(ClientInstanceRequest):
                 requests.exceptions.RequestException,
                 HTTPError,
             ) as connection_exception:
-                if attempt < self.max_retries - 1:
+                self._record_attempt(instance, breaker, start, connection_exception)
+                delay = budget.next_delay(attempt)
+                if delay is not None:
                     err = connection_exception.strerror
                     logging.debug(
                         f"{err} occurred during the API request {request_str}. Retrying..."
@@ -157,7 +407,9 @@ class BeaconAPIRequest(ClientInstanceRequest):
                     return connection_exception
 
             except Exception as unexpected_exception:
-                if attempt < self.max_retries - 1:
+                self._record_attempt(instance, breaker, start, unexpected_exception)
+                delay = budget.next_delay(attempt)
+                if delay is not None:
                     err = unexpected_exception
                     logging.debug(
                         f"{err} occurred during the API request {request_str}. Retrying..."
@@ -168,7 +420,53 @@ class BeaconAPIRequest(ClientInstanceRequest):
                     )
                     return unexpected_exception
 
-            time.sleep(1)  # don't spam the clients.
+            time.sleep(delay)  # don't spam the clients.
+            attempt += 1
+
+    async def async_perform_request(
+        self, instance: ClientInstance
+    ) -> Union[Exception, requests.Response]:
+        """Asyncio version of perform_request.
+
+        @param instance: client instance to send the request to.
+        @return: response on success, exception otherwise.
+        """
+        beacon_api_endpoint = instance.get_consensus_beacon_api_path()
+        request_str = f"{beacon_api_endpoint}{self.payload}"
+        breaker = self._get_circuit_breaker(instance)
+        budget = self.retry_policy.start(self.max_retries)
+        attempt = 0
+        while True:
+            if breaker is not None and not breaker.allow_request():
+                return CircuitOpenError(
+                    f"Circuit open for {instance.name}, skipping {request_str}"
+                )
+            start = time.monotonic()
+            try:
+                response = await async_request_engine.request(
+                    "GET", request_str, timeout=self.timeout
+                )
+                # raise an exception based on the response.
+                response.raise_for_status()
+                self._record_attempt(instance, breaker, start)
+
+                return response
+
+            except Exception as e:
+                self._record_attempt(instance, breaker, start, e)
+                delay = budget.next_delay(attempt)
+                if delay is not None:
+                    logging.debug(
+                        f"{e} occurred during the API request {request_str}. Retrying..."
+                    )
+                else:
+                    logging.error(
+                        f"Maximum number of retries reached for {request_str}"
+                    )
+                    return e
+
+            await asyncio.sleep(delay)  # don't spam the clients.
+            attempt += 1
 
 
 def perform_batched_request(
@@ -189,13 +487,36 @@ def perform_batched_request(
     return results_dict
 
 
+async def async_perform_batched_request(
+    req: ClientInstanceRequest, clients: list[ClientInstance]
+) -> dict[ClientInstance, Union[Exception, requests.Response]]:
+    """Asyncio version of perform_batched_request. All the requests are sent
+    concurrently from the async_request_engine's loop, bounded by its
+    max_concurrency.
+
+    @param req: the request to perform.
+    @param clients: the clients to send the request to.
+    @return: the result of req.async_perform_request(client_instance) keyed
+    by client instance.
+    """
+    results = await asyncio.gather(
+        *[req.async_perform_request(client) for client in clients]
+    )
+    return dict(zip(clients, results))
+
+
 class eth_getBlockByNumber(ExecutionJSONRPCRequest):
     """
     eth_getBlockByNumber jsonRPCRequest
     """
 
     def __init__(
-        self, block="latest", _id: int = 1, max_retries: int = 3, timeout: int = 5
+        self,
+        block="latest",
+        _id: int = 1,
+        max_retries: int = 3,
+        timeout: int = 5,
+        retry_policy: Optional[RetryPolicy] = None,
     ):
         payload = {
             "method": "eth_getBlockByNumber",
@@ -207,6 +528,7 @@ class eth_getBlockByNumber(ExecutionJSONRPCRequest):
             payload=payload,
             max_retries=max_retries,
             timeout=timeout,
+            retry_policy=retry_policy,
         )
 
     def get_block(self, response):
@@ -216,7 +538,7 @@ class eth_getBlockByNumber(ExecutionJSONRPCRequest):
         @param response: @return:
         """
         if self.is_valid(response):
-            return response.json()["result"]
+            return get_response_field(response, ("result",))
         else:
             return response
 
@@ -226,7 +548,13 @@ class admin_nodeInfo(ExecutionJSONRPCRequest):
     admin_nodeInfo jsonRPCRequest
     """
 
-    def __init__(self, _id: int = 1, max_retries: int = 3, timeout: int = 5):
+    def __init__(
+        self,
+        _id: int = 1,
+        max_retries: int = 3,
+        timeout: int = 5,
+        retry_policy: Optional[RetryPolicy] = None,
+    ):
         payload = {
             "method": "admin_nodeInfo",
             "params": [],
@@ -237,6 +565,7 @@ class admin_nodeInfo(ExecutionJSONRPCRequest):
             payload=payload,
             max_retries=max_retries,
             timeout=timeout,
+            retry_policy=retry_policy,
         )
 
     def get_enode(
@@ -249,7 +578,7 @@ class admin_nodeInfo(ExecutionJSONRPCRequest):
         @return:
         """
         if self.is_valid(response):
-            return response.json()["result"]["enode"]
+            return get_response_field(response, ("result", "enode"))
         return response  # the exception
 
 
@@ -293,7 +622,63 @@ class BeaconAPIgetBlockV2(BeaconAPIRequest):
         self, response: Union[Exception, requests.Response]
     ) -> Union[Exception, dict]:
         if self.is_valid(response):
-            return response.json()["data"]["message"]
+            return get_response_field(response, ("data", "message"))
+
+        return response  # the exception
+
+    def get_graffiti(
+        self, response: Union[Exception, requests.Response]
+    ) -> Union[Exception, str]:
+        """Get the graffiti of the block from the response, if it is valid.
+        Returns exception otherwise.
+
+        @param response: the response from performing this query.
+        @return: the graffiti decoded as utf-8 with the padding removed.
+        """
+        if self.is_valid(response):
+            graffiti = get_response_field(
+                response, ("data", "message", "body", "graffiti")
+            )
+            return bytes.fromhex(graffiti[2:]).decode("utf-8").replace("\x00", "")
+
+        return response  # the exception
+
+
+class BeaconAPIgetBlockHeader(BeaconAPIRequest):
+    """
+    /eth/v1/beacon/headers/{block_id} beaconAPI request.
+    https://ethereum.github.io/beacon-APIs/#/Beacon/getBlockHeader
+    """
+
+    def __init__(self, block="head", max_retries: int = 3, timeout: int = 5):
+        payload = f"/eth/v1/beacon/headers/{block}"
+        super().__init__(payload=payload, max_retries=max_retries, timeout=timeout)
+
+    def get_root(
+        self, response: Union[Exception, requests.Response]
+    ) -> Union[Exception, str]:
+        """Get the root of the block from the response, if it is valid.
+        Returns exception otherwise.
+
+        @param response: the response from performing this query.
+        @return: the block root.
+        """
+        if self.is_valid(response):
+            return get_response_field(response, ("data", "root"))
+
+        return response  # the exception
+
+    def get_header(
+        self, response: Union[Exception, requests.Response]
+    ) -> Union[Exception, dict]:
+        """Get the header message from the response, if it is valid. Returns
+        exception otherwise.
+
+        @param response: the response from performing this query.
+        @return: {slot, proposer_index, parent_root, state_root, body_root}
+        """
+        if self.is_valid(response):
+            return get_response_field(response, ("data", "header", "message"))
 
         return response  # the exception
 
@@ -338,10 +723,8 @@ class BeaconAPIgetFinalityCheckpoints(BeaconAPIRequest):
         : (epoch: int, root:str)
         """
         if self.is_valid(response):
-            return (
-                response.json()["data"]["finalized"]["epoch"],
-                response.json()["data"]["finalized"]["root"],
-            )
+            checkpoint = get_response_json(response)["data"]["finalized"]
+            return checkpoint["epoch"], checkpoint["root"]
 
         return response  # the exception
 
@@ -356,10 +739,8 @@ class BeaconAPIgetFinalityCheckpoints(BeaconAPIRequest):
         : (epoch: int, root:str)
         """
         if self.is_valid(response):
-            return (
-                response.json()["data"]["previous_justified"]["epoch"],
-                response.json()["data"]["previous_justified"]["root"],
-            )
+            checkpoint = get_response_json(response)["data"]["previous_justified"]
+            return checkpoint["epoch"], checkpoint["root"]
 
         return response  # the exception
 
@@ -374,10 +755,8 @@ class BeaconAPIgetFinalityCheckpoints(BeaconAPIRequest):
         : (epoch: int, root:str)
         """
         if self.is_valid(response):
-            return (
-                response.json()["data"]["current_justified"]["epoch"],
-                response.json()["data"]["current_justified"]["root"],
-            )
+            checkpoint = get_response_json(response)["data"]["current_justified"]
+            return checkpoint["epoch"], checkpoint["root"]
 
         return response  # the exception
 
@@ -387,12 +766,18 @@ class BeaconAPIgetIdentity(BeaconAPIRequest):
     /eth/v1/beacon/identity beaconAPI request.
     """
 
-    def __init__(self, max_retries: int = 3, timeout: int = 5):
+    def __init__(
+        self,
+        max_retries: int = 3,
+        timeout: int = 5,
+        retry_policy: Optional[RetryPolicy] = None,
+    ):
         payload = f"/eth/v1/node/identity"
         super().__init__(
             payload=payload,
             max_retries=max_retries,
             timeout=timeout,
+            retry_policy=retry_policy,
         )
 
     def get_identity(
@@ -406,7 +791,7 @@ class BeaconAPIgetIdentity(BeaconAPIRequest):
         : identity: dict
         """
         if self.is_valid(response):
-            return response.json()["data"]
+            return get_response_field(response, ("data",))
 
         return response
 
@@ -481,6 +866,6 @@ class BeaconAPIgetPeers(BeaconAPIRequest):
         @return:
         """
         if self.is_valid(response):
-            return response.json()["data"]
+            return get_response_field(response, ("data",))
 
         return response  # the exception
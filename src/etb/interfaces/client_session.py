@@ -0,0 +1,147 @@
+"""Pooled, keep-alive HTTP sessions for client instances.
+
+Every request sent to a ClientInstance goes through a requests.Session that is
+owned by that instance, so polls to the same node reuse their TCP connections
+instead of opening a new one per request.
+"""
+import threading
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ..config.etb_config import ClientInstance
+
+
+class ConnectionStats:
+    """Connection reuse counters for a single client instance."""
+
+    def __init__(self, num_requests: int = 0, num_connections: int = 0):
+        self.num_requests: int = num_requests
+        self.num_connections: int = num_connections
+
+    @property
+    def reused(self) -> int:
+        """The number of requests that were sent over an existing
+        connection."""
+        return max(self.num_requests - self.num_connections, 0)
+
+    def __str__(self):
+        return (
+            f"requests: {self.num_requests}, connections: {self.num_connections}, "
+            f"reused: {self.reused}"
+        )
+
+    def __repr__(self):
+        return self.__str__()
+
+
+def report_connection_stats(connection_stats: dict[str, ConnectionStats]) -> str:
+    """Format connection reuse counters one per line, followed by the total.
+
+    @param connection_stats: {name: ConnectionStats}
+    @return: the report.
+    """
+    out = ""
+    total = ConnectionStats()
+    for name, stats in sorted(connection_stats.items()):
+        out += f"{name}: {stats}\n"
+        total.num_requests += stats.num_requests
+        total.num_connections += stats.num_connections
+    out += f"total: {total}\n"
+    return out
+
+
+class ClientInstanceSessionManager:
+    """Hands out one pooled requests.Session per ClientInstance.
+
+    The sessions are shared by all request types and monitors, a client
+    instance hosts both the EL and the CL so each session keeps a pool
+    for both endpoints.
+        - pool_size: the max number of idle connections to keep per endpoint.
+        - keep_alive: if False every request closes its connection.
+    """
+
+    def __init__(self, pool_size: int = 4, keep_alive: bool = True):
+        self.pool_size: int = pool_size
+        self.keep_alive: bool = keep_alive
+        self._sessions: dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def configure(
+        self, pool_size: Optional[int] = None, keep_alive: Optional[bool] = None
+    ):
+        """Change the pool configuration. Existing sessions are closed and
+        will be recreated with the new configuration on their next use.
+
+        @param pool_size: max number of idle connections per endpoint.
+        @param keep_alive: whether to keep connections open between requests.
+        @return:
+        """
+        with self._lock:
+            if pool_size is not None:
+                self.pool_size = pool_size
+            if keep_alive is not None:
+                self.keep_alive = keep_alive
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = {}
+
+    def get_session(self, instance: ClientInstance) -> requests.Session:
+        """Get the session for a client instance, creating it if needed.
+
+        @param instance: the client instance the request is for.
+        @return: the session to use for the request.
+        """
+        session = self._sessions.get(instance.name)
+        if session is not None:
+            return session
+        with self._lock:
+            if instance.name not in self._sessions:
+                self._sessions[instance.name] = self._create_session()
+            return self._sessions[instance.name]
+
+    def _create_session(self) -> requests.Session:
+        session = requests.Session()
+        # one pool for the EL endpoint and one for the CL endpoint (plus
+        # headroom for ws/engine ports).
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        if not self.keep_alive:
+            session.headers["Connection"] = "close"
+        return session
+
+    def get_connection_stats(self) -> dict[str, ConnectionStats]:
+        """Get the connection reuse counters for every client instance that
+        has been sent a request.
+
+        @return: {instance_name: ConnectionStats}
+        """
+        stats: dict[str, ConnectionStats] = {}
+        with self._lock:
+            sessions = dict(self._sessions)
+        for name, session in sessions.items():
+            instance_stats = ConnectionStats()
+            adapter = session.get_adapter("http://")
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                instance_stats.num_requests += pool.num_requests
+                instance_stats.num_connections += pool.num_connections
+            stats[name] = instance_stats
+        return stats
+
+    def report(self) -> str:
+        """Report the connection reuse counters for all client instances."""
+        return report_connection_stats(self.get_connection_stats())
+
+    def close(self):
+        """Close all the sessions."""
+        self.configure()
+
+
+# the default session manager shared by all ClientInstanceRequests.
+client_sessions = ClientInstanceSessionManager()
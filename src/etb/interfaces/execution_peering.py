@@ -0,0 +1,206 @@
+"""Concurrent pairing of execution clients.
+
+The enodes of all the clients are fetched concurrently, then every client is
+sent a single batch of admin_addPeer calls for its neighbours in the
+configured topology. All the clients are paired in parallel from the
+async_request_engine's loop.
+"""
+import asyncio
+import logging
+import random
+import time
+from typing import Optional
+
+import requests
+
+from ..config.etb_config import ClientInstance, PeeringTopology
+from .async_request_engine import async_request_engine
+from .client_request import (
+    ExecutionJSONRPCBatchRequest,
+    admin_addPeer,
+    admin_nodeInfo,
+    async_perform_batched_request,
+)
+from .retry_policy import readiness_retry_policy
+
+
+def get_peering_topology(
+    clients: list[ClientInstance],
+    topology: PeeringTopology,
+    degree: int = 4,
+    rng: Optional[random.Random] = None,
+) -> dict[ClientInstance, list[ClientInstance]]:
+    """Get the neighbours of every client for a topology.
+
+    The edges are undirected, both ends of an edge add each other as a peer.
+        - full-mesh: every client is paired with every other client.
+        - ring: every client is paired with the next and previous client.
+        - random-k-regular: every client is paired with degree random
+            clients (a circulant graph over a random permutation).
+        - star: every client is paired with the first client.
+    @param clients: the clients to pair.
+    @param topology: the topology to use.
+    @param degree: the number of peers per client for random-k-regular.
+    @param rng: the random generator to use for random-k-regular.
+    @return: {client: [neighbours]}
+    """
+    neighbours: dict[ClientInstance, set[ClientInstance]] = {c: set() for c in clients}
+    num_clients = len(clients)
+
+    def add_edge(a: ClientInstance, b: ClientInstance):
+        if a != b:
+            neighbours[a].add(b)
+            neighbours[b].add(a)
+
+    if num_clients < 2:
+        pass
+    elif topology == PeeringTopology.FULL_MESH or (
+        topology == PeeringTopology.RANDOM_K_REGULAR and degree >= num_clients - 1
+    ):
+        for ndx, client in enumerate(clients):
+            for peer in clients[ndx + 1 :]:
+                add_edge(client, peer)
+    elif topology == PeeringTopology.RING:
+        for ndx, client in enumerate(clients):
+            add_edge(client, clients[(ndx + 1) % num_clients])
+    elif topology == PeeringTopology.RANDOM_K_REGULAR:
+        if rng is None:
+            rng = random.Random()
+        shuffled = list(clients)
+        rng.shuffle(shuffled)
+        for ndx, client in enumerate(shuffled):
+            for offset in range(1, degree // 2 + 1):
+                add_edge(client, shuffled[(ndx + offset) % num_clients])
+        # odd degrees are only possible with an even number of clients.
+        if degree % 2 == 1:
+            if num_clients % 2 == 1:
+                raise Exception(
+                    f"random-k-regular with odd degree {degree} requires an even "
+                    f"number of clients, got {num_clients}"
+                )
+            for ndx, client in enumerate(shuffled[: num_clients // 2]):
+                add_edge(client, shuffled[ndx + num_clients // 2])
+    elif topology == PeeringTopology.STAR:
+        for client in clients[1:]:
+            add_edge(clients[0], client)
+    else:
+        raise Exception(f"Unknown peering topology: {topology}")
+
+    # keep the order of the clients for reproducible output.
+    order = {client: ndx for ndx, client in enumerate(clients)}
+    return {
+        client: sorted(peers, key=lambda p: order[p])
+        for client, peers in neighbours.items()
+    }
+
+
+class ExecutionClientPairer:
+    """Pairs execution clients concurrently using admin_addPeer batches.
+
+    - topology: the topology to pair the clients with.
+    - degree: the number of peers per client for random-k-regular.
+    - timeout: the timeout for each rpc request.
+    - node_info_retries: the number of retries when fetching the enodes,
+        clients may take a while to come up.
+    - max_batch_size: clients cap the number of calls in a JSON-RPC batch
+        (geth: 1000) so larger batches are split.
+    """
+
+    def __init__(
+        self,
+        topology: PeeringTopology = PeeringTopology.FULL_MESH,
+        degree: int = 4,
+        timeout: int = 60,
+        node_info_retries: int = 40,
+        max_batch_size: int = 500,
+    ):
+        self.topology: PeeringTopology = topology
+        self.degree: int = degree
+        self.timeout: int = timeout
+        self.node_info_retries: int = node_info_retries
+        self.max_batch_size: int = max_batch_size
+
+    def pair(self, clients: list[ClientInstance]) -> str:
+        """Pair the clients, raises on the first failure.
+
+        @param clients: the clients to pair, they must support the admin
+        api.
+        @return: a timing summary of the pairing.
+        """
+        return async_request_engine.run(self.async_pair(clients))
+
+    async def async_pair(self, clients: list[ClientInstance]) -> str:
+        """Asyncio version of pair."""
+        start = time.monotonic()
+        enodes = await self._get_enodes(clients)
+        enode_time = time.monotonic() - start
+        logging.debug(
+            f"Fetched the following enodes: {enodes} from the execution clients."
+        )
+
+        neighbours = get_peering_topology(clients, self.topology, self.degree)
+        pairing_start = time.monotonic()
+        results = await asyncio.gather(
+            *[
+                self._add_peers(client, [enodes[peer] for peer in peers])
+                for client, peers in neighbours.items()
+            ]
+        )
+        pairing_time = time.monotonic() - pairing_start
+
+        num_calls = sum(len(peers) for peers in neighbours.values())
+        num_batches = sum(results)
+        summary = (
+            f"paired {len(clients)} execution clients ({self.topology.value}): "
+            f"{num_calls} admin_addPeer calls in {num_batches} batches. "
+            f"enodes: {enode_time:.2f}s, pairing: {pairing_time:.2f}s, "
+            f"total: {time.monotonic() - start:.2f}s"
+        )
+        return summary
+
+    async def _get_enodes(
+        self, clients: list[ClientInstance]
+    ) -> dict[ClientInstance, str]:
+        """Fetch the enodes of all the clients concurrently."""
+        rpc_request = admin_nodeInfo(
+            max_retries=self.node_info_retries,
+            timeout=self.timeout,
+            retry_policy=readiness_retry_policy,
+        )
+        enodes: dict[ClientInstance, str] = {}
+        results = await async_perform_batched_request(rpc_request, clients)
+        for client, result in results.items():
+            if not rpc_request.is_valid(result):
+                logging.error(f"Failed to get enode from {client.name}, error: {result}")
+                # bail early
+                raise result
+            enodes[client] = rpc_request.get_enode(result)
+        return enodes
+
+    async def _add_peers(self, client: ClientInstance, peer_enodes: list[str]) -> int:
+        """Add the peers to a client in as few batches as possible.
+
+        @param client: the client to add the peers to.
+        @param peer_enodes: the enodes of the peers.
+        @return: the number of batches sent.
+        """
+        num_batches = 0
+        for ndx in range(0, len(peer_enodes), self.max_batch_size):
+            batch = peer_enodes[ndx : ndx + self.max_batch_size]
+            rpc_request = ExecutionJSONRPCBatchRequest(
+                [admin_addPeer(enode=enode) for enode in batch],
+                timeout=self.timeout,
+            )
+            resp: requests.Response = await rpc_request.async_perform_request(client)
+            num_batches += 1
+            if not rpc_request.is_valid(resp):
+                logging.error(f"admin_addPeer batch on {client} failed with {resp}")
+                # bail early
+                raise resp
+            for enode, result in zip(batch, rpc_request.get_results(resp)):
+                if isinstance(result, Exception):
+                    logging.error(
+                        f"admin_addPeer {enode} on {client} failed with {result}"
+                    )
+                    raise result
+        return num_batches
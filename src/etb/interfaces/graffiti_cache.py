@@ -0,0 +1,78 @@
+"""A cache for the graffiti of beacon blocks.
+
+The graffiti is only available in the full block, so it is fetched once per
+block root and shared by every node and monitor that sees that block.
+"""
+import asyncio
+import threading
+from typing import Union
+
+from ..config.etb_config import ClientInstance
+from .client_request import BeaconAPIgetBlockV2
+
+
+class BlockGraffitiCache:
+    """Graffiti of the most recent blocks, keyed by block root.
+
+    - max_size: the number of block roots to keep.
+    - timeout: the timeout for fetching a block.
+    """
+
+    def __init__(self, max_size: int = 1024, timeout: int = 5):
+        self.max_size: int = max_size
+        self.timeout: int = timeout
+        self._graffiti: dict[str, str] = {}
+        self._lock = threading.Lock()
+        # in-flight fetches on the async_request_engine's loop.
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    def _add(self, root: str, graffiti: str):
+        with self._lock:
+            self._graffiti[root] = graffiti
+            while len(self._graffiti) > self.max_size:
+                del self._graffiti[next(iter(self._graffiti))]
+
+    def get_graffiti(self, client: ClientInstance, root: str) -> Union[Exception, str]:
+        """Get the graffiti of a block, fetching it from the client if it is
+        not cached.
+
+        @param client: the client to fetch the block from.
+        @param root: the root of the block.
+        @return: the graffiti, or an exception if the block couldn't be fetched.
+        """
+        with self._lock:
+            if root in self._graffiti:
+                return self._graffiti[root]
+        query = BeaconAPIgetBlockV2(block=root, max_retries=1, timeout=self.timeout)
+        graffiti = query.get_graffiti(query.perform_request(client))
+        if not isinstance(graffiti, Exception):
+            self._add(root, graffiti)
+        return graffiti
+
+    async def async_get_graffiti(
+        self, client: ClientInstance, root: str
+    ) -> Union[Exception, str]:
+        """Asyncio version of get_graffiti, concurrent lookups of the same
+        root share a single fetch."""
+        with self._lock:
+            if root in self._graffiti:
+                return self._graffiti[root]
+        if root not in self._tasks:
+            self._tasks[root] = asyncio.ensure_future(self._fetch(client, root))
+        return await asyncio.shield(self._tasks[root])
+
+    async def _fetch(self, client: ClientInstance, root: str) -> Union[Exception, str]:
+        try:
+            query = BeaconAPIgetBlockV2(block=root, max_retries=1, timeout=self.timeout)
+            graffiti = query.get_graffiti(await query.async_perform_request(client))
+            if not isinstance(graffiti, Exception):
+                self._add(root, graffiti)
+            return graffiti
+        except Exception as e:
+            return e
+        finally:
+            del self._tasks[root]
+
+
+# the graffiti cache shared by the monitors and event streams.
+block_graffiti_cache = BlockGraffitiCache()
@@ -0,0 +1,166 @@
+"""JSON decoding for client responses.
+
+- get_response_json: parses the body once and caches the result on the
+    response, so that getters reading several fields don't re-parse it.
+- get_response_field: pulls a single field out of the body without building
+    the rest of the document. The values before the field are only scanned
+    for their end and scanning stops at the field, which is much cheaper for
+    small fields of large responses (e.g. the graffiti of a full block).
+
+orjson is used to parse the bodies if it is installed.
+"""
+import json
+import re
+from typing import Any, Sequence, Union
+
+import requests
+
+try:
+    import orjson
+
+    def _loads(content: bytes) -> Any:
+        return orjson.loads(content)
+
+except ImportError:
+
+    def _loads(content: bytes) -> Any:
+        return json.loads(content)
+
+
+# attribute used to cache the parsed body on the response.
+_JSON_ATTR = "_etb_json"
+
+_WHITESPACE = re.compile(rb"[ \t\n\r]*")
+_STRING = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"')
+# a number, true, false or null.
+_SCALAR = re.compile(rb"[^,:\[\]{}\s\"]+")
+# everything up to and including the next bracket outside of a string.
+_TO_BRACKET = re.compile(
+    rb'[^"\[\]{}]*(?:' + _STRING.pattern + rb'[^"\[\]{}]*)*[\[\]{}]'
+)
+
+JSONPath = Sequence[Union[str, int]]
+
+
+def get_response_json(response: requests.Response) -> Any:
+    """Get the parsed body of a response, parsing it only once.
+
+    @param response: the response to parse.
+    @return: the parsed body, raises on invalid json.
+    """
+    if not hasattr(response, _JSON_ATTR):
+        setattr(response, _JSON_ATTR, _loads(response.content))
+    return getattr(response, _JSON_ATTR)
+
+
+def get_response_field(response: requests.Response, path: JSONPath) -> Any:
+    """Get a single field of the body of a response.
+
+    If the body was already parsed the field is read from the cached
+    document, otherwise only the field is parsed out of the body.
+    @param response: the response to read the field from.
+    @param path: the keys/indices of the field, e.g. ("data", "root").
+    @return: the value of the field, raises KeyError/IndexError if it is
+    missing and ValueError on invalid json.
+    """
+    if hasattr(response, _JSON_ATTR):
+        value = getattr(response, _JSON_ATTR)
+        for key in path:
+            value = value[key]
+        return value
+    return extract_json_field(response.content, path)
+
+
+def extract_json_field(content: bytes, path: JSONPath) -> Any:
+    """Extract a field from a json document. The values that are not on the
+    path are scanned over without being decoded, only the field itself is.
+
+    @param content: the utf-8 encoded json document.
+    @param path: the keys/indices of the field.
+    @return: the value of the field.
+    """
+    idx = _WHITESPACE.match(content, 0).end()
+    for key in path:
+        if isinstance(key, str):
+            idx = _find_object_key(content, idx, key)
+        else:
+            idx = _find_array_index(content, idx, key)
+    return _loads(content[idx : _skip_value(content, idx)])
+
+
+def _skip_value(content: bytes, idx: int) -> int:
+    """Get the index right after the value starting at idx."""
+    char = content[idx : idx + 1]
+    if char == b'"':
+        match = _STRING.match(content, idx)
+    elif char in (b"{", b"["):
+        depth = 0
+        match = _TO_BRACKET.match(content, idx)
+        while match is not None:
+            if content[match.end() - 1] in b"{[":
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    break
+            match = _TO_BRACKET.match(content, match.end())
+    else:
+        match = _SCALAR.match(content, idx)
+    if match is None:
+        raise ValueError(f"Expecting value at byte {idx}")
+    return match.end()
+
+
+def _skip_separator(content: bytes, idx: int, end: bytes) -> tuple[int, bool]:
+    """Skip the whitespace and separator after a value.
+
+    @return: (index of the next token, True if the container ended)
+    """
+    idx = _WHITESPACE.match(content, idx).end()
+    if content[idx : idx + 1] == b",":
+        return _WHITESPACE.match(content, idx + 1).end(), False
+    if content[idx : idx + 1] == end:
+        return idx, True
+    raise ValueError(f"Expecting ',' or '{end.decode()}' at byte {idx}")
+
+
+def _find_object_key(content: bytes, idx: int, key: str) -> int:
+    """Get the index of the value of key in the object starting at idx."""
+    if content[idx : idx + 1] != b"{":
+        raise KeyError(key)
+    idx = _WHITESPACE.match(content, idx + 1).end()
+    if content[idx : idx + 1] == b"}":
+        raise KeyError(key)
+    while True:
+        match = _STRING.match(content, idx)
+        if match is None:
+            raise ValueError(f"Expecting property name at byte {idx}")
+        name = match.group()
+        # only decode names with escapes.
+        if b"\\" in name:
+            name = json.loads(name)
+        else:
+            name = name[1:-1].decode("utf-8")
+        idx = _WHITESPACE.match(content, match.end()).end()
+        if content[idx : idx + 1] != b":":
+            raise ValueError(f"Expecting ':' at byte {idx}")
+        idx = _WHITESPACE.match(content, idx + 1).end()
+        if name == key:
+            return idx
+        idx, ended = _skip_separator(content, _skip_value(content, idx), b"}")
+        if ended:
+            raise KeyError(key)
+
+
+def _find_array_index(content: bytes, idx: int, index: int) -> int:
+    """Get the index of the element at index in the array starting at idx."""
+    if content[idx : idx + 1] != b"[":
+        raise IndexError(index)
+    idx = _WHITESPACE.match(content, idx + 1).end()
+    if content[idx : idx + 1] == b"]":
+        raise IndexError(index)
+    for _ in range(index):
+        idx, ended = _skip_separator(content, _skip_value(content, idx), b"]")
+        if ended:
+            raise IndexError(index)
+    return idx
@@ -0,0 +1,197 @@
+"""Retry policies and circuit breakers for requests to client instances.
+
+A RetryPolicy decides how long a request waits between attempts and when it
+gives up. A CircuitBreaker tracks the health of a single client instance
+across all the requests sent to it, so that once a node is known to be dead
+requests to it fail immediately instead of waiting out their timeouts.
+"""
+import random
+import threading
+import time
+from enum import Enum
+from typing import Optional
+
+
+class RetryPolicy:
+    """Fixed delay between attempts.
+
+    - delay: seconds to wait between attempts.
+    - deadline: optional total time budget in seconds for all the attempts
+        of a request. No new attempt is started once it would be exceeded.
+    """
+
+    def __init__(self, delay: float = 1.0, deadline: Optional[float] = None):
+        self.delay: float = delay
+        self.deadline: Optional[float] = deadline
+
+    def get_delay(self, attempt: int) -> float:
+        """The time to wait after a failed attempt.
+
+        @param attempt: the attempt that failed, starting at 0.
+        @return: seconds to wait before the next attempt.
+        """
+        return self.delay
+
+    def start(self, max_retries: int) -> "RetryBudget":
+        """Start tracking the attempts of a request.
+
+        @param max_retries: max number of attempts for the request.
+        @return: the budget for the request.
+        """
+        return RetryBudget(self, max_retries)
+
+
+class ExponentialBackoffRetryPolicy(RetryPolicy):
+    """Exponential backoff with jitter between attempts.
+
+    The delay after attempt n is min(max_delay, initial_delay * multiplier**n)
+    reduced by a random fraction of up to jitter, so that many clients
+    retrying at once don't stay synchronized.
+    """
+
+    def __init__(
+        self,
+        initial_delay: float = 1.0,
+        multiplier: float = 2.0,
+        max_delay: float = 10.0,
+        jitter: float = 0.5,
+        deadline: Optional[float] = None,
+    ):
+        super().__init__(delay=initial_delay, deadline=deadline)
+        self.multiplier: float = multiplier
+        self.max_delay: float = max_delay
+        self.jitter: float = jitter
+
+    def get_delay(self, attempt: int) -> float:
+        delay = min(self.max_delay, self.delay * (self.multiplier**attempt))
+        return delay * (1 - self.jitter * random.random())
+
+
+class RetryBudget:
+    """Tracks the attempts of a single request against its RetryPolicy."""
+
+    def __init__(self, policy: RetryPolicy, max_retries: int):
+        self.policy: RetryPolicy = policy
+        self.max_retries: int = max_retries
+        self.deadline: Optional[float] = None
+        if policy.deadline is not None:
+            self.deadline = time.monotonic() + policy.deadline
+
+    def next_delay(self, attempt: int) -> Optional[float]:
+        """Get the time to wait before the next attempt.
+
+        @param attempt: the attempt that just failed, starting at 0.
+        @return: seconds to wait, or None if the budget is exhausted.
+        """
+        if attempt >= self.max_retries - 1:
+            return None
+        delay = self.policy.get_delay(attempt)
+        if self.deadline is not None and time.monotonic() + delay >= self.deadline:
+            return None
+        return delay
+
+
+class CircuitOpenError(Exception):
+    """The request was not sent because the client's circuit is open."""
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"  # the client is healthy, requests are sent.
+    OPEN = "open"  # the client is failing, requests fail immediately.
+    HALF_OPEN = "half-open"  # a single trial request is allowed.
+
+
+class CircuitBreaker:
+    """Circuit breaker for a single client instance.
+
+    - failure_threshold: consecutive failures before the circuit opens.
+    - reset_timeout: seconds the circuit stays open before a trial request
+        is allowed (half-open). A successful trial closes the circuit, a
+        failed one opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold: int = failure_threshold
+        self.reset_timeout: float = reset_timeout
+
+        self.state: CircuitState = CircuitState.CLOSED
+        self.consecutive_failures: int = 0
+        self.opened_at: float = 0.0
+        self._trial_in_flight: bool = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """Check if a request may be sent to the client.
+
+        @return: True if the request should be sent.
+        """
+        with self._lock:
+            if self.state == CircuitState.CLOSED:
+                return True
+            if self.state == CircuitState.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = CircuitState.HALF_OPEN
+                self._trial_in_flight = False
+            # half-open: only one trial request at a time.
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = CircuitState.CLOSED
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if (
+                self.state == CircuitState.HALF_OPEN
+                or self.consecutive_failures >= self.failure_threshold
+            ):
+                self.state = CircuitState.OPEN
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class CircuitBreakerRegistry:
+    """One CircuitBreaker per client instance, shared by every request that
+    uses the registry."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold: int = failure_threshold
+        self.reset_timeout: float = reset_timeout
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get_breaker(self, instance_name: str) -> CircuitBreaker:
+        """Get the circuit breaker for a client instance.
+
+        @param instance_name: the name of the client instance.
+        @return: the breaker.
+        """
+        with self._lock:
+            if instance_name not in self._breakers:
+                self._breakers[instance_name] = CircuitBreaker(
+                    failure_threshold=self.failure_threshold,
+                    reset_timeout=self.reset_timeout,
+                )
+            return self._breakers[instance_name]
+
+    def get_states(self) -> dict[str, CircuitState]:
+        """Get the state of every client's circuit."""
+        with self._lock:
+            return {name: b.state for name, b in self._breakers.items()}
+
+
+# the default retry policy for requests.
+default_retry_policy = ExponentialBackoffRetryPolicy()
+# polls every second while waiting for clients to come up during the
+# bootstrap, with backoff a client that is up would be noticed up to
+# max_delay late and e.g. 40 retries would wait ~5 minutes instead of ~40s.
+readiness_retry_policy = RetryPolicy(delay=1.0)
+# the circuit breakers shared by all the monitors.
+client_circuit_breakers = CircuitBreakerRegistry()
@@ -0,0 +1,280 @@
+"""An incremental block tree built from the heads reported by the clients.
+
+Every observed head is added to the tree. Parent links are only walked, and
+unknown parents only fetched, when heads differ: to tell a real fork from a
+client that is a few slots behind on the same chain, to find the fork points
+of the branches and to detect reorgs of a client's head. Fetched headers are
+cached in the tree so every block is fetched at most once.
+"""
+import logging
+from typing import Callable, NamedTuple, Optional
+
+from ..config.etb_config import ClientInstance
+
+# (slot, parent_root) of a block root, None if it couldn't be fetched.
+FetchHeader = Callable[[ClientInstance, str], Optional[tuple[int, str]]]
+
+
+class BlockNode:
+    """A block in the tree, the parent root may be unknown until fetched."""
+
+    def __init__(self, root: str, slot: int, parent_root: Optional[str]):
+        self.root: str = root
+        self.slot: int = slot
+        self.parent_root: Optional[str] = parent_root
+
+
+class ReorgEvent(NamedTuple):
+    """A client's head moved to a block that doesn't descend from its
+    previous head."""
+
+    client: str
+    slot: int
+    depth: int  # slots from the previous head back to the common ancestor.
+    old_head: str
+    new_head: str
+
+    def __str__(self):
+        return (
+            f"{self.client} reorged at slot {self.slot} depth {self.depth} "
+            f"(0x{self.old_head[-8:]} -> 0x{self.new_head[-8:]})"
+        )
+
+
+class ForkPoint(NamedTuple):
+    """Where a branch diverges from the canonical branch."""
+
+    slot: int
+    root: str
+    tip: str  # the root of the branch's head.
+    depth: int  # slots from the fork point to the branch's head.
+
+    def __str__(self):
+        return (
+            f"(slot: {self.slot}, root: 0x{self.root[-8:]}, "
+            f"tip: 0x{self.tip[-8:]}, depth: {self.depth})"
+        )
+
+
+class ForkReport(NamedTuple):
+    """The state of the tree after a set of head observations.
+
+    - tips: the heads of the branches, canonical (most clients) first.
+    - branches: {tip: [client names on the branch]}
+    - behind: clients whose head is an ancestor of several tips, i.e. below
+        a fork point.
+    - unresolved: clients whose branch couldn't be resolved, e.g. more than
+        max_walk slots behind or their headers couldn't be fetched.
+    """
+
+    num_forks: int
+    tips: list[str]
+    fork_points: list[ForkPoint]
+    branches: dict[str, list[str]]
+    behind: list[str]
+    unresolved: list[str]
+    reorgs: list[ReorgEvent]
+
+
+class ForkTree:
+    """Block tree indexed by root.
+
+    - fetch_header: fetches the (slot, parent_root) of a block from a client.
+    - max_walk: max number of parent links to follow per walk.
+    - prune_slots: blocks this many slots below the highest head are dropped.
+    """
+
+    def __init__(
+        self, fetch_header: FetchHeader, max_walk: int = 64, prune_slots: int = 512
+    ):
+        self.fetch_header: FetchHeader = fetch_header
+        self.max_walk: int = max_walk
+        self.prune_slots: int = prune_slots
+
+        self.blocks: dict[str, BlockNode] = {}
+        # client name -> root of its last observed head.
+        self.client_heads: dict[str, str] = {}
+        self.num_reorgs: dict[str, int] = {}
+
+    def add_block(self, root: str, slot: int, parent_root: Optional[str] = None):
+        node = self.blocks.get(root)
+        if node is None:
+            self.blocks[root] = BlockNode(root, slot, parent_root)
+        elif node.parent_root is None:
+            node.parent_root = parent_root
+
+    def _get_parent(
+        self, node: BlockNode, client: ClientInstance
+    ) -> Optional[BlockNode]:
+        """Get the parent of a block, fetching the headers we are missing
+        from the client."""
+        if node.parent_root is None:
+            header = self.fetch_header(client, node.root)
+            if header is None:
+                return None
+            node.parent_root = header[1]
+        if node.parent_root not in self.blocks:
+            header = self.fetch_header(client, node.parent_root)
+            if header is None:
+                return None
+            self.add_block(node.parent_root, header[0], header[1])
+        return self.blocks[node.parent_root]
+
+    def is_ancestor(
+        self, ancestor_root: str, root: str, client: ClientInstance
+    ) -> Optional[bool]:
+        """Check if a block is an ancestor of (or equal to) another block.
+
+        @param ancestor_root: the possible ancestor.
+        @param root: the descendant.
+        @param client: the client to fetch the descendant's chain from.
+        @return: the result, None if the chain couldn't be walked.
+        """
+        ancestor = self.blocks[ancestor_root]
+        node = self.blocks[root]
+        for _ in range(self.max_walk):
+            if node.slot <= ancestor.slot:
+                return node.root == ancestor_root
+            node = self._get_parent(node, client)
+            if node is None:
+                return None
+        return None
+
+    def common_ancestor(
+        self,
+        root_a: str,
+        client_a: ClientInstance,
+        root_b: str,
+        client_b: ClientInstance,
+    ) -> Optional[BlockNode]:
+        """Get the latest common ancestor of two blocks.
+
+        @return: the ancestor, None if it is further than max_walk away.
+        """
+        node_a, node_b = self.blocks[root_a], self.blocks[root_b]
+        for _ in range(2 * self.max_walk):
+            if node_a.root == node_b.root:
+                return node_a
+            if node_a.slot >= node_b.slot:
+                node_a = self._get_parent(node_a, client_a)
+            else:
+                node_b = self._get_parent(node_b, client_b)
+            if node_a is None or node_b is None:
+                return None
+        return None
+
+    def observe(
+        self, heads: dict[ClientInstance, tuple[int, Optional[str], Optional[str]]]
+    ) -> ForkReport:
+        """Add the heads of the clients to the tree.
+
+        @param heads: {client: (slot, root, parent_root)}, the parent may be
+        None if unknown.
+        @return: the forks and the reorgs since the previous observation.
+        """
+        reorgs: list[ReorgEvent] = []
+        root_clients: dict[str, list[ClientInstance]] = {}
+        for client, (slot, root, parent_root) in heads.items():
+            if root is None:
+                continue
+            self.add_block(root, int(slot), parent_root)
+            root_clients.setdefault(root, []).append(client)
+
+            old_root = self.client_heads.get(client.name)
+            self.client_heads[client.name] = root
+            if old_root is None or old_root == root or old_root not in self.blocks:
+                continue
+            ancestor = self.common_ancestor(old_root, client, root, client)
+            if ancestor is None:
+                logging.debug(f"Could not resolve the head history of {client.name}")
+            elif ancestor.root != old_root:
+                event = ReorgEvent(
+                    client=client.name,
+                    slot=int(slot),
+                    depth=self.blocks[old_root].slot - ancestor.slot,
+                    old_head=old_root,
+                    new_head=root,
+                )
+                reorgs.append(event)
+                self.num_reorgs[client.name] = self.num_reorgs.get(client.name, 0) + 1
+
+        # the tips are the heads that don't have another head as descendant.
+        # A head whose ancestry can't be walked (too far behind, or a header
+        # fetch failed) is unresolved rather than a tip of its own.
+        roots = sorted(
+            root_clients.keys(), key=lambda r: self.blocks[r].slot, reverse=True
+        )
+        tips: list[str] = []
+        unresolved_roots: set[str] = set()
+        for root in roots:
+            results = [
+                self.is_ancestor(root, tip, root_clients[tip][0]) for tip in tips
+            ]
+            if True in results:
+                continue
+            if None in results:
+                unresolved_roots.add(root)
+            else:
+                tips.append(root)
+
+        branches: dict[str, list[str]] = {tip: [] for tip in tips}
+        behind: list[str] = []
+        unresolved: list[str] = []
+        for root in roots:
+            if root in unresolved_roots:
+                unresolved += [client.name for client in root_clients[root]]
+                continue
+            on_tips = [
+                tip
+                for tip in tips
+                if self.is_ancestor(root, tip, root_clients[tip][0])
+            ]
+            names = [client.name for client in root_clients[root]]
+            if len(on_tips) == 1:
+                branches[on_tips[0]] += names
+            elif len(on_tips) > 1:
+                behind += names
+            else:
+                unresolved += names
+
+        # the canonical branch is the one with the most clients.
+        tips.sort(key=lambda t: (len(branches[t]), self.blocks[t].slot), reverse=True)
+        branches = {tip: branches[tip] for tip in tips}
+
+        fork_points: list[ForkPoint] = []
+        for tip in tips[1:]:
+            ancestor = self.common_ancestor(
+                tips[0], root_clients[tips[0]][0], tip, root_clients[tip][0]
+            )
+            # a depth of 0 means the tip is on the canonical branch.
+            if ancestor is not None and ancestor.root != tip:
+                fork_points.append(
+                    ForkPoint(
+                        slot=ancestor.slot,
+                        root=ancestor.root,
+                        tip=tip,
+                        depth=self.blocks[tip].slot - ancestor.slot,
+                    )
+                )
+
+        self._prune()
+        return ForkReport(
+            num_forks=max(len(tips) - 1, 0),
+            tips=tips,
+            fork_points=fork_points,
+            branches=branches,
+            behind=behind,
+            unresolved=unresolved,
+            reorgs=reorgs,
+        )
+
+    def _prune(self):
+        if len(self.blocks) == 0:
+            return
+        min_slot = max(node.slot for node in self.blocks.values()) - self.prune_slots
+        heads = set(self.client_heads.values())
+        self.blocks = {
+            root: node
+            for root, node in self.blocks.items()
+            if node.slot >= min_slot or root in heads
+        }
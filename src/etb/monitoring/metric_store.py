@@ -0,0 +1,291 @@
+"""Append-only on-disk storage for monitor results.
+
+Every observation is a (slot, client, value) record. Each metric is stored
+in its own directory, split into chunks that each cover slots_per_chunk
+slots:
+
+    <root>/clients.json                client name -> id table
+    <root>/store.json                  the slots_per_chunk of the store
+    <root>/<metric>/<start_slot>.dat   the records of the chunk
+    <root>/<metric>/<start_slot>.idx   (slot, offset) of the first record of
+                                       every slot in the chunk
+
+A record is a fixed header (slot: u64, client id: u32, value length: u32)
+followed by the value encoded as compact json. Queries over a slot range only
+read the chunks that cover it and seek straight to the first slot using the
+index, so nothing has to be re-parsed from the logs.
+"""
+import bisect
+import json
+import logging
+import pathlib
+import struct
+import threading
+from array import array
+from typing import Any, BinaryIO, Callable, Iterator, Optional
+
+RECORD_HEADER = struct.Struct("<QII")
+INDEX_ENTRY = struct.Struct("<QQ")
+
+
+class _ChunkWriter:
+    """The open data and index files of the chunk being written to."""
+
+    def __init__(self, data_path: pathlib.Path, index_path: pathlib.Path):
+        self.data: BinaryIO = data_path.open("ab")
+        self.index: BinaryIO = index_path.open("ab")
+        self.last_slot: Optional[int] = None
+        # resume after the last indexed slot when reopening a chunk.
+        index_size = index_path.stat().st_size
+        if index_size >= INDEX_ENTRY.size:
+            with index_path.open("rb") as f:
+                f.seek(index_size - INDEX_ENTRY.size)
+                self.last_slot, _ = INDEX_ENTRY.unpack(f.read(INDEX_ENTRY.size))
+
+    def append(self, slot: int, records: list[tuple[int, bytes]]) -> bool:
+        """Append the records of a slot. The index only points to the first
+        record of each slot, so slots before the last one are rejected.
+
+        @return: True if the records were written.
+        """
+        if self.last_slot is not None and slot < self.last_slot:
+            return False
+        offset = self.data.tell()
+        if self.last_slot is None or slot > self.last_slot:
+            self.index.write(INDEX_ENTRY.pack(slot, offset))
+            self.last_slot = slot
+        for client_id, value in records:
+            self.data.write(RECORD_HEADER.pack(slot, client_id, len(value)))
+            self.data.write(value)
+        # readers may query the store while the monitors are running.
+        self.data.flush()
+        self.index.flush()
+        return True
+
+    def close(self):
+        self.data.close()
+        self.index.close()
+
+
+class MetricStore:
+    """Stores the per client results of the monitors by slot.
+
+    - root: the directory to store the metrics in.
+    - get_slot: returns the current slot, used when recording results.
+    - slots_per_chunk: the number of slots in each chunk file, defaults to
+        the one the store was created with (or 1024 for a new store).
+    """
+
+    default_slots_per_chunk: int = 1024
+
+    def __init__(
+        self,
+        root: pathlib.Path,
+        get_slot: Optional[Callable[[], int]] = None,
+        slots_per_chunk: Optional[int] = None,
+    ):
+        self.root: pathlib.Path = pathlib.Path(root)
+        self.get_slot: Optional[Callable[[], int]] = get_slot
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.slots_per_chunk: int = self._load_slots_per_chunk(slots_per_chunk)
+
+        self._lock = threading.Lock()
+        # metric -> (chunk start slot, writer)
+        self._writers: dict[str, tuple[int, _ChunkWriter]] = {}
+        self._client_ids: dict[str, int] = {}
+        self._client_names: dict[int, str] = {}
+        self._load_clients()
+
+    @classmethod
+    def open(cls, root: pathlib.Path) -> "MetricStore":
+        """Open an existing store to query it, without creating anything.
+
+        @param root: the directory of the store.
+        @return: the store, raises if root isn't a metric store.
+        """
+        if not (pathlib.Path(root) / "store.json").exists():
+            raise Exception(f"{root} is not a metric store.")
+        return cls(root)
+
+    def _load_slots_per_chunk(self, slots_per_chunk: Optional[int]) -> int:
+        """Get the slots_per_chunk of the store, the chunks can only be found
+        with the one they were written with."""
+        store_path = self.root / "store.json"
+        if store_path.exists():
+            with store_path.open("r") as f:
+                stored = json.load(f)["slots_per_chunk"]
+            if slots_per_chunk is not None and slots_per_chunk != stored:
+                raise Exception(
+                    f"MetricStore {self.root} uses {stored} slots per chunk, "
+                    f"not {slots_per_chunk}."
+                )
+            return stored
+        if slots_per_chunk is None:
+            slots_per_chunk = self.default_slots_per_chunk
+        tmp = store_path.with_suffix(".tmp")
+        with tmp.open("w") as f:
+            json.dump({"slots_per_chunk": slots_per_chunk}, f)
+        tmp.replace(store_path)
+        return slots_per_chunk
+
+    def _clients_path(self) -> pathlib.Path:
+        return self.root / "clients.json"
+
+    def _load_clients(self):
+        if self._clients_path().exists():
+            with self._clients_path().open("r") as f:
+                self._client_ids = json.load(f)
+        self._client_names = {v: k for k, v in self._client_ids.items()}
+
+    def _get_client_id(self, name: str) -> int:
+        if name not in self._client_ids:
+            client_id = len(self._client_ids)
+            self._client_ids[name] = client_id
+            self._client_names[client_id] = name
+            tmp = self._clients_path().with_suffix(".tmp")
+            with tmp.open("w") as f:
+                json.dump(self._client_ids, f)
+            tmp.replace(self._clients_path())
+        return self._client_ids[name]
+
+    def _chunk_start(self, slot: int) -> int:
+        return slot - (slot % self.slots_per_chunk)
+
+    def _get_writer(self, metric: str, slot: int) -> _ChunkWriter:
+        chunk_start = self._chunk_start(slot)
+        if metric in self._writers:
+            start, writer = self._writers[metric]
+            if start == chunk_start:
+                return writer
+            writer.close()
+        metric_dir = self.root / metric
+        metric_dir.mkdir(exist_ok=True)
+        writer = _ChunkWriter(
+            metric_dir / f"{chunk_start}.dat", metric_dir / f"{chunk_start}.idx"
+        )
+        self._writers[metric] = (chunk_start, writer)
+        return writer
+
+    def append(self, metric: str, slot: int, results: dict[str, Any]):
+        """Append the results of a metric for a slot.
+
+        @param metric: the name of the metric.
+        @param slot: the slot the results were observed at.
+        @param results: {client_name: json serializable value}
+        @return:
+        """
+        with self._lock:
+            records = [
+                (
+                    self._get_client_id(name),
+                    json.dumps(value, separators=(",", ":")).encode("utf-8"),
+                )
+                for name, value in results.items()
+            ]
+            if not self._get_writer(metric, slot).append(slot, records):
+                logging.warning(
+                    f"dropping {metric} results for slot {slot}, results for "
+                    f"a later slot were already stored."
+                )
+
+    def record(self, metric: str, results: dict[str, Any]):
+        """Append the results of a metric for the current slot.
+
+        @param metric: the name of the metric.
+        @param results: {client_name: json serializable value}
+        @return:
+        """
+        if self.get_slot is None:
+            raise Exception("MetricStore.record requires a get_slot function.")
+        self.append(metric, self.get_slot(), results)
+
+    def get_metrics(self) -> list[str]:
+        """Get the names of all the stored metrics."""
+        return sorted(p.name for p in self.root.iterdir() if p.is_dir())
+
+    def query(
+        self,
+        metric: str,
+        start_slot: int = 0,
+        end_slot: Optional[int] = None,
+        clients: Optional[list[str]] = None,
+    ) -> Iterator[tuple[int, str, Any]]:
+        """Get the stored results of a metric in a slot range.
+
+        @param metric: the name of the metric.
+        @param start_slot: the first slot (inclusive).
+        @param end_slot: the last slot (inclusive), None for no limit.
+        @param clients: optional client names to filter on.
+        @return: (slot, client_name, value) in the order they were recorded.
+        """
+        metric_dir = self.root / metric
+        if not metric_dir.exists():
+            return
+        with self._lock:
+            self._load_clients()
+            client_names = dict(self._client_names)
+        client_ids = None
+        if clients is not None:
+            client_ids = {
+                cid for cid, name in client_names.items() if name in set(clients)
+            }
+
+        chunk_starts = sorted(int(p.stem) for p in metric_dir.glob("*.dat"))
+        for chunk_start in chunk_starts:
+            if chunk_start + self.slots_per_chunk <= start_slot:
+                continue
+            if end_slot is not None and chunk_start > end_slot:
+                break
+            yield from self._read_chunk(
+                metric_dir, chunk_start, start_slot, end_slot, client_ids, client_names
+            )
+
+    def _read_chunk(
+        self,
+        metric_dir: pathlib.Path,
+        chunk_start: int,
+        start_slot: int,
+        end_slot: Optional[int],
+        client_ids: Optional[set[int]],
+        client_names: dict[int, str],
+    ) -> Iterator[tuple[int, str, Any]]:
+        # seek to the first indexed slot >= start_slot.
+        offset = 0
+        index_path = metric_dir / f"{chunk_start}.idx"
+        if index_path.exists():
+            entries = array("Q")
+            with index_path.open("rb") as f:
+                raw = f.read()
+            entries.frombytes(raw[: len(raw) - len(raw) % INDEX_ENTRY.size])
+            slots = entries[0::2]
+            ndx = bisect.bisect_left(slots, start_slot)
+            if ndx >= len(slots):
+                return
+            offset = entries[2 * ndx + 1]
+
+        with (metric_dir / f"{chunk_start}.dat").open("rb") as f:
+            f.seek(offset)
+            while True:
+                header = f.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    return  # end of the chunk (or a partially written record).
+                slot, client_id, length = RECORD_HEADER.unpack(header)
+                value = f.read(length)
+                if len(value) < length:
+                    return
+                if end_slot is not None and slot > end_slot:
+                    return
+                if slot < start_slot:
+                    continue
+                if client_ids is not None and client_id not in client_ids:
+                    continue
+                yield slot, client_names.get(client_id, str(client_id)), json.loads(
+                    value
+                )
+
+    def close(self):
+        """Close the open chunk files."""
+        with self._lock:
+            for _, writer in self._writers.values():
+                writer.close()
+            self._writers = {}
@@ -10,20 +10,26 @@ The metric defines:
 import asyncio
 from abc import abstractmethod
 from concurrent.futures import Future, ThreadPoolExecutor
-from typing import Union, Any, Callable, Optional
+from typing import Union, Any, Awaitable, Callable, NamedTuple, Optional
 import logging
 
 import requests
 
 from ...config.etb_config import ClientInstance
+from ...interfaces.async_request_engine import async_request_engine
+from ...interfaces.beacon_event_stream import BeaconEventStream, NodeView
 from ...interfaces.client_request import (
     ClientInstanceRequest,
     perform_batched_request,
-    BeaconAPIgetBlockV2,
+    BeaconAPIgetBlockHeader,
     BeaconAPIgetFinalityCheckpoints,
     BeaconAPIgetPeers,
     BeaconAPIgetIdentity,
 )
+from ...interfaces.graffiti_cache import block_graffiti_cache
+from ...interfaces.retry_policy import client_circuit_breakers
+from ..fork_tree import ForkReport, ForkTree
+from ..metric_store import MetricStore
 
 """
 Consensus Monitors are meant to be standalone actions that can be performed
@@ -58,11 +64,18 @@ class ClientMetricMonitor:
         return the parsed result.
         return None if the response is invalid.
 
+    An optional async_client_query is the asyncio version of the client_query,
+    if it is provided all the clients are queried from the shared
+    async_request_engine loop instead of a thread per client.
+
     After each run the monitor will populate the following fields:
         - results: A dictionary of results grouped by result. {ClientInstance: Any [result]}
         - unreachable_clients: A list of clients that were unreachable.
         - invalid_response_clients: A list of clients that returned an invalid response.
 
+    If a metric_store is set the results of every run are appended to it
+    under metric_name, unreachable/invalid clients are recorded as None.
+
     A report_metric routine is implemented by the user to report the metric.
     """
 
@@ -71,10 +84,16 @@ class ClientMetricMonitor:
         client_query: Callable[[ClientInstance], Union[Exception, Any]],
         response_parser: Callable[[Any], Optional[Any]],
         max_retries: int = 3,  # the max amount of time to retry a client
+        async_client_query: Optional[
+            Callable[[ClientInstance], Awaitable[Union[Exception, Any]]]
+        ] = None,
     ):
         self.client_query = client_query
         self.response_parser = response_parser
         self.max_retries = max_retries
+        self.async_client_query = async_client_query
+        self.metric_store: Optional[MetricStore] = None
+        self.metric_name: Optional[str] = None
 
         self.results: ClientMonitorResult = {}
         self.unreachable_clients: list[ClientInstance] = []
@@ -92,14 +111,21 @@ class ClientMetricMonitor:
         If we get unreachable clients/invalid responses we will retry them
            until we get a valid response or we reach max_retries.
         """
-        client_futures = {}
-        with ThreadPoolExecutor(max_workers=len(clients_to_monitor)) as executor:
-            for client in clients_to_monitor:
-                client_futures[client] = executor.submit(self.client_query, client)
-
-        # iterate through the futures and group them by result, unreachable, invalid_response
-        for client, future in client_futures.items():
-            result = future.result()
+        client_results: dict[ClientInstance, Union[Exception, Any]] = {}
+        if self.async_client_query is not None:
+            client_results = async_request_engine.run(
+                self._async_query_clients(clients_to_monitor)
+            )
+        else:
+            client_futures = {}
+            with ThreadPoolExecutor(max_workers=len(clients_to_monitor)) as executor:
+                for client in clients_to_monitor:
+                    client_futures[client] = executor.submit(self.client_query, client)
+            for client, future in client_futures.items():
+                client_results[client] = future.result()
+
+        # iterate through the results and group them by result, unreachable, invalid_response
+        for client, result in client_results.items():
             # connection error
             if isinstance(result, Exception):
                 self.unreachable_clients.append(client)
@@ -113,6 +139,15 @@ class ClientMetricMonitor:
             # good response
             self.results[client] = parsed_result
 
+    async def _async_query_clients(
+        self, clients_to_monitor: list[ClientInstance]
+    ) -> dict[ClientInstance, Union[Exception, Any]]:
+        """Run the async_client_query on every client concurrently."""
+        results = await asyncio.gather(
+            *[self.async_client_query(client) for client in clients_to_monitor]
+        )
+        return dict(zip(clients_to_monitor, results))
+
     def report_metric(self) -> str:
         """Report the results obtained from the measurements."""
         out = ""
@@ -138,9 +173,31 @@ class ClientMetricMonitor:
             ):
                 return
 
+    def _serialize_result(self, result: Any) -> Any:
+        """Convert a result to the json serializable value to store."""
+        return result
+
+    def record_results(self, slot: int):
+        """Append the results of the last run to the metric store.
+
+        @param slot: the slot the results were collected at.
+        @return:
+        """
+        results = {
+            client.name: self._serialize_result(result)
+            for client, result in self.results.items()
+        }
+        for client in self.unreachable_clients + self.invalid_response_clients:
+            results[client.name] = None
+        self.metric_store.append(self.metric_name, slot, results)
+
     def run(self, clients_to_monitor: list[ClientInstance]) -> str:
         """Run the monitor."""
+        if self.metric_store is not None:
+            slot = self.metric_store.get_slot()
         self.collect_metrics(clients_to_monitor)
+        if self.metric_store is not None:
+            self.record_results(slot)
         return self.report_metric()
 
 
@@ -175,9 +232,14 @@ class ConsensusMetricMonitor(ClientMetricMonitor):
         response_parser: Callable[[Any], Optional[Any]],
         max_retries: int = 3,
         max_retries_for_consensus: int = 3,
+        async_client_query: Optional[
+            Callable[[ClientInstance], Awaitable[Union[Exception, Any]]]
+        ] = None,
     ):
 
-        super().__init__(client_query, response_parser)
+        super().__init__(
+            client_query, response_parser, async_client_query=async_client_query
+        )
         self.max_retries_for_consensus = max_retries_for_consensus
         self.consensus_results: ConsensusMonitorResult = {}
 
@@ -231,11 +293,45 @@ class ConsensusMetricMonitor(ClientMetricMonitor):
 
     def run(self, clients_to_monitor: list[ClientInstance]) -> str:
         """Run the monitor."""
+        if self.metric_store is not None:
+            slot = self.metric_store.get_slot()
         self.collect_metrics(clients_to_monitor)
+        if self.metric_store is not None:
+            self.record_results(slot)
         return self.report_metric()
 
 
-ClientHead = tuple[int, str, str]
+class ClientHead(NamedTuple):
+    """The head of a client. Printed as (slot, state_root, graffiti), the
+    block roots are used to track forks.
+
+    Clients are grouped by (slot, state_root, root) only, the graffiti is
+    fetched separately and is None when that lookup fails.
+    """
+
+    slot: int
+    state_root: str
+    graffiti: Optional[str]
+    root: Optional[str] = None
+    parent_root: Optional[str] = None
+
+    def _key(self) -> tuple[int, str, Optional[str]]:
+        return self.slot, self.state_root, self.root
+
+    def __eq__(self, other):
+        if not isinstance(other, ClientHead):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __str__(self):
+        return str((self.slot, self.state_root, self.graffiti))
 
 
 class HeadsMonitor(ConsensusMetricMonitor):
@@ -245,36 +341,139 @@ class HeadsMonitor(ConsensusMetricMonitor):
     """
 
     def __init__(
-        self, max_retries: int = 3, timeout: int = 5, max_retries_for_consensus: int = 3
+        self,
+        max_retries: int = 3,
+        timeout: int = 5,
+        max_retries_for_consensus: int = 3,
+        event_stream: Optional[BeaconEventStream] = None,
+        metric_store: Optional[MetricStore] = None,
     ):
-        self.query = BeaconAPIgetBlockV2(max_retries=max_retries, timeout=timeout)
+        self.query = BeaconAPIgetBlockHeader(max_retries=max_retries, timeout=timeout)
+        # dead clients fail fast for every monitor once their circuit opens.
+        self.query.circuit_breakers = client_circuit_breakers
+        self.graffiti_cache = block_graffiti_cache
         self.max_retry_for_consensus = max_retries_for_consensus
 
-        super().__init__(
-            client_query=self.query.perform_request,
-            response_parser=self._get_client_head_from_block,
+        if event_stream is not None:
+            # read the heads from the live event streams instead of polling.
+            super().__init__(
+                client_query=event_stream.get_view,
+                async_client_query=event_stream.async_get_view,
+                response_parser=self._get_client_head_from_view,
+            )
+        else:
+            super().__init__(
+                client_query=self._query_head,
+                async_client_query=self._async_query_head,
+                response_parser=self._get_client_head_from_header,
+            )
+        self.metric_store = metric_store
+        self.metric_name = "heads"
+        self.fork_tree = ForkTree(fetch_header=self._fetch_header)
+        self.fork_report: Optional[ForkReport] = None
+
+    def _fetch_header(
+        self, client: ClientInstance, root: str
+    ) -> Optional[tuple[int, str]]:
+        """Get the (slot, parent_root) of a block for the fork tree."""
+        query = BeaconAPIgetBlockHeader(
+            block=root, max_retries=1, timeout=self.query.timeout
+        )
+        query.circuit_breakers = client_circuit_breakers
+        response = query.perform_request(client)
+        if not query.is_valid(response):
+            return None
+        try:
+            header = query.get_header(response)
+            return int(header["slot"]), header["parent_root"]
+        except Exception as e:
+            logging.debug(f"Exception parsing response: {e}")
+            return None
+
+    def _query_head(
+        self, client: ClientInstance
+    ) -> Union[Exception, tuple[requests.Response, Optional[str]]]:
+        """Get the head header of a client and the graffiti of its block.
+        The full block is only fetched once per new root."""
+        response = self.query.perform_request(client)
+        if not self.query.is_valid(response):
+            return response
+        root = self.query.get_root(response)
+        return response, self._check_graffiti(
+            root, self.graffiti_cache.get_graffiti(client, root)
         )
 
-    def _get_client_head_from_block(
-        self, response: requests.Response
+    async def _async_query_head(
+        self, client: ClientInstance
+    ) -> Union[Exception, tuple[requests.Response, Optional[str]]]:
+        """Asyncio version of _query_head."""
+        response = await self.query.async_perform_request(client)
+        if not self.query.is_valid(response):
+            return response
+        root = self.query.get_root(response)
+        return response, self._check_graffiti(
+            root, await self.graffiti_cache.async_get_graffiti(client, root)
+        )
+
+    @staticmethod
+    def _check_graffiti(root: str, graffiti: Union[Exception, str]) -> Optional[str]:
+        # the head is still reported if the graffiti lookup fails.
+        if isinstance(graffiti, Exception):
+            logging.debug(f"Failed to get the graffiti of {root}: {graffiti}")
+            return None
+        return graffiti
+
+    def _get_client_head_from_header(
+        self, head: tuple[requests.Response, Optional[str]]
     ) -> Optional[ClientHead]:
         try:
-            block = self.query.get_block(response)
-            slot = block["slot"]
-            state_root = f'0x{block["state_root"][-8:]}'
-            graffiti = (
-                bytes.fromhex(block["body"]["graffiti"][2:])
-                .decode("utf-8")
-                .replace("\x00", "")
+            response, graffiti = head
+            header = self.query.get_header(response)
+            slot = header["slot"]
+            state_root = f'0x{header["state_root"][-8:]}'
+            return ClientHead(
+                slot,
+                state_root,
+                graffiti,
+                root=self.query.get_root(response),
+                parent_root=header["parent_root"],
             )
-            return slot, state_root, graffiti
         except Exception as e:
             logging.debug(f"Exception parsing response: {e}")
             return None
 
+    def _get_client_head_from_view(self, view: NodeView) -> Optional[ClientHead]:
+        if view.head_state_root is None:
+            return None
+        return ClientHead(
+            view.head_slot,
+            f"0x{view.head_state_root[-8:]}",
+            view.graffiti,
+            root=view.head_root,
+        )
+
+    def collect_metrics(self, clients_to_monitor: list[ClientInstance]):
+        super().collect_metrics(clients_to_monitor)
+        self.fork_report = self.fork_tree.observe(
+            {
+                client: (head.slot, head.root, head.parent_root)
+                for client, head in self.results.items()
+            }
+        )
+
     def report_metric(self) -> str:
-        """Report the results obtained from the measurements."""
-        out = f"num_forks: {len(self.consensus_results) - 1}\n"
+        """Report the results obtained from the measurements. Clients that
+        are behind on the same chain are not counted as forks."""
+        report = self.fork_report
+        out = f"num_forks: {report.num_forks}\n"
+        if len(report.fork_points) > 0:
+            out += f"fork points: {[str(fp) for fp in report.fork_points]}\n"
+            for tip, clients in report.branches.items():
+                out += f"branch 0x{tip[-8:]}: {clients}\n"
+            if len(report.behind) > 0:
+                out += f"behind fork point: {report.behind}\n"
+        for reorg in report.reorgs:
+            out += f"{reorg}\n"
         out += super().report_metric()
         return out
 
@@ -285,21 +484,54 @@ Checkpoint = tuple[int, str]
 Checkpoints = tuple[Checkpoint, Checkpoint, Checkpoint]
 
 
+class ClientCheckpoints(NamedTuple):
+    """The checkpoints of a client, roots are shortened to their last 8
+    characters."""
+
+    finalized: Checkpoint
+    current_justified: Checkpoint
+    previous_justified: Checkpoint
+
+    def __str__(self):
+        return (
+            f"finalized: {self.finalized}, current justified: {self.current_justified}, "
+            f"previous justified: {self.previous_justified}"
+        )
+
+
 class CheckpointsMonitor(ConsensusMetricMonitor):
     def __init__(
-        self, max_retries: int = 3, timeout: int = 5, max_retries_for_consensus: int = 3
+        self,
+        max_retries: int = 3,
+        timeout: int = 5,
+        max_retries_for_consensus: int = 3,
+        event_stream: Optional[BeaconEventStream] = None,
+        metric_store: Optional[MetricStore] = None,
     ):
         self.query = BeaconAPIgetFinalityCheckpoints(
             max_retries=max_retries, timeout=timeout
         )
+        self.query.circuit_breakers = client_circuit_breakers
         self.max_retry_for_consensus = max_retries_for_consensus
 
-        super().__init__(
-            client_query=self.query.perform_request,
-            response_parser=self._get_checkpoints,
-        )
+        if event_stream is not None:
+            super().__init__(
+                client_query=event_stream.get_view,
+                async_client_query=event_stream.async_get_view,
+                response_parser=self._get_checkpoints_from_view,
+            )
+        else:
+            super().__init__(
+                client_query=self.query.perform_request,
+                async_client_query=self.query.async_perform_request,
+                response_parser=self._get_checkpoints,
+            )
+        self.metric_store = metric_store
+        self.metric_name = "checkpoints"
 
-    def _get_checkpoints(self, response: requests.Response) -> Optional[str]:
+    def _get_checkpoints(
+        self, response: requests.Response
+    ) -> Optional[ClientCheckpoints]:
         try:
             # checkpoints
             finalized_cp: tuple[int, str]
@@ -307,28 +539,42 @@ class CheckpointsMonitor(ConsensusMetricMonitor):
             previous_justified_cp: tuple[int, str]
 
             finalized_cp = self.query.get_finalized_checkpoint(response)
-            fc_epoch = finalized_cp[0]
-            fc_root = f"0x{finalized_cp[1][-8:]}"
-            fc = (fc_epoch, fc_root)
-
             current_justified_cp = self.query.get_current_justified_checkpoint(response)
-            cj_epoch = current_justified_cp[0]
-            cj_root = f"0x{current_justified_cp[1][-8:]}"
-            cj = (cj_epoch, cj_root)
-
             previous_justified_cp = self.query.get_previous_justified_checkpoint(
                 response
             )
-            pj_epoch = previous_justified_cp[0]
-            pj_root = f"0x{previous_justified_cp[1][-8:]}"
-            pj = (pj_epoch, pj_root)
-
-            return f"finalized: {fc}, current justified: {cj}, previous justified: {pj}"
+            return self._format_checkpoints(
+                finalized_cp, current_justified_cp, previous_justified_cp
+            )
 
         except Exception as e:
             logging.debug(f"Exception parsing response: {e}")
             return None
 
+    def _get_checkpoints_from_view(
+        self, view: NodeView
+    ) -> Optional[ClientCheckpoints]:
+        if (
+            view.finalized is None
+            or view.current_justified is None
+            or view.previous_justified is None
+        ):
+            return None
+        return self._format_checkpoints(
+            view.finalized, view.current_justified, view.previous_justified
+        )
+
+    @staticmethod
+    def _format_checkpoints(
+        finalized_cp: tuple[int, str],
+        current_justified_cp: tuple[int, str],
+        previous_justified_cp: tuple[int, str],
+    ) -> ClientCheckpoints:
+        fc = (finalized_cp[0], f"0x{finalized_cp[1][-8:]}")
+        cj = (current_justified_cp[0], f"0x{current_justified_cp[1][-8:]}")
+        pj = (previous_justified_cp[0], f"0x{previous_justified_cp[1][-8:]}")
+        return ClientCheckpoints(fc, cj, pj)
+
 
 # peer_id : {state: "", direction: ""}
 PeerSummary = dict[str, dict[str, str]]
@@ -359,16 +605,28 @@ class ConsensusLayerPeersMonitor(ClientMetricMonitor):
     It will retry the query up to max_retries_for_consensus times.
     """
 
-    def __init__(self, max_retries: int = 3, timeout: int = 5):
+    def __init__(
+        self,
+        max_retries: int = 3,
+        timeout: int = 5,
+        metric_store: Optional[MetricStore] = None,
+    ):
         self.query = BeaconAPIgetPeers(
             max_retries=max_retries, timeout=timeout, states=["connected"]
         )
+        self.query.circuit_breakers = client_circuit_breakers
 
         super().__init__(
             client_query=self.query.perform_request,
+            async_client_query=self.query.async_perform_request,
             response_parser=self._get_client_peers,
             max_retries=max_retries,
         )
+        self.metric_store = metric_store
+        self.metric_name = "peer_count"
+
+    def _serialize_result(self, result: dict) -> int:
+        return len(result)
 
     def _get_client_peers(self, response: requests.Response) -> Optional[dict]:
         peers_summary = {}
@@ -393,9 +651,11 @@ class ConsensusLayerIdentityMonitor(ClientMetricMonitor):
 
     def __init__(self, max_retries: int = 3, timeout: int = 5):
         self.query = BeaconAPIgetIdentity(max_retries=max_retries, timeout=timeout)
+        self.query.circuit_breakers = client_circuit_breakers
 
         super().__init__(
             client_query=self.query.perform_request,
+            async_client_query=self.query.async_perform_request,
             response_parser=self._get_peer_id,
             max_retries=max_retries,
         )
@@ -422,12 +682,17 @@ class ConsensusLayerPeeringSummary:
     A summary of the consensus layer peering status.
     """
 
-    def __init__(self, max_retries: int = 3, timeout: int = 5):
+    def __init__(
+        self,
+        max_retries: int = 3,
+        timeout: int = 5,
+        metric_store: Optional[MetricStore] = None,
+    ):
         self.max_retries = max_retries
         self.timeout = timeout
         # the peers for each client
         self.peers_monitor = ConsensusLayerPeersMonitor(
-            max_retries=max_retries, timeout=timeout
+            max_retries=max_retries, timeout=timeout, metric_store=metric_store
         )
         self.identity_monitor = ConsensusLayerIdentityMonitor(
             max_retries=max_retries, timeout=timeout
@@ -435,8 +700,12 @@ class ConsensusLayerPeeringSummary:
 
     def run(self, clients_to_monitor: list[ClientInstance]) -> str:
         """Run the monitor."""
+        if self.peers_monitor.metric_store is not None:
+            slot = self.peers_monitor.metric_store.get_slot()
         self.peers_monitor.collect_metrics(clients_to_monitor)
         self.identity_monitor.collect_metrics(clients_to_monitor)
+        if self.peers_monitor.metric_store is not None:
+            self.peers_monitor.record_results(slot)
 
         # better summary
         # mapping to go from peer_id to ClientInstance
@@ -3,9 +3,12 @@
 Provides abstractions to monitor testnet progress.
 """
 import logging
+import threading
 import time
 from abc import abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
 from enum import Enum
+from typing import Optional
 
 from ..config.etb_config import ETBConfig
 
@@ -20,17 +23,62 @@ class TestnetMonitorActionInterval(Enum):
 
 class TestnetMonitorAction:
     """An abstraction for an action to perform on a testnet at some
-    interval."""
+    interval.
 
-    def __init__(self, name: str, interval: TestnetMonitorActionInterval):
+    An action may set a deadline in seconds, if it is still running past it
+    the execution is recorded as overrun. Defaults to the monitor's action
+    deadline.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        interval: TestnetMonitorActionInterval,
+        deadline: Optional[float] = None,
+    ):
         self.interval: TestnetMonitorActionInterval = interval
         self.name = name
+        self.deadline: Optional[float] = deadline
 
     @abstractmethod
     def perform_action(self):
         pass
 
 
+class ActionStats:
+    """Execution counters of a scheduled action.
+
+    - runs: the number of executions started.
+    - late: executions that started more than late_threshold after their
+        scheduled time.
+    - skipped: executions that were not started because the previous one
+        was still running.
+    - overrun: executions that ran past their deadline.
+    """
+
+    def __init__(self):
+        self.runs: int = 0
+        self.late: int = 0
+        self.skipped: int = 0
+        self.overrun: int = 0
+        self.failed: int = 0
+        self.max_start_delay: float = 0.0
+        self.max_duration: float = 0.0
+        self.total_duration: float = 0.0
+
+    def __str__(self):
+        avg = self.total_duration / self.runs if self.runs > 0 else 0.0
+        return (
+            f"runs: {self.runs}, late: {self.late}, skipped: {self.skipped}, "
+            f"overrun: {self.overrun}, failed: {self.failed}, "
+            f"max start delay: {self.max_start_delay:.3f}s, "
+            f"duration avg/max: {avg:.3f}s/{self.max_duration:.3f}s"
+        )
+
+    def __repr__(self):
+        return self.__str__()
+
+
 class TestnetMonitor:
     """TestnetMonitor provides useful interfaces for monitoring the progress of
     the testnet.
@@ -41,9 +89,26 @@ class TestnetMonitor:
     - wait_for_epoch: wait until a target epoch
     - slot_to_epoch: convert slot to epoch
     - epoch_to_slot: convert epoch to slot
+
+    The actions are fired slot_offset seconds into each slot. Actions run
+    concurrently on a thread pool, an action whose previous execution is
+    still running is skipped for that slot so that the monitor never falls
+    behind the chain. Late, skipped and overrun executions are recorded in
+    the action_stats and logged every epoch.
+        - slot_offset: seconds into the slot to fire the actions at.
+        - action_deadline: default deadline for the actions, defaults to
+            one slot.
+        - late_threshold: an execution that starts this long after its
+            scheduled time is recorded as late.
     """
 
-    def __init__(self, etb_config: ETBConfig):
+    def __init__(
+        self,
+        etb_config: ETBConfig,
+        slot_offset: float = 0.0,
+        action_deadline: Optional[float] = None,
+        late_threshold: float = 1.0,
+    ):
         self.etb_config: ETBConfig = etb_config
         self.consensus_genesis_time: int = self.etb_config.genesis_time
         self.seconds_per_slot: int = (
@@ -60,6 +125,17 @@ class TestnetMonitor:
         self.every_epoch_actions: list[TestnetMonitorAction] = []
         self.once_actions: list[TestnetMonitorAction] = []
 
+        self.slot_offset: float = slot_offset
+        self.action_deadline: float = (
+            action_deadline if action_deadline is not None else self.seconds_per_slot
+        )
+        self.late_threshold: float = late_threshold
+        self.missed_slots: int = 0
+        self.action_stats: dict[str, ActionStats] = {}
+        # the running actions with their deadline.
+        self._running: dict[TestnetMonitorAction, tuple[Future, float]] = {}
+        self._stats_lock = threading.Lock()
+
     def slot_to_epoch(self, slot_num: int) -> int:
         """Convert slot number to epoch number.
 
@@ -76,26 +152,35 @@ class TestnetMonitor:
 
     def get_slot(self) -> int:
         """Get the current slot wrt to genesis time @return: slot numbuer."""
-        return (int(time.time()) - self.consensus_genesis_time) // self.seconds_per_slot
+        return int(
+            (time.time() - self.consensus_genesis_time) // self.seconds_per_slot
+        )
+
+    def get_slot_start_time(self, slot: int) -> float:
+        """Get the unix time a slot starts at.
+
+        @param slot: the slot. @return:
+        """
+        return self.consensus_genesis_time + slot * self.seconds_per_slot
 
     def get_epoch(self) -> int:
         """Get the current epoch wrt to genesis time @return:"""
         return self.get_slot() // self.slots_per_epoch
 
+    def _wait_until(self, target_time: float):
+        """Sleep until a unix time."""
+        t_delta = target_time - time.time()
+        while t_delta > 0:
+            time.sleep(min(t_delta, 60))
+            t_delta = target_time - time.time()
+
     def wait_for_slot(self, target_slot: int):
         """Wait until target slot.
 
         @param target_slot: slot to wait for @return:
         """
-        t_delta: int = (target_slot - self.get_slot()) * self.seconds_per_slot
-        while t_delta > 0:
-            logging.debug(f"Waiting for slot {target_slot}")
-            sleep_time = min(t_delta, 60)
-            logging.debug(
-                f"Waiting for target slot: {target_slot}, sleeping for {sleep_time} seconds"
-            )
-            time.sleep(sleep_time)
-            t_delta = (target_slot - self.get_slot()) * self.seconds_per_slot
+        logging.debug(f"Waiting for target slot: {target_slot}")
+        self._wait_until(self.get_slot_start_time(target_slot))
 
     def wait_for_epoch(self, target_epoch: int):
         """Wait until target epoch.
@@ -114,6 +199,84 @@ class TestnetMonitor:
         else:
             raise Exception("Invalid action interval")
 
+    def get_action_stats(self, action: TestnetMonitorAction) -> ActionStats:
+        with self._stats_lock:
+            if action.name not in self.action_stats:
+                self.action_stats[action.name] = ActionStats()
+            return self.action_stats[action.name]
+
+    def report_schedule_stats(self) -> str:
+        """Report the execution counters of all the scheduled actions."""
+        with self._stats_lock:
+            out = f"missed slots: {self.missed_slots}"
+            for name, stats in self.action_stats.items():
+                out += f"\n{name}: {stats}"
+        return out
+
+    def _run_action(self, action: TestnetMonitorAction, scheduled_time: float):
+        """Run an action and record its timing, runs on the thread pool."""
+        stats = self.get_action_stats(action)
+        start = time.time()
+        start_delay = start - scheduled_time
+        with self._stats_lock:
+            stats.runs += 1
+            stats.max_start_delay = max(stats.max_start_delay, start_delay)
+            if start_delay > self.late_threshold:
+                stats.late += 1
+                logging.warning(
+                    f"{action.name} started {start_delay:.2f}s after its scheduled time."
+                )
+        try:
+            action.perform_action()
+        except Exception as e:
+            with self._stats_lock:
+                stats.failed += 1
+            logging.error(f"{action.name} failed: {e}")
+        duration = time.time() - start
+        with self._stats_lock:
+            stats.total_duration += duration
+            stats.max_duration = max(stats.max_duration, duration)
+
+    def _check_deadlines(self):
+        """Record the running actions that passed their deadline."""
+        now = time.time()
+        for action, (future, deadline) in list(self._running.items()):
+            if future.done():
+                del self._running[action]
+            elif now > deadline:
+                stats = self.get_action_stats(action)
+                with self._stats_lock:
+                    stats.overrun += 1
+                logging.warning(f"{action.name} is still running past its deadline.")
+                # only record the overrun once per execution.
+                self._running[action] = (future, float("inf"))
+
+    def _schedule_actions(
+        self,
+        executor: ThreadPoolExecutor,
+        actions: list[TestnetMonitorAction],
+        scheduled_time: float,
+    ):
+        """Start the actions that are not still running from a previous
+        slot."""
+        self._check_deadlines()
+        for action in actions:
+            if action in self._running:
+                stats = self.get_action_stats(action)
+                with self._stats_lock:
+                    stats.skipped += 1
+                logging.warning(
+                    f"Skipping {action.name}, the previous execution is still running."
+                )
+                continue
+            deadline = (
+                action.deadline if action.deadline is not None else self.action_deadline
+            )
+            self._running[action] = (
+                executor.submit(self._run_action, action, scheduled_time),
+                scheduled_time + deadline,
+            )
+
     def run(self):
         """Optionally run the testnet monitor with actions."""
         if len(self.once_actions) > 0:
@@ -124,12 +287,39 @@ class TestnetMonitor:
         if len(self.every_slot_actions) == 0 and len(self.every_epoch_actions) == 0:
             return
 
-        while True:
+        num_actions = len(self.every_slot_actions) + len(self.every_epoch_actions)
+        with ThreadPoolExecutor(
+            max_workers=num_actions, thread_name_prefix="testnet-monitor"
+        ) as executor:
             goal_slot = self.get_slot() + 1
-            self.wait_for_slot(goal_slot)
-            logging.info(f"Expected slot: {goal_slot}")
-            for action in self.every_slot_actions:
-                action.perform_action()
-            if goal_slot % self.slots_per_epoch == 0:
-                for action in self.every_epoch_actions:
-                    action.perform_action()
+            while True:
+                scheduled_time = self.get_slot_start_time(goal_slot) + self.slot_offset
+                # deadlines are checked while waiting for the next slot.
+                remaining = scheduled_time - time.time()
+                while remaining > 0:
+                    self._check_deadlines()
+                    # the deadline check may take us past the scheduled time.
+                    time.sleep(max(0.0, min(scheduled_time - time.time(), 1.0)))
+                    remaining = scheduled_time - time.time()
+
+                logging.info(f"Expected slot: {goal_slot}")
+                actions = list(self.every_slot_actions)
+                if goal_slot % self.slots_per_epoch == 0:
+                    actions += self.every_epoch_actions
+                self._schedule_actions(executor, actions, scheduled_time)
+
+                # never fall behind the chain, skip to the next slot to come.
+                next_slot = self.get_slot() + 1
+                if time.time() - self.get_slot_start_time(next_slot - 1) < self.slot_offset:
+                    # the offset of the current slot hasn't passed yet.
+                    next_slot -= 1
+                next_slot = max(next_slot, goal_slot + 1)
+                if next_slot > goal_slot + 1:
+                    self.missed_slots += next_slot - goal_slot - 1
+                    logging.warning(
+                        f"Missed slots {goal_slot + 1} to {next_slot - 1}, "
+                        "the monitor fell behind."
+                    )
+                if self.slot_to_epoch(next_slot) > self.slot_to_epoch(goal_slot):
+                    logging.info(f"Schedule stats:\n{self.report_schedule_stats()}")
+                goal_slot = next_slot
@@ -10,24 +10,93 @@ import logging
 import pathlib
 import time
 from abc import abstractmethod
-from typing import Union, Any, Type
+from typing import Union, Any, Optional, Type
 
 import requests
 
 from etb.common.consensus import ConsensusFork, Epoch
 from etb.common.utils import create_logger
 from etb.config.etb_config import ETBConfig, ClientInstance, get_etb_config
+from etb.interfaces.async_request_engine import async_request_engine
+from etb.interfaces.beacon_event_stream import BeaconEventStream
+from etb.interfaces.client_request import ClientInstanceRequest, request_observers
+from etb.interfaces.client_session import client_sessions
+from etb.monitoring.metrics_exporter import MetricsExporter, metrics_registry
 from etb.monitoring.monitors.consensus_monitors import (
+    ClientMetricMonitor,
     HeadsMonitor,
     CheckpointsMonitor,
     ConsensusLayerPeeringSummary,
 )
+from etb.monitoring.metric_store import MetricStore
 from etb.monitoring.testnet_monitor import (
     TestnetMonitor,
     TestnetMonitorAction,
     TestnetMonitorActionInterval,
 )
 
+# metrics served on --metrics-port, they are updated after every run of the
+# monitors.
+FORK_COUNT = metrics_registry.gauge(
+    "etb_fork_count", "Number of branches in the block tree minus one."
+)
+REORGS = metrics_registry.counter(
+    "etb_reorgs_total", "Number of reorgs of the client's head.", ("client",)
+)
+LAST_REORG_DEPTH = metrics_registry.gauge(
+    "etb_last_reorg_depth", "Depth in slots of the client's last reorg.", ("client",)
+)
+HEAD_SLOT = metrics_registry.gauge(
+    "etb_head_slot", "Head slot of the client.", ("client",)
+)
+HEAD_LAG = metrics_registry.gauge(
+    "etb_head_lag_slots",
+    "Number of slots the client's head is behind the highest head.",
+    ("client",),
+)
+FINALIZED_EPOCH = metrics_registry.gauge(
+    "etb_finalized_epoch", "Finalized epoch of the client.", ("client",)
+)
+JUSTIFIED_EPOCH = metrics_registry.gauge(
+    "etb_justified_epoch", "Current justified epoch of the client.", ("client",)
+)
+PEER_COUNT = metrics_registry.gauge(
+    "etb_peer_count", "Number of connected peers of the client.", ("client",)
+)
+UNREACHABLE = metrics_registry.counter(
+    "etb_unreachable_total",
+    "Number of monitor runs the client was unreachable in.",
+    ("client", "metric"),
+)
+INVALID_RESPONSE = metrics_registry.counter(
+    "etb_invalid_response_total",
+    "Number of monitor runs the client returned an invalid response in.",
+    ("client", "metric"),
+)
+REQUEST_DURATION = metrics_registry.histogram(
+    "etb_request_duration_seconds",
+    "Duration of every request attempt to the client.",
+    ("client", "request"),
+)
+
+
+def export_monitor_errors(metric: str, monitor: ClientMetricMonitor):
+    for client in monitor.unreachable_clients:
+        UNREACHABLE.inc(client=client.name, metric=metric)
+    for client in monitor.invalid_response_clients:
+        INVALID_RESPONSE.inc(client=client.name, metric=metric)
+
+
+def observe_request(
+    instance: ClientInstance,
+    request: ClientInstanceRequest,
+    duration: float,
+    exception: Optional[Exception],
+):
+    REQUEST_DURATION.observe(
+        duration, client=instance.name, request=type(request).__name__
+    )
+
 
 class HeadsMonitorAction(TestnetMonitorAction):
     def __init__(
@@ -37,18 +106,40 @@ class HeadsMonitorAction(TestnetMonitorAction):
         timeout: int,
         max_retries_for_consensus: int,
         interval: TestnetMonitorActionInterval,
+        event_stream: Optional[BeaconEventStream] = None,
+        metric_store: Optional[MetricStore] = None,
     ):
         super().__init__(name="head_slots", interval=interval)
         self.get_heads_monitor = HeadsMonitor(
             max_retries=max_retries,
             timeout=timeout,
             max_retries_for_consensus=max_retries_for_consensus,
+            event_stream=event_stream,
+            metric_store=metric_store,
         )
         self.instances_to_monitor = client_instances
 
     def perform_action(self):
-        logging.info("heads:")
-        logging.info(f"{self.get_heads_monitor.run(self.instances_to_monitor)}\n")
+        report = self.get_heads_monitor.run(self.instances_to_monitor)
+        self.export_metrics()
+        # a single record so that concurrent actions don't interleave.
+        logging.info(f"heads:\n{report}\n")
+
+    def export_metrics(self):
+        monitor = self.get_heads_monitor
+        FORK_COUNT.set(monitor.fork_report.num_forks)
+        for reorg in monitor.fork_report.reorgs:
+            REORGS.inc(client=reorg.client)
+            LAST_REORG_DEPTH.set(reorg.depth, client=reorg.client)
+        HEAD_SLOT.clear()
+        HEAD_LAG.clear()
+        head_slots = {client: int(head[0]) for client, head in monitor.results.items()}
+        if len(head_slots) > 0:
+            highest = max(head_slots.values())
+            for client, slot in head_slots.items():
+                HEAD_SLOT.set(slot, client=client.name)
+                HEAD_LAG.set(highest - slot, client=client.name)
+        export_monitor_errors("heads", monitor)
 
 
 class CheckpointsMonitorAction(TestnetMonitorAction):
@@ -59,18 +150,34 @@ class CheckpointsMonitorAction(TestnetMonitorAction):
         timeout: int,
         max_retries_for_consensus: int,
         interval: TestnetMonitorActionInterval,
+        event_stream: Optional[BeaconEventStream] = None,
+        metric_store: Optional[MetricStore] = None,
     ):
         super().__init__(name="checkpoints", interval=interval)
         self.get_checkpoints_monitor = CheckpointsMonitor(
             max_retries=max_retries,
             timeout=timeout,
             max_retries_for_consensus=max_retries_for_consensus,
+            event_stream=event_stream,
+            metric_store=metric_store,
         )
         self.instances_to_monitor = client_instances
 
     def perform_action(self):
-        logging.info("checkpoints:")
-        logging.info(f"{self.get_checkpoints_monitor.run(self.instances_to_monitor)}\n")
+        report = self.get_checkpoints_monitor.run(self.instances_to_monitor)
+        self.export_metrics()
+        logging.info(f"checkpoints:\n{report}\n")
+
+    def export_metrics(self):
+        monitor = self.get_checkpoints_monitor
+        FINALIZED_EPOCH.clear()
+        JUSTIFIED_EPOCH.clear()
+        for client, checkpoints in monitor.results.items():
+            FINALIZED_EPOCH.set(int(checkpoints.finalized[0]), client=client.name)
+            JUSTIFIED_EPOCH.set(
+                int(checkpoints.current_justified[0]), client=client.name
+            )
+        export_monitor_errors("checkpoints", monitor)
 
 
 class PeersMonitorAction(TestnetMonitorAction):
@@ -81,18 +188,49 @@ class PeersMonitorAction(TestnetMonitorAction):
         timeout: int,
         max_retries_for_consensus: int,  # not used.
         interval: TestnetMonitorActionInterval,
+        event_stream: Optional[BeaconEventStream] = None,  # not used.
+        metric_store: Optional[MetricStore] = None,
     ):
         super().__init__(name="peer-monitor", interval=interval)
         self.get_peering_summary_monitor = ConsensusLayerPeeringSummary(
             max_retries=max_retries,
             timeout=timeout,
+            metric_store=metric_store,
         )
         self.instances_to_monitor = client_instances
 
     def perform_action(self):
-        logging.info("peering-info:")
+        report = self.get_peering_summary_monitor.run(self.instances_to_monitor)
+        self.export_metrics()
+        logging.info(f"peering-info:\n{report}\n")
+
+    def export_metrics(self):
+        monitor = self.get_peering_summary_monitor.peers_monitor
+        PEER_COUNT.clear()
+        for client, peers in monitor.results.items():
+            PEER_COUNT.set(len(peers), client=client.name)
+        export_monitor_errors("peers", monitor)
+
+
+class ConnectionStatsMonitorAction(TestnetMonitorAction):
+    def __init__(
+        self,
+        client_instances: list[ClientInstance],  # not used.
+        max_retries: int,  # not used.
+        timeout: int,  # not used.
+        max_retries_for_consensus: int,  # not used.
+        interval: TestnetMonitorActionInterval,
+        event_stream: Optional[BeaconEventStream] = None,  # not used.
+        metric_store: Optional[MetricStore] = None,  # not used.
+    ):
+        super().__init__(name="connection-stats", interval=interval)
+
+    def perform_action(self):
+        # the monitors poll through the async engine, the requests sessions
+        # are used by the synchronous requests (e.g. the fork tree headers).
         logging.info(
-            f"{self.get_peering_summary_monitor.run(self.instances_to_monitor)}\n"
+            f"connection-stats (async engine):\n{async_request_engine.report()}\n"
+            f"connection-stats (requests sessions):\n{client_sessions.report()}\n"
         )
 
 
@@ -120,6 +258,10 @@ class NodeWatch:
         self.timeout = timeout
         self.instances_to_monitor = self.etb_config.get_client_instances()
         self.max_retries_for_consensus = max_retries_for_consensus
+        self.event_stream: Optional[BeaconEventStream] = None
+        if args.event_stream:
+            self.event_stream = BeaconEventStream(timeout=timeout)
+            self.event_stream.start(self.instances_to_monitor)
         self.testnet_monitor = self.build_testnet_monitor(args)
 
     def build_testnet_monitor(self, cli_args) -> TestnetMonitor:
@@ -133,6 +275,7 @@ class NodeWatch:
             "heads": HeadsMonitorAction,
             "checkpoints": CheckpointsMonitorAction,
             "peers": PeersMonitorAction,
+            "connections": ConnectionStatsMonitorAction,
         }
 
         intervals = {
@@ -141,7 +284,16 @@ class NodeWatch:
             "once": TestnetMonitorActionInterval.ONCE,
         }
 
-        testnet_monitor = TestnetMonitor(self.etb_config)
+        testnet_monitor = TestnetMonitor(
+            self.etb_config,
+            slot_offset=cli_args.slot_offset,
+            action_deadline=cli_args.action_deadline,
+        )
+        metric_store: Optional[MetricStore] = None
+        if cli_args.metric_store is not None:
+            metric_store = MetricStore(
+                pathlib.Path(cli_args.metric_store), get_slot=testnet_monitor.get_slot
+            )
         for monitor in cli_args.monitor:
             metric, interval = monitor.split(":")
             if metric not in metrics:
@@ -157,6 +309,8 @@ class NodeWatch:
                     timeout=self.timeout,
                     max_retries_for_consensus=self.max_retries_for_consensus,
                     interval=_interval,
+                    event_stream=self.event_stream,
+                    metric_store=metric_store,
                 )
             )
         return testnet_monitor
@@ -240,10 +394,77 @@ if __name__ == "__main__":
         dest="monitor",
         action="append",
         required=True,
-        help='The metrics to monitor. The format is "metric:frequency". Possible metrics: heads/checkpoints. '
+        help='The metrics to monitor. The format is "metric:frequency". Possible metrics: heads/checkpoints/peers/connections. '
         "Possible frequencies: once/slot/epoch. For example: --monitor heads:slot --monitor checkpoints:slot",
     )
 
+    parser.add_argument(
+        "--pool-size",
+        dest="pool_size",
+        type=int,
+        default=4,
+        help="Max number of keep-alive connections to hold open per node.",
+    )
+
+    parser.add_argument(
+        "--max-concurrency",
+        dest="max_concurrency",
+        type=int,
+        default=256,
+        help="Max number of requests in flight across all nodes.",
+    )
+
+    parser.add_argument(
+        "--no-keep-alive",
+        dest="keep_alive",
+        action="store_false",
+        default=True,
+        help="Close the connection to a node after every request.",
+    )
+
+    parser.add_argument(
+        "--slot-offset",
+        dest="slot_offset",
+        type=float,
+        default=0.0,
+        help="Seconds into each slot to run the monitors at.",
+    )
+
+    parser.add_argument(
+        "--action-deadline",
+        dest="action_deadline",
+        type=float,
+        default=None,
+        help="Seconds a monitor may run before it is recorded as overrun. "
+        "Defaults to one slot.",
+    )
+
+    parser.add_argument(
+        "--event-stream",
+        dest="event_stream",
+        action="store_true",
+        default=False,
+        help="Follow the heads and checkpoints of the nodes through their "
+        "beacon API event streams instead of polling them every slot.",
+    )
+
+    parser.add_argument(
+        "--metric-store",
+        dest="metric_store",
+        type=str,
+        default=None,
+        help="Directory to store the per-slot results of the monitors in, "
+        "e.g. /data/metrics. They can be read back with query_metrics.py.",
+    )
+
+    parser.add_argument(
+        "--metrics-port",
+        dest="metrics_port",
+        type=int,
+        default=None,
+        help="Serve Prometheus metrics on this port at /metrics.",
+    )
+
     parser.add_argument(
         "--log-to-file",
         dest="log_to_file",
@@ -275,6 +496,13 @@ if __name__ == "__main__":
         format_str="%(message)s",
     )
 
+    client_sessions.configure(pool_size=args.pool_size, keep_alive=args.keep_alive)
+    async_request_engine.configure(
+        max_concurrency=args.max_concurrency,
+        pool_size=args.pool_size,
+        keep_alive=args.keep_alive,
+    )
+
     logging.info("Getting view of the testnet from etb-config.")
     if args.config is None:
         etb_config: ETBConfig = get_etb_config()
@@ -289,5 +517,9 @@ if __name__ == "__main__":
         args=args,
     )
 
+    if args.metrics_port is not None:
+        request_observers.append(observe_request)
+        MetricsExporter(metrics_registry, port=args.metrics_port).start()
+
     logging.info("Starting node watch.")
     node_watcher.run()
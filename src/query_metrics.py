@@ -0,0 +1,60 @@
+"""
+    Print the monitor results recorded by node_watch --metric-store.
+
+    Each line is: slot client value
+"""
+import argparse
+import json
+import pathlib
+
+from etb.monitoring.metric_store import MetricStore
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Query the monitor results stored by node_watch."
+    )
+
+    parser.add_argument(
+        "--store",
+        dest="store",
+        type=str,
+        default="/data/metrics",
+        help="The metric store directory.",
+    )
+
+    parser.add_argument(
+        "--metric",
+        dest="metric",
+        type=str,
+        default=None,
+        help="The metric to query (heads/checkpoints/peer_count). Lists the "
+        "stored metrics if omitted.",
+    )
+
+    parser.add_argument(
+        "--start-slot", dest="start_slot", type=int, default=0, help="First slot."
+    )
+
+    parser.add_argument(
+        "--end-slot", dest="end_slot", type=int, default=None, help="Last slot."
+    )
+
+    parser.add_argument(
+        "--client",
+        dest="clients",
+        action="append",
+        default=None,
+        help="Only show results for this client instance, may be repeated.",
+    )
+
+    args = parser.parse_args()
+
+    store = MetricStore.open(pathlib.Path(args.store))
+    if args.metric is None:
+        for metric in store.get_metrics():
+            print(metric)
+    else:
+        for slot, client, value in store.query(
+            args.metric, args.start_slot, args.end_slot, args.clients
+        ):
+            print(f"{slot} {client} {json.dumps(value)}")
@@ -2,21 +2,23 @@
 Testnet Bootstrapper is responsible for bootstrapping a testnet from an etb-config file.
 """
 import argparse
-import json
 import logging
 import os
 import pathlib
 import random
-import re
 import shutil
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Union, Any
-
-import requests
-from ruamel import yaml
+from typing import Any, Union
 
+from etb.common.checkpoint import signal_checkpoint
+from etb.common.keystore_cache import KeystoreCache
+from etb.common.phase_executor import PhaseExecutor
+from etb.common.trash import move_to_trash, purge_trash
 from etb.common.utils import create_logger
+from etb.config.docker_compose import DockerComposeWriter
 from etb.config.etb_config import (
     ETBConfig,
     FilesConfig,
@@ -25,12 +27,10 @@ from etb.config.etb_config import (
 )
 from etb.genesis.consensus_genesis import ConsensusGenesisWriter
 from etb.genesis.execution_genesis import ExecutionGenesisWriter
-from etb.interfaces.client_request import (
-    eth_getBlockByNumber,
-    admin_nodeInfo,
-    perform_batched_request,
-    admin_addPeer,
-)
+from etb.genesis.genesis_cache import GenesisStateCache
+from etb.interfaces.client_request import eth_getBlockByNumber
+from etb.interfaces.execution_peering import ExecutionClientPairer
+from etb.interfaces.retry_policy import readiness_retry_policy
 from etb.interfaces.external.eth2_val_tools import Eth2ValTools
 
 
@@ -53,12 +53,22 @@ class EthereumTestnetBootstrapper:
                         (This is run on docker-compose up)
     """
 
+    # keystore ranges are split at multiples of this index so that the
+    # chunks (and their keystore cache entries) don't depend on the layout
+    # of the clients.
+    keystore_chunk_size: int = 32
+
     def __init__(self):
         pass
 
-    def clean(self):
+    def clean(self, background: bool = False):
         """Cleans up the testnet root directory and docker-compose file.
 
+        The contents of the testnet root are first moved aside into a trash
+        dir, so a new init-testnet can start right away, and then deleted by
+        a pool of workers.
+        @param background: only move the contents aside, the trash is then
+        deleted in the background by the next init-testnet.
         @return:
         """
         files_config = FilesConfig()
@@ -67,16 +77,28 @@ class EthereumTestnetBootstrapper:
         )
         docker_compose_file = files_config.docker_compose_file
         if files_config.testnet_root.exists():
-            for root, dirs, files in os.walk(files_config.testnet_root):
-                for file in files:
-                    pathlib.Path(f"{root}/{file}").unlink()
-                for directory in dirs:
-                    shutil.rmtree(f"{root}/{directory}")
+            trash = move_to_trash(files_config.testnet_root)
+            if trash is not None:
+                logging.debug(f"moved the previous run to {trash}")
 
         if docker_compose_file.exists():
             docker_compose_file.unlink()
-
-    def init_testnet(self, config_path: Path):
+        for shard in DockerComposeWriter.get_shard_files(docker_compose_file):
+            shard.unlink()
+
+        if background:
+            logging.info("the previous run will be deleted by the next init-testnet.")
+        elif files_config.testnet_root.exists():
+            self._purge_trash(files_config.testnet_root)
+
+    def _purge_trash(self, testnet_root: pathlib.Path):
+        stats = purge_trash(testnet_root)
+        if stats.dirs > 0:
+            logging.info(f"deleted the previous runs: {stats}")
+
+    def init_testnet(
+        self, config_path: Path, compose_shard_by: Union[None, str, int] = None
+    ):
         """Initializes the testnet directory, 3 phases.
 
         1. populate client-specific static files:
@@ -86,6 +108,8 @@ class EthereumTestnetBootstrapper:
         2. Write the etb-config file into the testnet-dir.
         3. Write the docker-compose file to use for bootstrapping later.
         @param config_path: path to the etb-config file.
+        @param compose_shard_by: write the docker-compose services to several
+        files instead, see DockerComposeWriter.get_shards.
         @return:
         """
         etb_config: ETBConfig = ETBConfig(config_path)
@@ -99,6 +123,14 @@ class EthereumTestnetBootstrapper:
             )
         local_testnet_dir.mkdir(parents=True)  # /data/local_testnet
 
+        # delete the runs that were moved aside by clean while we init.
+        purge_thread = threading.Thread(
+            target=self._purge_trash,
+            args=(etb_config.files.testnet_root,),
+            name="purge-trash",
+        )
+        purge_thread.start()
+
         # create the client directories
         # directory structure:
         # /testnet_root/local_testnet/collection_name/node_<node_num>/{cl
@@ -124,23 +156,20 @@ class EthereumTestnetBootstrapper:
         etb_config.write_config(etb_config.files.testnet_root / "etb-config.yaml")
 
         # lastly write the docker-compose file to use for bootstrapping later.
-        logging.info("writing docker-compose file..")
-        with open(
-            etb_config.files.docker_compose_file, "w", encoding="utf-8"
-        ) as docker_file:
-            # remove identities and aliases from the yaml file to ease
-            # readability for end users.
-            class NoAliasDumper(yaml.SafeDumper):
-                """
-                A dumper that will never emit aliases.
-                """
-
-                def ignore_aliases(self, data):
-                    return True
-
-            docker_file.write(
-                yaml.dump(etb_config.get_docker_compose_repr(), Dumper=NoAliasDumper)
+        compose_writer = DockerComposeWriter(etb_config)
+        if compose_shard_by is None:
+            logging.info("writing docker-compose file..")
+            compose_writer.write(etb_config.files.docker_compose_file)
+        else:
+            logging.info(f"writing docker-compose shards by {compose_shard_by}..")
+            shards = compose_writer.write_shards(
+                etb_config.files.docker_compose_file, compose_shard_by
             )
+            logging.info(f"wrote {len(shards)} docker-compose shards: {shards}")
+
+        if purge_thread.is_alive():
+            logging.info("waiting for the previous runs to be deleted..")
+        purge_thread.join()
 
     def bootstrap_testnet(self, config_path: Path, global_timeout: int = 60):
         """Bootstraps the testnet. This happens in several phases, each
@@ -149,86 +178,126 @@ class EthereumTestnetBootstrapper:
         1. Set bootstrap dynamic entry and write the config file and checkpoint file.
         2. Signal the consensus bootnodes to come up.
         3. Start the execution clients.
+        4. Write the consensus genesis files and start the consensus clients.
 
+        Independent steps run concurrently, the time each step took is logged
+        and written to the bootstrap-report-file.
         @param global_timeout: the max amount of time to wait for any RPC request.
         @param config_path: path to the etb-config file.
         @return:
         """
 
-        # 1 prep the shared etb-config.yaml file with the bootstrap time.
         logging.info("bootstrapping testnet..")
         etb_config: ETBConfig = ETBConfig(path=config_path)
-        etb_config.set_genesis_time(int(time.time()))
-        etb_config.write_config(etb_config.files.testnet_root / "etb-config.yaml")
-        with open(
-            etb_config.files.etb_config_checkpoint_file, "w", encoding="utf-8"
-        ) as etb_checkpoint:
-            etb_checkpoint.write("")
+        phases = PhaseExecutor()
+
+        # 1 prep the shared etb-config.yaml file with the bootstrap time.
+        def write_etb_config():
+            etb_config.set_genesis_time(int(time.time()))
+            config_file = etb_config.files.testnet_root / "etb-config.yaml"
+            etb_config.write_config(config_file)
+            # the containers load the resolved config from the snapshot.
+            etb_config.write_snapshot(
+                etb_config.files.etb_config_snapshot_file, config_file
+            )
+            signal_checkpoint(etb_config.files.etb_config_checkpoint_file)
+
+        phases.add_phase("write-etb-config", write_etb_config)
 
         # (if you need anything to run before the testnet starts, do it here)
 
         # 2 signal the consensus bootnodes to come up.
-        logging.info("signaling consensus bootnodes to come up..")
-        with open(
-            etb_config.files.consensus_bootnode_checkpoint_file, "w"
-        ) as bootnode_checkpoint:
-            bootnode_checkpoint.write("")
+        def signal_bootnodes():
+            logging.info("signaling consensus bootnodes to come up..")
+            signal_checkpoint(etb_config.files.consensus_bootnode_checkpoint_file)
+
+        phases.add_phase("signal-bootnodes", signal_bootnodes, ["write-etb-config"])
 
         # 3. handle execution clients.
         # create genesis files
-        logging.info("creating execution layer genesis files..")
-        egw = ExecutionGenesisWriter(etb_config)
-        with open(
-            etb_config.files.geth_genesis_file, "w", encoding="utf-8"
-        ) as geth_genesis:
-            geth_genesis.write(json.dumps(egw.create_geth_genesis()))
-        with open(
-            etb_config.files.besu_genesis_file, "w", encoding="utf-8"
-        ) as besu_genesis:
-            besu_genesis.write(json.dumps(egw.create_besu_genesis()))
-        with open(
-            etb_config.files.nether_mind_genesis_file, "w", encoding="utf-8"
-        ) as nethermind_genesis:
-            nethermind_genesis.write(json.dumps(egw.create_nethermind_genesis()))
+        def write_execution_genesis():
+            logging.info("creating execution layer genesis files..")
+            egw = ExecutionGenesisWriter(etb_config)
+            egw.write_genesis_files(
+                etb_config.files.geth_genesis_file,
+                etb_config.files.besu_genesis_file,
+                etb_config.files.nether_mind_genesis_file,
+            )
+
+        phases.add_phase(
+            "execution-genesis", write_execution_genesis, ["write-etb-config"]
+        )
+
         # signal all execution clients to start.
-        with open(
-            etb_config.files.execution_checkpoint_file, "w", encoding="utf-8"
-        ) as execution_checkpoint:
-            execution_checkpoint.write("")
+        def signal_execution_clients():
+            signal_checkpoint(etb_config.files.execution_checkpoint_file)
+
+        phases.add_phase(
+            "signal-execution-clients", signal_execution_clients, ["execution-genesis"]
+        )
         # now that the ELs are all up we manually pair them.
-        self._pair_execution_clients(etb_config, global_timeout=global_timeout)
+        phases.add_phase(
+            "pair-execution-clients",
+            lambda: self._pair_execution_clients(
+                etb_config, global_timeout=global_timeout
+            ),
+            ["signal-execution-clients"],
+        )
 
         # 4. get the consensus clients ready to come up.
         # create and write all the required files into the testnet root.
-        block_hash, block_number = self.get_deposit_contract_deployment_block(
-            etb_config, global_timeout=global_timeout
-        )
         etb_block_hash_file: pathlib.Path = (
             etb_config.files.deposit_contract_deployment_block_hash_file
         )
         etb_block_number_file: pathlib.Path = (
             etb_config.files.deposit_contract_deployment_block_number_file
         )
-        with open(etb_block_hash_file, "w", encoding="utf-8") as block_hash_file:
-            block_hash_file.write(block_hash)
-        with open(etb_block_number_file, "w", encoding="utf-8") as block_number_file:
-            block_number_file.write(str(block_number))
-        logging.info("Writing consensus genesis files")
-        cgw = ConsensusGenesisWriter(etb_config)
-        with open(
-            etb_config.files.consensus_config_file, "w", encoding="utf-8"
-        ) as consensus_config:
-            consensus_config.write(cgw.create_consensus_config_yaml())
-        with open(etb_config.files.consensus_genesis_file, "wb") as consensus_genesis:
-            genesis_ssz = cgw.create_consensus_genesis_ssz()
-            # got an exception, raise it. if not then we have bytes to write.
-            if isinstance(genesis_ssz, Exception):
-                raise genesis_ssz
-            consensus_genesis.write(cgw.create_consensus_genesis_ssz())
+
+        def write_deposit_contract_block() -> str:
+            block_hash, block_number = self.get_deposit_contract_deployment_block(
+                etb_config, global_timeout=global_timeout
+            )
+            with open(etb_block_hash_file, "w", encoding="utf-8") as block_hash_file:
+                block_hash_file.write(block_hash)
+            with open(
+                etb_block_number_file, "w", encoding="utf-8"
+            ) as block_number_file:
+                block_number_file.write(str(block_number))
+            return block_hash
+
+        phases.add_phase(
+            "deposit-contract-block",
+            write_deposit_contract_block,
+            ["signal-execution-clients"],
+        )
+
+        def write_consensus_config():
+            logging.info("Writing consensus genesis files")
+            with open(
+                etb_config.files.consensus_config_file, "w", encoding="utf-8"
+            ) as consensus_config:
+                consensus_config.write(
+                    ConsensusGenesisWriter(etb_config).create_consensus_config_yaml()
+                )
+
+        phases.add_phase(
+            "consensus-config", write_consensus_config, ["write-etb-config"]
+        )
+
+        # eth2-testnet-genesis writes the consensus-genesis-file, the state is
+        # only built once and reused from the cache for the same inputs.
+        phases.add_phase(
+            "consensus-genesis",
+            lambda: ConsensusGenesisWriter(etb_config).write_consensus_genesis_ssz(
+                phases.get_result("deposit-contract-block"),
+                GenesisStateCache(etb_config.files.etb_cache_dir),
+            ),
+            ["consensus-config", "execution-genesis", "deposit-contract-block"],
+        )
+
         # now copy the files into their respective dirs.
         # note the nodes are using the top level dir instead of the node dir.
-        config: ClientInstanceCollectionConfig
-        for config in etb_config.client_collections:
+        def copy_consensus_files(config: ClientInstanceCollectionConfig):
             destination = config.collection_dir
             shutil.copy(etb_config.files.consensus_config_file, destination)
             shutil.copy(etb_config.files.consensus_genesis_file, destination)
@@ -241,11 +310,32 @@ class EthereumTestnetBootstrapper:
                 shutil.copy(
                     etb_block_number_file, destination / "deposit_contract_block.txt"
                 )
+
+        copy_phases = []
+        config: ClientInstanceCollectionConfig
+        for config in etb_config.client_collections:
+            copy_phases.append(f"copy-files-{config.name}")
+            phases.add_phase(
+                copy_phases[-1],
+                lambda c=config: copy_consensus_files(c),
+                ["consensus-genesis"],
+            )
+
         # signal the CL clients to start
-        with open(
-            etb_config.files.consensus_checkpoint_file, "w", encoding="utf-8"
-        ) as consensus_checkpoint:
-            consensus_checkpoint.write("")
+        def signal_consensus_clients():
+            signal_checkpoint(etb_config.files.consensus_checkpoint_file)
+
+        phases.add_phase(
+            "signal-consensus-clients",
+            signal_consensus_clients,
+            copy_phases + ["pair-execution-clients"],
+        )
+
+        try:
+            phases.run()
+        finally:
+            phases.log_report("bootstrap phase timings")
+            phases.write_report(etb_config.files.bootstrap_report_file)
 
         logging.info("testnet bootstrapped.")
 
@@ -265,19 +355,16 @@ class EthereumTestnetBootstrapper:
     def _pair_execution_clients(self, etb_config: ETBConfig, global_timeout: int):
         """Iterate through all client-instances which have the admin api.
 
-        enabled and pair them. @param etb_config: config of
-        experiment @return:
+        enabled and pair them using the peering-topology from the
+        etb-config. @param etb_config: config of experiment @return:
         """
-        admin_api_filter: re.Pattern[str] = re.compile(r"(admin|ADMIN)")
-        el_clients_to_pair: list[ClientInstance] = []
-        # lots of retries as clients can take a while to start.
-        # node_info_rpc_request = admin_nodeInfo(max_retries=20, timeout=global_timeout)
-
-        client_instances = etb_config.get_client_instances()
-        for instance in client_instances:
-            if admin_api_filter.search(",".join(instance.execution_config.http_apis)):
-                el_clients_to_pair.append(instance)
-            else:
+        el_clients_to_pair: list[ClientInstance] = list(
+            etb_config.get_client_instances_by_http_api("admin")
+        )
+
+        admin_instances = set(el_clients_to_pair)
+        for instance in etb_config.get_client_instances():
+            if instance not in admin_instances:
                 logging.warning(
                     f"Execution client for {instance.name} does not support the admin API."
                 )
@@ -285,122 +372,213 @@ class EthereumTestnetBootstrapper:
                     f"Skipping execution pairing for instance: {instance.name}"
                 )
 
-        enodes: dict[ClientInstance, str] = {}
-        el_client: ClientInstance
+        execution_layer = etb_config.testnet_config.execution_layer
         # it may take a while for the clients to come up; so retry a lot.
-        rpc_request = admin_nodeInfo(max_retries=40, timeout=global_timeout)
-        for el_client, rpc_future in perform_batched_request(
-            rpc_request, el_clients_to_pair
-        ).items():
-            result: Union[requests.Response, Exception] = rpc_future.result()
-            if rpc_request.is_valid(result):
-                enodes[el_client] = rpc_request.get_enode(result)
-            else:
-                logging.error(
-                    f"Failed to get enode from {el_client.name}, error: {result}"
-                )
-                # bail early
-                raise result
-
-        logging.debug(
-            f"Fetched the following enodes: {enodes} from the execution clients."
+        pairer = ExecutionClientPairer(
+            topology=execution_layer.peering_topology,
+            degree=execution_layer.peering_degree,
+            timeout=global_timeout,
+            node_info_retries=40,
         )
+        logging.info(pairer.pair(el_clients_to_pair))
 
-        # now peer the clients with everyone but themselves.
-        for el_peer, enode in enodes.items():
-            add_enode_rpc_request = admin_addPeer(enode=enode, timeout=global_timeout)
-            for el_client in el_clients_to_pair:
-                # don't pair clients with themselves.
-                if el_client != el_peer:
-                    logging.debug(f"adding peer {el_peer} to el_client {el_client}")
-                    resp = add_enode_rpc_request.perform_request(el_client)
-                    if not add_enode_rpc_request.is_valid(resp):
-                        logging.error(f"admin_addPeer failed with {resp}")
-                        # bail early
-                        raise resp
+    def _get_keystore_jobs(
+        self, etb_config: ETBConfig
+    ) -> list[tuple[ClientInstance, int, int, pathlib.Path]]:
+        """Split the validator keystores of the clients into disjoint index
+        ranges that can be generated in parallel.
 
-    def _write_validator_keystores(self, etb_config: ETBConfig):
-        """
-        Populates the validator keystores for all the clients.
-        keys are generated using eth2-val-tools and dropped in the node_dir:
-            /testnet_root/local_testnet/collection_name/node_<node_num>/keystores/
-        they are then moved up one dir and the keystore dir is removed.
+        Prysm keystores are a single wallet so each prysm client is one job,
+        the other clients' keystores are one file per validator so their
+        ranges are split into chunks that are merged afterward.
         @param etb_config: ETBConfig
-        @return:
+        @return: [(client_instance, min_ndx, max_ndx, out_path)]
         """
-
-        eth2_val_tools = Eth2ValTools()
-        mnemonic = etb_config.testnet_config.consensus_layer.validator_mnemonic
-        logging.debug(f"using mnemonic:\n\t{mnemonic}")
+        jobs = []
         client_instance: ClientInstance
         for client_instance in etb_config.get_client_instances():
             cl_client = client_instance.consensus_config.client
             if cl_client not in ["prysm", "lighthouse", "teku", "nimbus", "lodestar"]:
                 raise Exception(f"client: {cl_client} not supported for keystores")
-            consensus_node_dir: pathlib.Path = client_instance.node_dir
-            keystore_dir: pathlib.Path = consensus_node_dir / pathlib.Path("keystores/")
+            keystore_dir: pathlib.Path = client_instance.node_dir / "keystores"
             vpn = client_instance.consensus_config.num_validators  # validators per node
             offset = client_instance.ndx * vpn
             min_ndx = client_instance.collection_config.validator_offset_start + offset
             max_ndx = min_ndx + vpn
-            logging.debug(f"populating keystores for client: {client_instance.name}")
             logging.debug(f"min_ndx: {min_ndx}, max_ndx: {max_ndx}")
             if cl_client == "prysm":
-                eth2_val_tools.generate_keystores(
-                    out_path=keystore_dir,
-                    min_ndx=min_ndx,
-                    max_ndx=max_ndx,
-                    mnemonic=mnemonic,
-                    prysm=True,
-                    prysm_password=client_instance.validator_password,
+                jobs.append((client_instance, min_ndx, max_ndx, keystore_dir))
+                continue
+            # eth2-val-tools creates the out path but not its parents.
+            keystore_dir.mkdir(parents=True, exist_ok=True)
+            chunk_size = self.keystore_chunk_size
+            first_boundary = min_ndx - min_ndx % chunk_size + chunk_size
+            bounds = [min_ndx, *range(first_boundary, max_ndx, chunk_size), max_ndx]
+            for chunk_ndx in range(len(bounds) - 1):
+                jobs.append(
+                    (
+                        client_instance,
+                        bounds[chunk_ndx],
+                        bounds[chunk_ndx + 1],
+                        keystore_dir / str(chunk_ndx),
+                    )
                 )
-
-                for item in pathlib.Path(keystore_dir).glob("prysm/*"):
-                    if item.is_dir():
-                        shutil.copytree(item, consensus_node_dir / item.name)
-                    else:
-                        shutil.copy(item, consensus_node_dir / item.name)
-                # prysm requires a wallet-password.txt to launch.
-                wallet_password_path: pathlib.Path = (
-                    consensus_node_dir / "wallet-password.txt"
-                )
-                with open(wallet_password_path, "w") as wallet_password_file:
-                    wallet_password_file.write(client_instance.validator_password)
-
-            else:
-                eth2_val_tools.generate_keystores(
-                    out_path=keystore_dir,
-                    min_ndx=min_ndx,
-                    max_ndx=max_ndx,
-                    mnemonic=mnemonic,
+        return jobs
+
+    def _generate_keystores(
+        self,
+        eth2_val_tools: Eth2ValTools,
+        keystore_cache: KeystoreCache,
+        job: tuple[ClientInstance, int, int, pathlib.Path],
+        mnemonic: str,
+    ) -> tuple[float, float, bool]:
+        """Run eth2-val-tools for a keystore job, or restore the keystores
+        from the cache.
+
+        @return: the (start, end) monotonic time of the job and whether the
+        keystores were cached.
+        """
+        client_instance, min_ndx, max_ndx, out_path = job
+        prysm = client_instance.consensus_config.client == "prysm"
+        # only prysm wallets depend on the password.
+        keystore_format = "prysm" if prysm else "keystores"
+        password = client_instance.validator_password if prysm else ""
+        start = time.monotonic()
+        if keystore_cache.restore(
+            out_path, mnemonic, min_ndx, max_ndx, keystore_format, password
+        ):
+            return start, time.monotonic(), True
+
+        result = eth2_val_tools.generate_keystores(
+            out_path=out_path,
+            min_ndx=min_ndx,
+            max_ndx=max_ndx,
+            mnemonic=mnemonic,
+            prysm=prysm,
+            prysm_password=client_instance.validator_password,
+        )
+        if isinstance(result, Exception):
+            raise Exception(
+                f"eth2-val-tools failed for {client_instance.name} "
+                f"[{min_ndx}, {max_ndx}): {result}"
+            ) from result
+        keystore_cache.store(
+            out_path, mnemonic, min_ndx, max_ndx, keystore_format, password
+        )
+        return start, time.monotonic(), False
+
+    def _move_client_keystores(self, client_instance: ClientInstance):
+        """Move the generated keystores of a client from
+        node_dir/keystores/ into the node_dir in the layout the client
+        expects, then remove the generated keystores."""
+        cl_client = client_instance.consensus_config.client
+        consensus_node_dir: pathlib.Path = client_instance.node_dir
+        keystore_dir: pathlib.Path = consensus_node_dir / "keystores"
+        if cl_client == "prysm":
+            for item in keystore_dir.glob("prysm/*"):
+                shutil.move(item, consensus_node_dir / item.name)
+            # prysm requires a wallet-password.txt to launch.
+            wallet_password_path: pathlib.Path = (
+                consensus_node_dir / "wallet-password.txt"
+            )
+            with open(wallet_password_path, "w") as wallet_password_file:
+                wallet_password_file.write(client_instance.validator_password)
+        else:
+            # these are the defaults shared by most of the clients
+            keystore_src = "keys"  # where the generated keystores are
+            secret_src = "secrets"  # where the generated secrets are
+            if cl_client == "teku":
+                keystore_src = "teku-keys"
+                secret_src = "teku-secrets"
+            elif cl_client == "nimbus":
+                keystore_src = "nimbus-keys"
+            elif cl_client == "lodestar":
+                secret_src = "lodestar-secrets"
+                # go ahead and create the validatordb dir for lodestar
+                pathlib.Path(consensus_node_dir / "validatordb").mkdir()
+            # merge the chunks into the keys and secrets dirs.
+            for src, dst in [(keystore_src, "keys"), (secret_src, "secrets")]:
+                (consensus_node_dir / dst).mkdir(exist_ok=True)
+                for item in keystore_dir.glob(f"*/{src}/*"):
+                    shutil.move(item, consensus_node_dir / dst / item.name)
+            # one keystore per validator, a missing chunk would go unnoticed.
+            num_keystores = len(list((consensus_node_dir / "keys").iterdir()))
+            num_validators = client_instance.consensus_config.num_validators
+            if num_keystores != num_validators:
+                raise Exception(
+                    f"{client_instance.name} has {num_keystores} keystores, "
+                    f"expected {num_validators}"
                 )
-                # these are the defaults shared by most of the clients
-                keystore_src: pathlib.Path = (
-                    keystore_dir / "keys"
-                )  # where the generated keystores are
-                keystore_dst: pathlib.Path = (
-                    consensus_node_dir / "keys"
-                )  # where the keystores will be moved to
-                secret_src: pathlib.Path = (
-                    keystore_dir / "secrets"
-                )  # where the generated secrets are
-                secret_dst: pathlib.Path = (
-                    consensus_node_dir / "secrets"
-                )  # where the secrets will be moved to
-                if cl_client == "teku":
-                    keystore_src = keystore_dir / "teku-keys"
-                    secret_src = keystore_dir / "teku-secrets"
-                elif cl_client == "nimbus":
-                    keystore_src = keystore_dir / "nimbus-keys"
-                elif cl_client == "lodestar":
-                    secret_src = keystore_dir / "lodestar-secrets"
-                    # go ahead and create the validatordb dir for lodestar
-                    pathlib.Path(consensus_node_dir / "validatordb").mkdir()
-                # copy everything over
-                shutil.copytree(keystore_src, keystore_dst)
-                shutil.copytree(secret_src, secret_dst)
-            # finished, remove the generated keystores.
-            shutil.rmtree(keystore_dir)
+        # finished, remove the generated keystores.
+        shutil.rmtree(keystore_dir)
+
+    def _write_validator_keystores(self, etb_config: ETBConfig):
+        """
+        Populates the validator keystores for all the clients.
+        keys are generated using eth2-val-tools and dropped in the node_dir:
+            /testnet_root/local_testnet/collection_name/node_<node_num>/keystores/
+        they are then moved up one dir and the keystore dir is removed.
+
+        eth2-val-tools spends most of its time in the keystore KDFs, so the
+        index ranges are generated in parallel, one process per cpu. Ranges
+        generated by a previous init-testnet are restored from the keystore
+        cache in the etb-cache-dir instead.
+        @param etb_config: ETBConfig
+        @return:
+        """
+
+        eth2_val_tools = Eth2ValTools()
+        mnemonic = etb_config.testnet_config.consensus_layer.validator_mnemonic
+        logging.debug(f"using mnemonic:\n\t{mnemonic}")
+        keystore_cache = KeystoreCache(etb_config.files.etb_cache_dir)
+        max_workers = os.cpu_count() or 1
+        jobs = self._get_keystore_jobs(etb_config)
+        num_cached = 0
+
+        start = time.monotonic()
+        # client name -> (first job start, last job end)
+        client_times: dict[str, tuple[float, float]] = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(
+                    self._generate_keystores,
+                    eth2_val_tools,
+                    keystore_cache,
+                    job,
+                    mnemonic,
+                ): job
+                for job in jobs
+            }
+            failed_jobs = 0
+            for future in as_completed(futures):
+                name = futures[future][0].name
+                try:
+                    job_start, job_end, cached = future.result()
+                except Exception as e:
+                    logging.error(e)
+                    failed_jobs += 1
+                    continue
+                num_cached += cached
+                first, last = client_times.get(name, (job_start, job_end))
+                client_times[name] = (min(first, job_start), max(last, job_end))
+
+        if failed_jobs > 0:
+            raise Exception(
+                f"Failed to generate keystores for {failed_jobs}/{len(jobs)} ranges."
+            )
+
+        for client_instance in etb_config.get_client_instances():
+            self._move_client_keystores(client_instance)
+            first, last = client_times.get(client_instance.name, (0, 0))
+            logging.info(
+                f"generated {client_instance.consensus_config.num_validators} "
+                f"keystores for {client_instance.name} in {last - first:.2f}s"
+            )
+        logging.info(
+            f"generated keystores for {len(client_times)} clients in "
+            f"{time.monotonic() - start:.2f}s using {max_workers} processes "
+            f"({num_cached}/{len(jobs)} ranges from the keystore cache)"
+        )
 
     def get_deposit_contract_deployment_block(
         self, etb_config: ETBConfig, global_timeout: int
@@ -410,11 +588,7 @@ class EthereumTestnetBootstrapper:
 
         :return: (block_hash, block_number)
         """
-        el_eth_regex = re.compile(r"(eth|ETH)")
-        plausible_instances: list[ClientInstance] = []
-        for instance in etb_config.get_client_instances():
-            if el_eth_regex.search(",".join(instance.execution_config.http_apis)):
-                plausible_instances.append(instance)
+        plausible_instances = etb_config.get_client_instances_by_http_api("eth")
 
         if len(plausible_instances) == 0:
             raise Exception("No clients have an EL that supports the eth http-api")
@@ -424,7 +598,9 @@ class EthereumTestnetBootstrapper:
             f"Using instance: {target_instance.name} to get the contract deployment block."
         )
         # contract deployed at genesis
-        get_block_rpc_request = eth_getBlockByNumber("0x0", timeout=global_timeout)
+        get_block_rpc_request = eth_getBlockByNumber(
+            "0x0", timeout=global_timeout, retry_policy=readiness_retry_policy
+        )
         resp = get_block_rpc_request.perform_request(target_instance)
         if not get_block_rpc_request.is_valid(resp):
             resp: Exception  # resp is an exception
@@ -457,6 +633,14 @@ if __name__ == "__main__":
         help="Clear the last run.",
     )
 
+    parser.add_argument(
+        "--clean-background",
+        dest="clean_background",
+        action="store_true",
+        default=False,
+        help="Move the last run aside, it is deleted by the next --init-testnet.",
+    )
+
     parser.add_argument(
         "--init-testnet",
         dest="init_testnet",
@@ -465,6 +649,14 @@ if __name__ == "__main__":
         help="Initialize the testnet to be bootstrapped.",
     )
 
+    parser.add_argument(
+        "--compose-shard-by",
+        dest="compose_shard_by",
+        default=None,
+        help="Split the docker-compose file into shards: 'collection' for one "
+        "per instance collection, or the number of services per shard.",
+    )
+
     parser.add_argument(
         "--bootstrap-testnet",
         dest="bootstrap_testnet",
@@ -489,8 +681,8 @@ if __name__ == "__main__":
 
     etb = EthereumTestnetBootstrapper()
 
-    if args.clean:
-        etb.clean()
+    if args.clean or args.clean_background:
+        etb.clean(background=args.clean_background)
         logging.debug("testnet_bootstrapper has finished cleaning up.")
 
     if args.init_testnet:
@@ -503,7 +695,10 @@ if __name__ == "__main__":
         else:
             path_to_config = pathlib.Path(args.config)
 
-        etb.init_testnet(path_to_config)
+        compose_shard_by = args.compose_shard_by
+        if compose_shard_by is not None and compose_shard_by.isdigit():
+            compose_shard_by = int(compose_shard_by)
+        etb.init_testnet(path_to_config, compose_shard_by)
         logging.debug("testnet_bootstrapper has finished init-ing the testnet.")
 
     if args.bootstrap_testnet:
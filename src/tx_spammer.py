@@ -7,15 +7,12 @@ import logging
 import pathlib
 import random
 
-from web3.auto import w3
-
-from etb.common.utils import create_logger, PremineKey
+from etb.common.key_cache import get_derived_key_cache
+from etb.common.utils import create_logger
 from etb.config.etb_config import ETBConfig, ClientInstance, get_etb_config
 from src.etb.monitoring.testnet_monitor import TestnetMonitor
 from etb.interfaces.external.live_fuzzer import LiveFuzzer
 
-w3.eth.account.enable_unaudited_hdwallet_features()
-
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
 
@@ -81,20 +78,17 @@ if __name__ == "__main__":
 
     rpc_path = f"http://{args.target_ip}:{args.target_port}"
 
-    # get the private keys to use.
+    # get the private key to use, only the chosen account is derived since
+    # testnets may have thousands of premines.
     mnemonic = etb_config.testnet_config.execution_layer.account_mnemonic
     account_pass = etb_config.testnet_config.execution_layer.keystore_passphrase
     premine_accts = etb_config.testnet_config.execution_layer.premines
 
-    private_keys = []
-    for acc in premine_accts:
-        private_keys.append(
-            PremineKey(
-                mnemonic=mnemonic, account=acc, passphrase=account_pass
-            ).private_key
-        )
+    account = random.choice(list(premine_accts))
+    key = get_derived_key_cache().get_key(mnemonic, account, account_pass)
+    private_key = key.private_key
 
-    logging.debug(f"private keys: {private_keys}")
+    logging.debug(f"using premine account {account}")
 
     logging.info(f"Waiting for start epoch {args.epoch_delay}")
     testnet_monitor.wait_for_epoch(args.epoch_delay)
@@ -102,5 +96,5 @@ if __name__ == "__main__":
     live_fuzzer_interface.start_fuzzer(
         rpc_path=rpc_path,
         fuzz_mode=args.fuzz_mode,
-        private_key=random.choice(private_keys),
+        private_key=private_key,
     )
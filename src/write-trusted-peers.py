@@ -6,6 +6,8 @@ import requests
 from etb.config.etb_config import ETBConfig, get_etb_config
 from etb.common.utils import create_logger
 from etb.interfaces.client_request import BeaconAPIRequest, perform_batched_request
+from etb.interfaces.response_json import get_response_field
+from etb.interfaces.retry_policy import readiness_retry_policy
 
 class beacon_getNodeIdentity(BeaconAPIRequest):
     # https://ethereum.github.io/beacon-APIs/#/Node/getNetworkIdentity
@@ -15,11 +17,13 @@ class beacon_getNodeIdentity(BeaconAPIRequest):
             payload=payload,
             max_retries=max_retries,
             timeout=timeout,
+            # poll every second until the client comes up.
+            retry_policy=readiness_retry_policy,
         )
 
     def get_peer_id(self, resp: requests.Response):
         if self.is_valid(resp):
-            return resp.json()["data"]["peer_id"]
+            return get_response_field(resp, ("data", "peer_id"))
         else:
             return resp # an exception
 
@@ -55,11 +59,18 @@ if __name__ == "__main__":
 
     logging.info(f"Using trusted peers from {args.trusted_instance}")
 
-    # get the wormtongue instances
-    trusted_instances = []
-    for instance in etb_config.get_client_instances():
-        if args.trusted_instance in instance.name:
-            trusted_instances.append(instance)
+    # get the wormtongue instances, either a single instance or all the
+    # instances of the collections whose name contains trusted_instance.
+    trusted_instance = etb_config.get_instance_by_name(args.trusted_instance)
+    if trusted_instance is not None:
+        trusted_instances = [trusted_instance]
+    else:
+        trusted_instances = []
+        for collection in etb_config.client_collections:
+            if args.trusted_instance in collection.name:
+                trusted_instances.extend(
+                    etb_config.get_instances_by_collection(collection.name)
+                )
 
     logging.info(f"Grabbing peer id from {trusted_instances}")
 